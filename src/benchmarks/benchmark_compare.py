@@ -0,0 +1,93 @@
+"""Benchmark regression check.
+
+Compares the throughput of the scenarios of a benchmark run (objects/s, MB/s or
+samples/s) to a baseline run of the same benchmark, and exits with an error when one of
+them dropped by more than the threshold. The runs are JSON results files, or runs of the
+benchmarks MLflow experiment (logged with the `--log-mlflow` option of the benchmarks):
+
+    python -m src.benchmarks.benchmark_compare benchmark_data_prep.json \
+        --baseline baseline/benchmark_data_prep.json --threshold 0.1
+    python -m src.benchmarks.benchmark_compare benchmark_data_plane.json \
+        --baseline-run-id <run id>
+"""
+
+import argparse
+import sys
+
+from src.config.settings import BENCHMARK_REGRESSION_THRESHOLD
+from src.utils.benchmark_helper import compare_results, load_results
+from src.utils.tracker_helper import load_benchmark_results
+
+
+def format_comparisons(comparisons: list[dict]) -> str:
+    """
+    Formats the comparisons of a run to its baseline as a table.
+
+    Args:
+        comparisons (list[dict]): The comparisons of compare_results.
+
+    Returns:
+        str: One line per compared metric, the regressions being flagged.
+    """
+    lines = [
+        f"{'scenario':<24}{'metric':<20}{'baseline':>12}{'current':>12}{'change':>9}"
+    ]
+    for comparison in comparisons:
+        lines.append(
+            f"{comparison['scenario']:<24}{comparison['metric']:<20}"
+            f"{comparison['baseline']:>12.2f}{comparison['current']:>12.2f}"
+            f"{comparison['change']:>+9.1%}"
+            + ("  REGRESSION" if comparison["regression"] else "")
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("results", help="The JSON results of the benchmark run.")
+    baseline_group = parser.add_mutually_exclusive_group(required=True)
+    baseline_group.add_argument(
+        "--baseline", help="The JSON results of the baseline run."
+    )
+    baseline_group.add_argument(
+        "--baseline-run-id", help="The MLflow run of the baseline run."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=BENCHMARK_REGRESSION_THRESHOLD,
+        help="The relative throughput drop flagged as a regression.",
+    )
+    args = parser.parse_args()
+
+    results = load_results(args.results)
+    if args.baseline is not None:
+        baseline = load_results(args.baseline)
+    else:
+        baseline = load_benchmark_results(args.baseline_run_id)
+        if baseline is None:
+            sys.exit("No MLflow experiment tracker in the active stack.")
+
+    if baseline["benchmark"] != results["benchmark"]:
+        sys.exit(
+            f"The baseline is a {baseline['benchmark']} benchmark, not a"
+            f" {results['benchmark']} benchmark."
+        )
+    if baseline["parameters"] != results["parameters"]:
+        print("Warning: the runs have different parameters.")
+
+    comparisons = compare_results(results, baseline, args.threshold)
+    print(format_comparisons(comparisons))
+
+    regressions = [comparison for comparison in comparisons if comparison["regression"]]
+    if regressions:
+        sys.exit(
+            f"{len(regressions)} throughput regressions of more than"
+            f" {args.threshold:.0%} from the baseline"
+            f" ({baseline['run'].get('git_sha') or 'unknown commit'})."
+        )
+    print(f"No throughput regression of more than {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+"""Data-plane throughput benchmark.
+
+Measures how fast the objects move through the upload (`DataUploaderService`), the folder
+download (`BucketClient.download_folder`), the incremental extraction
+(`extract_data_source`) and the dataset download (`Dataset.download`), on a synthetic data
+source stored in a `LocalFSBucketClient`, optionally behind a simulated network.
+
+Every scenario runs in a fresh process and reports objects/s, MB/s, the p50/p99 latency
+of the object transfers and its peak RSS. The results are saved as JSON:
+
+    python -m src.benchmarks.benchmark_data_plane --objects 10000 --latency 0.005 \
+        --bandwidth 100 --output benchmark_data_plane.json
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from minio.helpers import ObjectWriteResult
+
+from src.config.settings import (
+    BUCKET_CLIENT_MAX_WORKERS,
+    MLFLOW_BENCHMARK_EXPERIMENT_NAME,
+)
+from src.models.model_data_source import LocalDataSource
+from src.models.model_dataset import Dataset
+from src.models.model_local_bucket_client import LocalFSBucketClient
+from src.services.service_data_uploader import DataUploaderService
+from src.services.service_dataset_creator import (
+    DATA_SOURCE_ANNOTATIONS_FOLDER,
+    DATA_SOURCE_IMAGES_FOLDER,
+    DatasetCreatorService,
+)
+from src.steps.data.dataset_preparators import extract_data_source
+from src.utils.benchmark_helper import (
+    get_run_info,
+    run_isolated,
+    save_results,
+    summarize_transfers,
+)
+from src.utils.tracker_helper import log_benchmark_results
+
+SIZE_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+# Spread of the log-normal sizes, most objects being smaller than the mean
+LOGNORMAL_SIGMA = 1.0
+
+DATA_SOURCE_NAME = "synthetic"
+DATA_SOURCES_BUCKET_NAME = "data-sources"
+DATASETS_BUCKET_NAME = "datasets"
+
+
+class TimedBucketClient(LocalFSBucketClient):
+    # Records the latency and size of every object uploaded or downloaded as a file
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: list[float] = []
+        self.sizes: list[int] = []
+        self._lock = threading.Lock()
+
+    def upload_file(
+        self, bucket_name: str, object_name: str, file_path: str, *args, **kwargs
+    ) -> ObjectWriteResult:
+        start_time = time.perf_counter()
+        result = super().upload_file(
+            bucket_name, object_name, file_path, *args, **kwargs
+        )
+        self._record(start_time, os.path.getsize(file_path))
+        return result
+
+    def download_file(self, bucket_name: str, object_name: str, file_path: str):
+        start_time = time.perf_counter()
+        super().download_file(bucket_name, object_name, file_path)
+        self._record(start_time, os.path.getsize(file_path))
+
+    def _record(self, start_time: float, size: int) -> None:
+        latency = time.perf_counter() - start_time
+        with self._lock:
+            self.latencies.append(latency)
+            self.sizes.append(size)
+
+
+def generate_object_sizes(
+    count: int, distribution: str, mean_size: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Draws the sizes of synthetic objects.
+
+    Args:
+        count (int): Number of objects.
+        distribution (str): "fixed", "uniform" (between 1 byte and twice the mean) or
+            "lognormal" (a long tail of large objects).
+        mean_size (int): The mean size in bytes.
+        rng (np.random.Generator): The random generator.
+
+    Returns:
+        np.ndarray: The sizes in bytes, at least 1.
+    """
+    if distribution == "fixed":
+        sizes = np.full(count, mean_size)
+    elif distribution == "uniform":
+        sizes = rng.integers(1, 2 * mean_size, size=count, endpoint=True)
+    elif distribution == "lognormal":
+        sizes = rng.lognormal(
+            mean=np.log(mean_size) - LOGNORMAL_SIGMA**2 / 2,
+            sigma=LOGNORMAL_SIGMA,
+            size=count,
+        )
+    else:
+        raise ValueError(
+            f"Unknown size distribution {distribution}, expected one of"
+            f" {SIZE_DISTRIBUTIONS}"
+        )
+
+    return np.maximum(sizes, 1).astype(np.int64)
+
+
+def generate_data_source(
+    data_source_path: str,
+    num_objects: int,
+    distribution: str,
+    mean_size: int,
+    seed: int = 0,
+) -> None:
+    """
+    Writes a synthetic local data source: pairs of images and annotations with random
+    content, named by a hash as the uploaded objects are.
+
+    Args:
+        data_source_path (str): The folder of the data source.
+        num_objects (int): Number of files, half images and half annotations.
+        distribution (str): The distribution of the file sizes, see generate_object_sizes.
+        mean_size (int): The mean file size in bytes.
+        seed (int): The seed of the sizes and contents.
+    """
+    rng = np.random.default_rng(seed)
+    num_samples = max(num_objects // 2, 1)
+    sizes = generate_object_sizes(2 * num_samples, distribution, mean_size, rng)
+
+    for folder_name in (DATA_SOURCE_IMAGES_FOLDER, DATA_SOURCE_ANNOTATIONS_FOLDER):
+        os.makedirs(os.path.join(data_source_path, folder_name), exist_ok=True)
+
+    for sample in range(num_samples):
+        name = hashlib.blake2b(f"{seed}-{sample}".encode(), digest_size=16).hexdigest()
+        for folder_name, size in zip(
+            (DATA_SOURCE_IMAGES_FOLDER, DATA_SOURCE_ANNOTATIONS_FOLDER),
+            sizes[2 * sample : 2 * sample + 2],
+        ):
+            with open(
+                os.path.join(data_source_path, folder_name, f"{name}.png"), "wb"
+            ) as file:
+                file.write(rng.bytes(int(size)))
+
+
+def benchmark_upload(
+    data_source_path: str, bucket_path: str, network: dict, max_workers: int
+) -> dict:
+    bucket_client = TimedBucketClient(bucket_path, **network)
+    bucket_client.make_bucket(DATA_SOURCES_BUCKET_NAME, enable_versioning=False)
+    uploader = DataUploaderService(bucket_client, max_workers=max_workers)
+
+    start_time = time.perf_counter()
+    uploader.upload_data(
+        DATA_SOURCES_BUCKET_NAME, LocalDataSource(data_source_path, label_map={})
+    )
+    elapsed_seconds = time.perf_counter() - start_time
+
+    return summarize_transfers(
+        bucket_client.latencies, bucket_client.sizes, elapsed_seconds
+    )
+
+
+def benchmark_download_folder(
+    bucket_path: str, destination_path: str, network: dict, max_workers: int
+) -> dict:
+    bucket_client = TimedBucketClient(bucket_path, **network)
+
+    start_time = time.perf_counter()
+    bucket_client.download_folder(
+        DATA_SOURCES_BUCKET_NAME,
+        f"{DATA_SOURCE_NAME}/",
+        destination_path,
+        max_workers=max_workers,
+    )
+    elapsed_seconds = time.perf_counter() - start_time
+
+    return summarize_transfers(
+        bucket_client.latencies, bucket_client.sizes, elapsed_seconds
+    )
+
+
+def benchmark_extract(
+    bucket_path: str, destination_path: str, network: dict, max_workers: int
+) -> dict:
+    bucket_client = TimedBucketClient(bucket_path, **network)
+
+    start_time = time.perf_counter()
+    extract_data_source(
+        bucket_client,
+        DATA_SOURCE_NAME,
+        DATA_SOURCES_BUCKET_NAME,
+        destination_path,
+        max_workers=max_workers,
+    )
+    elapsed_seconds = time.perf_counter() - start_time
+
+    return summarize_transfers(
+        bucket_client.latencies, bucket_client.sizes, elapsed_seconds
+    )
+
+
+def benchmark_dataset_download(
+    bucket_path: str,
+    destination_path: str,
+    network: dict,
+    max_workers: int,
+    dataset: Dataset,
+) -> dict:
+    bucket_client = TimedBucketClient(bucket_path, **network)
+
+    start_time = time.perf_counter()
+    dataset.download(bucket_client, destination_path, max_workers=max_workers)
+    elapsed_seconds = time.perf_counter() - start_time
+
+    return summarize_transfers(
+        bucket_client.latencies, bucket_client.sizes, elapsed_seconds
+    )
+
+
+SCENARIOS = ("upload", "download_folder", "extract", "dataset_download")
+
+
+def prepare_buckets(data_source_path: str, bucket_path: str) -> Dataset:
+    """
+    Uploads the synthetic data source and creates a dataset from it, without simulated
+    network, for the download scenarios.
+
+    Args:
+        data_source_path (str): The folder of the synthetic data source.
+        bucket_path (str): The root folder of the stand-in buckets.
+
+    Returns:
+        Dataset: The created dataset.
+    """
+    bucket_client = LocalFSBucketClient(bucket_path)
+    bucket_client.make_bucket(DATA_SOURCES_BUCKET_NAME, enable_versioning=False)
+    bucket_client.make_bucket(DATASETS_BUCKET_NAME, enable_versioning=False)
+
+    data_source = LocalDataSource(data_source_path, label_map={})
+    DataUploaderService(bucket_client).upload_data(
+        DATA_SOURCES_BUCKET_NAME, data_source
+    )
+
+    dataset = Dataset(
+        bucket_name=DATASETS_BUCKET_NAME,
+        seed=0,
+        annotations_path=DATA_SOURCE_ANNOTATIONS_FOLDER,
+        images_path=DATA_SOURCE_IMAGES_FOLDER,
+    )
+    DatasetCreatorService(bucket_client).create_dataset(
+        dataset, DATA_SOURCES_BUCKET_NAME, [data_source]
+    )
+    return dataset
+
+
+def run_benchmark(
+    num_objects: int,
+    distribution: str = "lognormal",
+    mean_size: int = 100_000,
+    latency: float = 0.0,
+    bandwidth: float | None = None,
+    max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+    scenarios: tuple[str, ...] = SCENARIOS,
+    seed: int = 0,
+    work_path: str | None = None,
+) -> dict:
+    """
+    Runs the data-plane scenarios on a synthetic data source.
+
+    Args:
+        num_objects (int): Number of objects of the data source.
+        distribution (str): The distribution of the object sizes, see
+            generate_object_sizes.
+        mean_size (int): The mean object size in bytes.
+        latency (float): Simulated time to first byte of every request, in seconds.
+        bandwidth (float | None): Simulated throughput in MB/s, None for unlimited.
+        max_workers (int): Number of concurrent transfers.
+        scenarios (tuple[str, ...]): The scenarios to run, among SCENARIOS.
+        seed (int): The seed of the synthetic data source.
+        work_path (str | None): The folder of the temporary files, defaults to the
+            system's temporary folder.
+
+    Returns:
+        dict: The parameters of the run, the host and the results of every scenario.
+    """
+    network = {
+        "latency": latency,
+        "bandwidth": bandwidth * 1e6 if bandwidth else None,
+    }
+    results = {
+        "benchmark": "data_plane",
+        "run": get_run_info(),
+        "parameters": {
+            "num_objects": num_objects,
+            "distribution": distribution,
+            "mean_size": mean_size,
+            "latency": latency,
+            "bandwidth": bandwidth,
+            "max_workers": max_workers,
+            "seed": seed,
+        },
+        "scenarios": {},
+    }
+
+    with tempfile.TemporaryDirectory(dir=work_path) as tmp_path:
+        data_source_path = os.path.join(tmp_path, "source", DATA_SOURCE_NAME)
+        generate_data_source(
+            data_source_path, num_objects, distribution, mean_size, seed
+        )
+
+        bucket_path = os.path.join(tmp_path, "buckets")
+        dataset = None
+        if any(scenario != "upload" for scenario in scenarios):
+            dataset = prepare_buckets(data_source_path, bucket_path)
+
+        for scenario in scenarios:
+            destination_path = os.path.join(tmp_path, scenario)
+            if scenario == "upload":
+                scenario_results = run_isolated(
+                    benchmark_upload,
+                    data_source_path,
+                    destination_path,
+                    network,
+                    max_workers,
+                )
+            elif scenario == "download_folder":
+                scenario_results = run_isolated(
+                    benchmark_download_folder,
+                    bucket_path,
+                    destination_path,
+                    network,
+                    max_workers,
+                )
+            elif scenario == "extract":
+                scenario_results = run_isolated(
+                    benchmark_extract,
+                    bucket_path,
+                    destination_path,
+                    network,
+                    max_workers,
+                )
+            elif scenario == "dataset_download":
+                scenario_results = run_isolated(
+                    benchmark_dataset_download,
+                    bucket_path,
+                    destination_path,
+                    network,
+                    max_workers,
+                    dataset,
+                )
+            else:
+                raise ValueError(
+                    f"Unknown scenario {scenario}, expected one of {SCENARIOS}"
+                )
+
+            results["scenarios"][scenario] = scenario_results
+
+    return results
+
+
+def format_results(results: dict) -> str:
+    """
+    Formats the results of the scenarios as a table.
+
+    Args:
+        results (dict): The results of run_benchmark.
+
+    Returns:
+        str: One line per scenario.
+    """
+    lines = [
+        f"{'scenario':<18}{'objects':>9}{'obj/s':>11}{'MB/s':>10}{'p50 ms':>10}"
+        f"{'p99 ms':>10}{'RSS MB':>10}"
+    ]
+    for scenario, scenario_results in results["scenarios"].items():
+        lines.append(
+            f"{scenario:<18}{scenario_results['objects']:>9}"
+            f"{scenario_results['objects_per_second']:>11.1f}"
+            f"{scenario_results['mb_per_second']:>10.2f}"
+            f"{scenario_results['latency_p50_ms']:>10.2f}"
+            f"{scenario_results['latency_p99_ms']:>10.2f}"
+            f"{scenario_results['peak_rss_mb']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--objects", type=int, default=1000)
+    parser.add_argument(
+        "--size-distribution", choices=SIZE_DISTRIBUTIONS, default="lognormal"
+    )
+    parser.add_argument(
+        "--mean-size", type=int, default=100_000, help="Mean object size in bytes."
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Simulated latency in seconds."
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, default=None, help="Simulated bandwidth in MB/s."
+    )
+    parser.add_argument("--max-workers", type=int, default=BUCKET_CLIENT_MAX_WORKERS)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-path", default=None)
+    parser.add_argument(
+        "--log-mlflow",
+        action="store_true",
+        help="Log the results to the benchmarks experiment of the MLflow tracker.",
+    )
+    parser.add_argument("--output", default="benchmark_data_plane.json")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        num_objects=args.objects,
+        distribution=args.size_distribution,
+        mean_size=args.mean_size,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        max_workers=args.max_workers,
+        scenarios=tuple(args.scenarios),
+        seed=args.seed,
+        work_path=args.work_path,
+    )
+    save_results(results, args.output)
+
+    print(format_results(results))
+    print(f"Results saved to {args.output}")
+
+    if args.log_mlflow:
+        run_id = log_benchmark_results(results, MLFLOW_BENCHMARK_EXPERIMENT_NAME)
+        if run_id is None:
+            print(
+                "No MLflow experiment tracker in the active stack, results not logged."
+            )
+        else:
+            print(f"Results logged to the MLflow run {run_id}")
+
+
+if __name__ == "__main__":
+    main()
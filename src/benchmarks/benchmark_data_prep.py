@@ -0,0 +1,442 @@
+"""Data-prep stages benchmark.
+
+Times the local data preparation stages on synthetic human-parsing-style samples, at
+several dataset sizes to draw their scaling curves:
+
+- convert: the masks to YOLO labels conversion (`convert_dataset_to_yolo`)
+- validate: the deep dataset validation (`validate_dataset`)
+- split: the train/val/test split (`dataset_splitter`)
+- to_yolo_format: the JSON annotations to YOLO conversion (`Dataset.to_yolo_format`)
+
+Every stage runs in a fresh process and reports samples/s and its peak RSS. The results
+are saved as JSON:
+
+    python -m src.benchmarks.benchmark_data_prep --samples 1000 10000 100000 \
+        --width 400 --height 600 --classes 18 --objects 8 --output benchmark_data_prep.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import cv2
+import numpy as np
+
+from src.config.settings import (
+    DATASET_VALIDATION_MAX_WORKERS,
+    MLFLOW_BENCHMARK_EXPERIMENT_NAME,
+    YOLO_CONVERSION_MAX_WORKERS,
+)
+from src.models.model_dataset import Dataset
+from src.steps.data.dataset_splitter import dataset_splitter
+from src.steps.data.dataset_to_yolo_converter import convert_dataset_to_yolo
+from src.steps.data.dataset_validator import validate_dataset
+from src.utils.benchmark_helper import get_run_info, run_isolated, save_results
+from src.utils.concurrency_helper import bounded_map, chunked
+from src.utils.tracker_helper import log_benchmark_results
+
+STAGES = ("convert", "validate", "split", "to_yolo_format")
+DEFAULT_SAMPLE_COUNTS = (1000, 10000, 100000)
+
+# Number of samples generated per task
+GENERATION_CHUNK_SIZE = 256
+# Relative size bounds of the synthetic objects
+MIN_OBJECT_SIZE = 0.05
+MAX_OBJECT_SIZE = 0.25
+
+
+def generate_parsing_sample(
+    rng: np.random.Generator,
+    width: int,
+    height: int,
+    num_classes: int,
+    num_objects: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Draws a synthetic human-parsing-style sample: a mask of overlapping class regions on a
+    background (class 0), and the image painted from it.
+
+    Args:
+        rng (np.random.Generator): The random generator of the sample.
+        width (int): The width of the sample in pixels.
+        height (int): The height of the sample in pixels.
+        num_classes (int): Number of classes, background included.
+        num_objects (int): Number of regions drawn, the later ones occluding the earlier.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The BGR image and the mask of class ids.
+    """
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for _ in range(num_objects):
+        center = (int(rng.integers(width)), int(rng.integers(height)))
+        axes = (
+            int(width * rng.uniform(MIN_OBJECT_SIZE, MAX_OBJECT_SIZE)),
+            int(height * rng.uniform(MIN_OBJECT_SIZE, MAX_OBJECT_SIZE)),
+        )
+        class_id = int(rng.integers(1, num_classes)) if num_classes > 1 else 0
+        cv2.ellipse(
+            mask, center, axes, float(rng.uniform(0, 180)), 0, 360, class_id, -1
+        )
+
+    palette = rng.integers(0, 256, size=(max(num_classes, 1), 3), dtype=np.uint8)
+    return palette[mask], mask
+
+
+def generate_samples(
+    sample_indices: list[int],
+    dataset_path: str,
+    width: int,
+    height: int,
+    num_classes: int,
+    num_objects: int,
+    seed: int,
+) -> int:
+    """
+    Writes a chunk of synthetic samples, in the layout of an extracted data source
+    (`images` and `annotations` masks) and in the layout of a downloaded dataset
+    (`<split>/images` and `<split>/labels` JSON annotations). Defined at module level so
+    that it can run in a process pool.
+
+    Args:
+        sample_indices (list[int]): The indices of the samples, seeding them.
+        dataset_path (str): The folder of the samples.
+        width (int): The width of the samples in pixels.
+        height (int): The height of the samples in pixels.
+        num_classes (int): Number of classes, background included.
+        num_objects (int): Number of regions drawn per mask.
+        seed (int): The seed of the samples.
+
+    Returns:
+        int: The number of written samples.
+    """
+    for sample_index in sample_indices:
+        rng = np.random.default_rng([seed, sample_index])
+        image, mask = generate_parsing_sample(
+            rng, width, height, num_classes, num_objects
+        )
+        name = f"{sample_index:08x}"
+
+        image_path = os.path.join(dataset_path, "source", "images", f"{name}.png")
+        cv2.imwrite(image_path, image)
+        cv2.imwrite(
+            os.path.join(dataset_path, "source", "annotations", f"{name}.png"), mask
+        )
+
+        # The JSON annotations of the datasets: the boxes of the drawn classes
+        annotation = {"label": [], "bbox": []}
+        for class_id in np.unique(mask)[1:]:
+            x, y, box_width, box_height = cv2.boundingRect(
+                (mask == class_id).astype(np.uint8)
+            )
+            annotation["label"].append(int(class_id))
+            annotation["bbox"].append(
+                [
+                    (x + box_width / 2) / width,
+                    (y + box_height / 2) / height,
+                    box_width / width,
+                    box_height / height,
+                ]
+            )
+
+        split_name = ("train", "test", "validation")[sample_index % 3]
+        split_path = os.path.join(dataset_path, "dataset", split_name)
+        os.link(image_path, os.path.join(split_path, "images", f"{name}.png"))
+        with open(os.path.join(split_path, "labels", f"{name}.json"), "w") as file:
+            json.dump(annotation, file)
+
+    return len(sample_indices)
+
+
+def generate_dataset(
+    dataset_path: str,
+    num_samples: int,
+    width: int,
+    height: int,
+    num_classes: int,
+    num_objects: int,
+    seed: int = 0,
+) -> None:
+    """
+    Writes the synthetic samples of a benchmark on a process pool, see generate_samples.
+
+    Args:
+        dataset_path (str): The folder of the samples.
+        num_samples (int): Number of samples.
+        width (int): The width of the samples in pixels.
+        height (int): The height of the samples in pixels.
+        num_classes (int): Number of classes, background included.
+        num_objects (int): Number of regions drawn per mask.
+        seed (int): The seed of the samples.
+    """
+    for folder_path in ("source/images", "source/annotations"):
+        os.makedirs(os.path.join(dataset_path, folder_path), exist_ok=True)
+    for split_name in ("train", "test", "validation"):
+        for folder_name in ("images", "labels"):
+            os.makedirs(
+                os.path.join(dataset_path, "dataset", split_name, folder_name),
+                exist_ok=True,
+            )
+
+    with open(os.path.join(dataset_path, "source", "label_map.json"), "w") as file:
+        json.dump({str(i): f"class_{i}" for i in range(num_classes)}, file)
+
+    generate_chunk = partial(
+        generate_samples,
+        dataset_path=dataset_path,
+        width=width,
+        height=height,
+        num_classes=num_classes,
+        num_objects=num_objects,
+        seed=seed,
+    )
+    max_workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for _ in bounded_map(
+            generate_chunk,
+            chunked(range(num_samples), GENERATION_CHUNK_SIZE),
+            max_workers=max_workers,
+            executor=executor,
+        ):
+            pass
+
+
+def benchmark_convert(
+    source_path: str, imgsz: int | None, max_workers: int | None
+) -> dict:
+    start_time = time.perf_counter()
+    convert_dataset_to_yolo(source_path, imgsz=imgsz, max_workers=max_workers)
+    return {"seconds": time.perf_counter() - start_time}
+
+
+def benchmark_validate(source_path: str, max_workers: int) -> dict:
+    start_time = time.perf_counter()
+    validate_dataset(source_path, deep=True, max_workers=max_workers)
+    return {"seconds": time.perf_counter() - start_time}
+
+
+def benchmark_split(source_path: str) -> dict:
+    start_time = time.perf_counter()
+    dataset_splitter.entrypoint(source_path, split_mode="hardlink")
+    return {"seconds": time.perf_counter() - start_time}
+
+
+def benchmark_to_yolo_format(dataset_path: str) -> dict:
+    dataset = Dataset(bucket_name="", seed=0, annotations_path="labels")
+
+    start_time = time.perf_counter()
+    dataset.to_yolo_format(dataset_path)
+    return {"seconds": time.perf_counter() - start_time}
+
+
+def run_stages(
+    dataset_path: str,
+    stages: tuple[str, ...],
+    imgsz: int | None,
+    conversion_max_workers: int | None,
+    validation_max_workers: int,
+) -> dict[str, dict]:
+    """
+    Runs the stages, in order, on generated samples.
+
+    Args:
+        dataset_path (str): The folder of the generated samples.
+        stages (tuple[str, ...]): The stages to run, among STAGES. The validation and the
+            split need the labels written by the conversion.
+        imgsz (int | None): The training image size of the conversion.
+        conversion_max_workers (int | None): Number of conversion processes.
+        validation_max_workers (int): Number of validation threads.
+
+    Returns:
+        dict[str, dict]: The results of every stage.
+    """
+    source_path = os.path.join(dataset_path, "source")
+    results = {}
+    for stage in stages:
+        if stage == "convert":
+            results[stage] = run_isolated(
+                benchmark_convert, source_path, imgsz, conversion_max_workers
+            )
+        elif stage == "validate":
+            results[stage] = run_isolated(
+                benchmark_validate, source_path, validation_max_workers
+            )
+        elif stage == "split":
+            results[stage] = run_isolated(benchmark_split, source_path)
+        elif stage == "to_yolo_format":
+            results[stage] = run_isolated(
+                benchmark_to_yolo_format, os.path.join(dataset_path, "dataset")
+            )
+        else:
+            raise ValueError(f"Unknown stage {stage}, expected one of {STAGES}")
+
+    return results
+
+
+def run_benchmark(
+    sample_counts: tuple[int, ...] = DEFAULT_SAMPLE_COUNTS,
+    width: int = 400,
+    height: int = 600,
+    num_classes: int = 18,
+    num_objects: int = 8,
+    stages: tuple[str, ...] = STAGES,
+    imgsz: int | None = None,
+    conversion_max_workers: int | None = YOLO_CONVERSION_MAX_WORKERS,
+    validation_max_workers: int = DATASET_VALIDATION_MAX_WORKERS,
+    seed: int = 0,
+    work_path: str | None = None,
+) -> dict:
+    """
+    Runs the data-prep stages on synthetic datasets of increasing sizes.
+
+    Args:
+        sample_counts (tuple[int, ...]): The dataset sizes, in samples.
+        width (int): The width of the samples in pixels.
+        height (int): The height of the samples in pixels.
+        num_classes (int): Number of classes, background included.
+        num_objects (int): Number of regions drawn per mask.
+        stages (tuple[str, ...]): The stages to run, among STAGES.
+        imgsz (int | None): The training image size of the conversion.
+        conversion_max_workers (int | None): Number of conversion processes.
+        validation_max_workers (int): Number of validation threads.
+        seed (int): The seed of the samples.
+        work_path (str | None): The folder of the temporary files, defaults to the
+            system's temporary folder.
+
+    Returns:
+        dict: The parameters of the run, the host and the results of every stage at every
+            size, named "<stage>_<samples>".
+    """
+    results = {
+        "benchmark": "data_prep",
+        "run": get_run_info(),
+        "parameters": {
+            "sample_counts": list(sample_counts),
+            "width": width,
+            "height": height,
+            "num_classes": num_classes,
+            "num_objects": num_objects,
+            "imgsz": imgsz,
+            "conversion_max_workers": conversion_max_workers,
+            "validation_max_workers": validation_max_workers,
+            "seed": seed,
+        },
+        "scenarios": {},
+    }
+
+    for num_samples in sample_counts:
+        # The samples of one size at a time are kept on disk
+        dataset_path = tempfile.mkdtemp(dir=work_path)
+        try:
+            generate_dataset(
+                dataset_path, num_samples, width, height, num_classes, num_objects, seed
+            )
+            stage_results = run_stages(
+                dataset_path,
+                stages,
+                imgsz,
+                conversion_max_workers,
+                validation_max_workers,
+            )
+        finally:
+            shutil.rmtree(dataset_path, ignore_errors=True)
+
+        for stage, scenario_results in stage_results.items():
+            results["scenarios"][f"{stage}_{num_samples}"] = {
+                "stage": stage,
+                "samples": num_samples,
+                "samples_per_second": num_samples / scenario_results["seconds"],
+                **scenario_results,
+            }
+
+    return results
+
+
+def format_results(results: dict) -> str:
+    """
+    Formats the results of the stages as a table.
+
+    Args:
+        results (dict): The results of run_benchmark.
+
+    Returns:
+        str: One line per stage and size.
+    """
+    lines = [
+        f"{'stage':<16}{'samples':>9}{'seconds':>10}{'samples/s':>12}{'RSS MB':>10}"
+    ]
+    for scenario_results in results["scenarios"].values():
+        lines.append(
+            f"{scenario_results['stage']:<16}{scenario_results['samples']:>9}"
+            f"{scenario_results['seconds']:>10.2f}"
+            f"{scenario_results['samples_per_second']:>12.1f}"
+            f"{scenario_results['peak_rss_mb']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--samples", type=int, nargs="+", default=list(DEFAULT_SAMPLE_COUNTS)
+    )
+    parser.add_argument("--width", type=int, default=400)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument(
+        "--classes", type=int, default=18, help="Number of classes, with background."
+    )
+    parser.add_argument(
+        "--objects", type=int, default=8, help="Number of regions drawn per mask."
+    )
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--imgsz", type=int, default=None)
+    parser.add_argument(
+        "--conversion-max-workers", type=int, default=YOLO_CONVERSION_MAX_WORKERS
+    )
+    parser.add_argument(
+        "--validation-max-workers", type=int, default=DATASET_VALIDATION_MAX_WORKERS
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-path", default=None)
+    parser.add_argument(
+        "--log-mlflow",
+        action="store_true",
+        help="Log the results to the benchmarks experiment of the MLflow tracker.",
+    )
+    parser.add_argument("--output", default="benchmark_data_prep.json")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        sample_counts=tuple(args.samples),
+        width=args.width,
+        height=args.height,
+        num_classes=args.classes,
+        num_objects=args.objects,
+        stages=tuple(args.stages),
+        imgsz=args.imgsz,
+        conversion_max_workers=args.conversion_max_workers,
+        validation_max_workers=args.validation_max_workers,
+        seed=args.seed,
+        work_path=args.work_path,
+    )
+    save_results(results, args.output)
+
+    print(format_results(results))
+    print(f"Results saved to {args.output}")
+
+    if args.log_mlflow:
+        run_id = log_benchmark_results(results, MLFLOW_BENCHMARK_EXPERIMENT_NAME)
+        if run_id is None:
+            print(
+                "No MLflow experiment tracker in the active stack, results not logged."
+            )
+        else:
+            print(f"Results logged to the MLflow run {run_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,63 @@ MINIO_PENDING_REVIEWS_BUCKET_NAME: str = config("MINIO_PENDING_REVIEWS_BUCKET_NA
 MINIO_DATA_SOURCES_BUCKET_NAME: str = config("MINIO_DATA_SOURCES_BUCKET_NAME")
 MINIO_DATASETS_BUCKET_NAME: str = config("MINIO_DATASETS_BUCKET_NAME")
 
+# Number of concurrent transfers used by the bucket clients
+BUCKET_CLIENT_MAX_WORKERS: int = 10
+# HTTP transport of the bucket clients: connections kept alive per host (at least the
+# number of concurrent transfers times the parallel multipart parts), timeouts in seconds
+# and retries with a jittered exponential backoff on throttling and 5xx errors
+BUCKET_CLIENT_POOL_MAXSIZE: int = 64
+BUCKET_CLIENT_CONNECT_TIMEOUT: float = 10.0
+BUCKET_CLIENT_READ_TIMEOUT: float = 300.0
+BUCKET_CLIENT_MAX_RETRIES: int = 5
+BUCKET_CLIENT_BACKOFF_FACTOR: float = 0.2
+BUCKET_CLIENT_BACKOFF_JITTER: float = 0.5
+BUCKET_CLIENT_TCP_KEEPALIVE: bool = True
+# Download the objects of MinioClient with an async client on one event loop instead of
+# a thread per transfer, and its number of in-flight requests
+BUCKET_CLIENT_ASYNC_DOWNLOADS: bool = False
+ASYNC_BUCKET_CLIENT_MAX_CONCURRENCY: int = 512
+
+# Data sources upload: "decoded" re-encodes the images with PIL, "raw" uploads the
+# dataset's encoded bytes as-is. The hash algorithm names the uploaded objects.
+UPLOAD_INGESTION_MODE: str = "decoded"
+UPLOAD_HASH_ALGORITHM: str = "sha256"
+# Local files larger than the part size are uploaded in parallel multipart parts
+UPLOAD_MULTIPART_PART_SIZE: int = 16 * 1024 * 1024
+UPLOAD_MULTIPART_PARALLEL_PARTS: int = 4
+# Stream the HuggingFace data sources instead of caching them before the upload
+UPLOAD_STREAMING: bool = False
+# Pack the HuggingFace data sources into indexed tar shards instead of one object per file
+UPLOAD_SHARD_FORMAT: bool = False
+# Do not upload again the HuggingFace objects whose content hash is already in the bucket
+UPLOAD_SKIP_EXISTING: bool = False
+SHARD_TARGET_SIZE: int = 256 * 1024 * 1024
+
+# Masks to YOLO labels conversion: number of processes (None for one per CPU) and number
+# of masks converted per task
+YOLO_CONVERSION_MAX_WORKERS: int | None = None
+YOLO_CONVERSION_CHUNK_SIZE: int = 64
+# Number of threads converting the JSON annotations of a Dataset to YOLO labels, which
+# only read small files and PNG headers, and number of annotations converted per task
+DATASET_YOLO_CONVERSION_MAX_WORKERS: int = 16
+DATASET_ANNOTATION_CONVERSION_CHUNK_SIZE: int = 64
+# Number of threads checking the image headers in the deep dataset validation
+DATASET_VALIDATION_MAX_WORKERS: int = 16
+# How dataset_splitter places the files in the splits: "copy", "hardlink", "symlink" or
+# "list" (Ultralytics image list files). The links share the files with the dataset, so
+# editing a split file in place also edits the dataset's file.
+DATASET_SPLIT_MODE: str = "copy"
+# Relative size of the train, val and test splits, and salt of the hash assigning the
+# samples to the splits
+DATASET_SPLIT_RATIOS: list[float] = [0.8, 0.1, 0.1]
+DATASET_SPLIT_SALT: str = ""
+
+# Local cache of the objects downloaded by the bucket clients, shared by the processes of
+# the machine, e.g. "/var/cache/objects". None disables it; a relative path is resolved
+# from the working directory.
+OBJECT_CACHE_PATH: str | None = None
+OBJECT_CACHE_MAX_BYTES: int = 20 * 1024 * 1024 * 1024
+
 YOLO_PRE_TRAINED_WEIGHTS_PATH: str = "ultralytics"
 EXTRACTED_DATASETS_PATH: str = "datasets"
 DATASET_YOLO_CONFIG_NAME: str = "dataset.yaml"
@@ -24,6 +81,9 @@ YOLO_PRE_TRAINED_WEIGHTS_URL: str = f"https://github.com/ultralytics/assets/rele
 
 MLFLOW_EXPERIMENT_PIPELINE_NAME: str = "local-experiment-pipeline"
 MLFLOW_END_TO_END_PIPELINE_NAME: str = "production-end-to-end-pipeline"
+MLFLOW_BENCHMARK_EXPERIMENT_NAME: str = "benchmarks"
+# Relative throughput drop from the baseline flagged as a regression by benchmark_compare
+BENCHMARK_REGRESSION_THRESHOLD: float = 0.1
 
 # define thresholds
 ACCURACY_THRESHOLD: float = 0.8
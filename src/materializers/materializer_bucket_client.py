@@ -8,10 +8,13 @@ from zenml.materializers.base_materializer import BaseMaterializer
 
 from src.config.settings import MINIO_ENDPOINT, MINIO_ROOT_PASSWORD, MINIO_ROOT_USER
 from src.models.model_bucket_client import BucketClient, MinioClient
+from src.models.model_http_transport import HttpTransport
+from src.models.model_local_bucket_client import LocalFSBucketClient
+from src.models.model_object_cache import ObjectCache
 
 
 class BucketClientMaterializer(BaseMaterializer):
-    ASSOCIATED_TYPES = (BucketClient, MinioClient)
+    ASSOCIATED_TYPES = (BucketClient, MinioClient, LocalFSBucketClient)
     ASSOCIATED_ARTIFACT_TYPE = ArtifactType.DATA
 
     def load(self, data_type: Type[BucketClient]) -> BucketClient:
@@ -20,12 +23,26 @@ class BucketClientMaterializer(BaseMaterializer):
         with fileio.open(data_path, "r") as f:
             config = json.load(f)
 
+        object_cache_config = config.get("object_cache")
+        object_cache = (
+            ObjectCache(**object_cache_config) if object_cache_config else None
+        )
+
         if config["class"] == "MinioClient":
             return MinioClient(
                 endpoint=MINIO_ENDPOINT,
                 access_key=MINIO_ROOT_USER,
                 secret_key=MINIO_ROOT_PASSWORD,
                 secure=config["secure"],
+                object_cache=object_cache,
+                transport=HttpTransport(**config.get("transport", {})),
+                async_downloads=config.get("async_downloads", False),
+            )
+        elif config["class"] == "LocalFSBucketClient":
+            return LocalFSBucketClient(
+                root_path=config["root_path"],
+                object_cache=object_cache,
+                **config["simulator"],
             )
         else:
             raise NotImplementedError(
@@ -35,12 +52,26 @@ class BucketClientMaterializer(BaseMaterializer):
     def save(self, bucket_client: BucketClient) -> None:
         """Serialize BucketClient object."""
         if isinstance(bucket_client, MinioClient):
-            config = {"class": "MinioClient", "secure": bucket_client.secure}
+            config = {
+                "class": "MinioClient",
+                "secure": bucket_client.secure,
+                "transport": bucket_client.transport.to_dict(),
+                "async_downloads": bucket_client.async_client is not None,
+            }
+        elif isinstance(bucket_client, LocalFSBucketClient):
+            config = {
+                "class": "LocalFSBucketClient",
+                "root_path": bucket_client.root_path,
+                "simulator": bucket_client.simulator.to_dict(),
+            }
         else:
             raise NotImplementedError(
                 f"Serialization for {type(bucket_client)} not implemented"
             )
 
+        if bucket_client.object_cache is not None:
+            config["object_cache"] = bucket_client.object_cache.to_dict()
+
         data_path = os.path.join(self.uri, "bucket_client_config.json")
         with fileio.open(data_path, "w") as f:
             json.dump(config, f)
@@ -23,6 +23,7 @@ class DatasetMaterializer(BaseMaterializer):
             "images_path": dataset.images_path,
             "distribution_weights": dataset.distribution_weights,
             "label_map": dataset.label_map,
+            "manifest_path": dataset.manifest_path,
         }
 
         data_path = os.path.join(self.uri, "dataset_config.json")
@@ -42,6 +43,7 @@ class DatasetMaterializer(BaseMaterializer):
             images_path=serialized_dataset["images_path"],
             distribution_weights=serialized_dataset["distribution_weights"],
             label_map=serialized_dataset["label_map"],
+            manifest_path=serialized_dataset.get("manifest_path"),
         )
         dataset.uuid = serialized_dataset["uuid"]  # Manually setting the uuid
 
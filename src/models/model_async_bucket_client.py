@@ -0,0 +1,518 @@
+import asyncio
+import datetime
+import hashlib
+import hmac
+import os
+import xml.etree.ElementTree as ElementTree
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable
+from urllib.parse import quote
+
+import aiohttp
+import tqdm
+from minio.datatypes import Object
+from yarl import URL
+
+from src.config.settings import ASYNC_BUCKET_CLIENT_MAX_CONCURRENCY
+from src.models.model_object_cache import ObjectCache
+from src.models.model_transfer_stats import TransferStats
+from src.utils.concurrency_helper import async_bounded_map
+
+S3_XML_NAMESPACE = {"s3": "http://s3.amazonaws.com/doc/2006-03-01/"}
+EMPTY_PAYLOAD_SHA256 = hashlib.sha256(b"").hexdigest()
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+# Size of the chunks streamed between the files and the connections
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_file(file_path: str) -> str:
+    # Blocking, run in a thread: the SHA-256 of the file, read in chunks
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(TRANSFER_CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class AsyncBucketClient(ABC):
+    # Local cache of the downloaded objects, None to always download them
+    object_cache: ObjectCache | None = None
+
+    @abstractmethod
+    async def bucket_exists(self, bucket_name: str) -> bool:
+        pass
+
+    @abstractmethod
+    def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ) -> AsyncIterator[Object]:
+        pass
+
+    @abstractmethod
+    async def get_object(self, bucket_name: str, object_name: str) -> bytes:
+        pass
+
+    @abstractmethod
+    async def download_file(
+        self, bucket_name: str, object_name: str, file_path: str
+    ) -> int:
+        pass
+
+    @abstractmethod
+    async def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: bytes,
+        metadata: dict | None = None,
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        file_path: str,
+        metadata: dict | None = None,
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "AsyncBucketClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def download_objects(
+        self,
+        bucket_name: str,
+        objects: Iterable[Object] | AsyncIterable[Object],
+        destination_path: str,
+        max_concurrency: int = ASYNC_BUCKET_CLIENT_MAX_CONCURRENCY,
+        on_downloaded: Callable[[Object], None] | None = None,
+    ) -> TransferStats:
+        """
+        Downloads objects concurrently on the running event loop to `destination_path/<object_name>`.
+
+        A synchronous iterable of objects, e.g. a paginated listing, is advanced in a thread.
+        With an object cache, the objects cached with the same ETag are read from the local
+        disk instead, and the downloaded ones are added to the cache, in threads.
+
+        Args:
+            bucket_name (str): Name of the bucket to download from.
+            objects (Iterable[Object] | AsyncIterable[Object]): The objects to download.
+            destination_path (str): The local root folder of the downloaded objects.
+            max_concurrency (int): Maximum number of in-flight GET requests.
+            on_downloaded (Callable[[Object], None] | None): Called in a thread, one object
+                at a time, once an object has been fully written to disk.
+
+        Returns:
+            TransferStats: The number of objects and bytes downloaded, and the throughput.
+        """
+
+        async def download(obj: Object) -> int:
+            local_file_path = os.path.join(destination_path, obj.object_name)
+            await asyncio.to_thread(
+                os.makedirs, os.path.dirname(local_file_path), exist_ok=True
+            )
+            if self.object_cache is None or not obj.etag:
+                return await self.download_file(
+                    bucket_name, obj.object_name, local_file_path
+                )
+
+            if await asyncio.to_thread(
+                self.object_cache.get,
+                bucket_name,
+                obj.object_name,
+                obj.etag,
+                local_file_path,
+            ):
+                return await asyncio.to_thread(os.path.getsize, local_file_path)
+
+            size = await self.download_file(
+                bucket_name, obj.object_name, local_file_path
+            )
+            await asyncio.to_thread(
+                self.object_cache.put,
+                bucket_name,
+                obj.object_name,
+                obj.etag,
+                local_file_path,
+            )
+            return size
+
+        stats = TransferStats()
+        with tqdm.tqdm(desc="Downloading objects", unit="obj") as progress_bar:
+            async for obj, size in async_bounded_map(
+                download, objects, max_concurrency
+            ):
+                stats.add(size)
+                if on_downloaded is not None:
+                    await asyncio.to_thread(on_downloaded, obj)
+
+                progress_bar.update(1)
+                progress_bar.set_postfix_str(stats.format_rate(), refresh=False)
+
+        return stats.stop()
+
+    async def download_folder(
+        self,
+        bucket_name: str,
+        folder_name: str,
+        destination_path: str,
+        max_concurrency: int = ASYNC_BUCKET_CLIENT_MAX_CONCURRENCY,
+    ) -> TransferStats:
+        async def list_files() -> AsyncIterator[Object]:
+            async for obj in self.list_objects(
+                bucket_name=bucket_name, prefix=folder_name, recursive=True
+            ):
+                if not obj.is_dir:
+                    yield obj
+
+        return await self.download_objects(
+            bucket_name=bucket_name,
+            objects=list_files(),
+            destination_path=destination_path,
+            max_concurrency=max_concurrency,
+        )
+
+    async def upload_files(
+        self,
+        bucket_name: str,
+        files: Iterable[tuple[str, str]],
+        metadata: dict | None = None,
+        max_concurrency: int = ASYNC_BUCKET_CLIENT_MAX_CONCURRENCY,
+    ) -> TransferStats:
+        """
+        Uploads local files concurrently on the running event loop.
+
+        Args:
+            bucket_name (str): Name of the bucket to upload to.
+            files (Iterable[tuple[str, str]]): Pairs of (object_name, file_path).
+            metadata (dict | None): The metadata attached to every object.
+            max_concurrency (int): Maximum number of in-flight PUT requests.
+
+        Returns:
+            TransferStats: The number of objects and bytes uploaded, and the throughput.
+        """
+
+        async def upload(file: tuple[str, str]) -> int:
+            object_name, file_path = file
+            await self.upload_file(bucket_name, object_name, file_path, metadata)
+            return os.path.getsize(file_path)
+
+        stats = TransferStats()
+        async for _, size in async_bounded_map(upload, files, max_concurrency):
+            stats.add(size)
+
+        return stats.stop()
+
+
+class AsyncS3Client(AsyncBucketClient):
+    def __init__(
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        secure: bool = False,
+        region: str = "us-east-1",
+        max_connections: int = ASYNC_BUCKET_CLIENT_MAX_CONCURRENCY,
+        object_cache: ObjectCache | None = None,
+    ):
+        """
+        S3 compatible (MinIO, AWS S3...) client issuing requests on a single asyncio event loop.
+
+        The file reads, writes and payload hashes run in threads, so that they never block
+        the event loop, and the files are streamed in chunks instead of being held in memory.
+
+        Args:
+            endpoint (str): The host:port of the S3 compatible service.
+            access_key (str): The access key.
+            secret_key (str): The secret key.
+            secure (bool): Use HTTPS instead of HTTP.
+            region (str): The region used to sign the requests.
+            max_connections (int): Size of the connection pool shared by all requests.
+            object_cache (ObjectCache | None): Local cache of the downloaded objects.
+        """
+        self.object_cache = object_cache
+        self.endpoint = endpoint
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.secure = secure
+        self.region = region
+        self.max_connections = max_connections
+
+        self.base_url = f"{'https' if secure else 'http'}://{endpoint}"
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # The session must be created from within the running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def bucket_exists(self, bucket_name: str) -> bool:
+        async with self._request("HEAD", bucket_name) as response:
+            if response.status == 404:
+                return False
+            response.raise_for_status()
+            return True
+
+    async def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ) -> AsyncIterator[Object]:
+        query = {"list-type": "2"}
+        if prefix:
+            query["prefix"] = prefix
+        if not recursive:
+            query["delimiter"] = "/"
+
+        while True:
+            async with self._request("GET", bucket_name, query=query) as response:
+                response.raise_for_status()
+                root = ElementTree.fromstring(await response.read())
+
+            for content in root.iterfind("s3:Contents", S3_XML_NAMESPACE):
+                yield Object(
+                    bucket_name=bucket_name,
+                    object_name=content.findtext("s3:Key", namespaces=S3_XML_NAMESPACE),
+                    last_modified=datetime.datetime.fromisoformat(
+                        content.findtext("s3:LastModified", namespaces=S3_XML_NAMESPACE)
+                    ),
+                    etag=content.findtext(
+                        "s3:ETag", namespaces=S3_XML_NAMESPACE
+                    ).replace('"', ""),
+                    size=int(content.findtext("s3:Size", namespaces=S3_XML_NAMESPACE)),
+                )
+
+            for common_prefix in root.iterfind("s3:CommonPrefixes", S3_XML_NAMESPACE):
+                yield Object(
+                    bucket_name=bucket_name,
+                    object_name=common_prefix.findtext(
+                        "s3:Prefix", namespaces=S3_XML_NAMESPACE
+                    ),
+                    is_dir=True,
+                )
+
+            if root.findtext("s3:IsTruncated", namespaces=S3_XML_NAMESPACE) != "true":
+                return
+
+            query["continuation-token"] = root.findtext(
+                "s3:NextContinuationToken", namespaces=S3_XML_NAMESPACE
+            )
+
+    async def get_object(self, bucket_name: str, object_name: str) -> bytes:
+        async with self._request("GET", bucket_name, object_name) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async def download_file(
+        self, bucket_name: str, object_name: str, file_path: str
+    ) -> int:
+        """
+        Streams an object to a temporary file and atomically moves it to `file_path`. The
+        temporary file is removed if the download fails.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        tmp_file_path = f"{file_path}.part"
+        size = 0
+        try:
+            async with self._request("GET", bucket_name, object_name) as response:
+                response.raise_for_status()
+                file = await asyncio.to_thread(open, tmp_file_path, "wb")
+                try:
+                    async for chunk in response.content.iter_chunked(
+                        TRANSFER_CHUNK_SIZE
+                    ):
+                        await asyncio.to_thread(file.write, chunk)
+                        size += len(chunk)
+                finally:
+                    await asyncio.to_thread(file.close)
+
+            await asyncio.to_thread(os.replace, tmp_file_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+            raise
+
+        return size
+
+    async def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: bytes,
+        metadata: dict | None = None,
+    ) -> None:
+        payload_hash = (
+            UNSIGNED_PAYLOAD
+            if self.secure
+            else await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+        )
+        async with self._request(
+            "PUT",
+            bucket_name,
+            object_name,
+            headers=self._get_put_headers(len(data), metadata),
+            data=data,
+            payload_hash=payload_hash,
+        ) as response:
+            response.raise_for_status()
+
+    async def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        file_path: str,
+        metadata: dict | None = None,
+    ) -> None:
+        """
+        Streams a local file to an object, reading it in chunks in threads.
+        """
+        size = await asyncio.to_thread(os.path.getsize, file_path)
+        payload_hash = (
+            UNSIGNED_PAYLOAD
+            if self.secure
+            else await asyncio.to_thread(_hash_file, file_path)
+        )
+
+        async def read_chunks() -> AsyncIterator[bytes]:
+            file = await asyncio.to_thread(open, file_path, "rb")
+            try:
+                while chunk := await asyncio.to_thread(file.read, TRANSFER_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                await asyncio.to_thread(file.close)
+
+        async with self._request(
+            "PUT",
+            bucket_name,
+            object_name,
+            headers=self._get_put_headers(size, metadata),
+            data=read_chunks(),
+            payload_hash=payload_hash,
+        ) as response:
+            response.raise_for_status()
+
+    @staticmethod
+    def _get_put_headers(length: int, metadata: dict | None) -> dict[str, str]:
+        # The length is sent explicitly, S3 does not accept chunked uploads
+        headers = {"Content-Length": str(length)}
+        for key, value in (metadata or {}).items():
+            if value is not None:
+                headers[f"x-amz-meta-{key}"] = str(value)
+        return headers
+
+    def _request(
+        self,
+        method: str,
+        bucket_name: str,
+        object_name: str | None = None,
+        query: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        data: bytes | AsyncIterable[bytes] | None = None,
+        payload_hash: str = EMPTY_PAYLOAD_SHA256,
+    ):
+        # The payload hash is computed by the caller off the event loop, UNSIGNED_PAYLOAD
+        # over TLS which already protects the payload integrity
+        path = f"/{bucket_name}"
+        if object_name is not None:
+            path += "/" + quote(object_name, safe="/~")
+
+        canonical_query = "&".join(
+            f"{quote(key, safe='-_.~')}={quote(value, safe='-_.~')}"
+            for key, value in sorted((query or {}).items())
+        )
+
+        signed_headers = self._sign(
+            method, path, canonical_query, dict(headers or {}), payload_hash
+        )
+
+        url = f"{self.base_url}{path}"
+        if canonical_query:
+            url += f"?{canonical_query}"
+
+        return self.session.request(
+            method, URL(url, encoded=True), headers=signed_headers, data=data
+        )
+
+    def _sign(
+        self,
+        method: str,
+        path: str,
+        canonical_query: str,
+        headers: dict[str, str],
+        payload_hash: str,
+    ) -> dict[str, str]:
+        """
+        Signs a request with AWS Signature Version 4.
+
+        Returns:
+            dict[str, str]: The request's headers, including the Authorization header.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = now.strftime("%Y%m%d")
+
+        headers["Host"] = self.endpoint
+        headers["x-amz-date"] = amz_date
+        headers["x-amz-content-sha256"] = payload_hash
+
+        canonical_headers = {
+            key.lower(): " ".join(value.split()) for key, value in headers.items()
+        }
+        signed_header_names = ";".join(sorted(canonical_headers))
+        canonical_request = "\n".join(
+            [
+                method,
+                path,
+                canonical_query,
+                "".join(
+                    f"{key}:{canonical_headers[key]}\n"
+                    for key in sorted(canonical_headers)
+                ),
+                signed_header_names,
+                payload_hash,
+            ]
+        )
+
+        scope = f"{date_stamp}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                amz_date,
+                scope,
+                hashlib.sha256(canonical_request.encode()).hexdigest(),
+            ]
+        )
+
+        signing_key = f"AWS4{self.secret_key}".encode()
+        for scope_part in (date_stamp, self.region, "s3", "aws4_request"):
+            signing_key = hmac.new(
+                signing_key, scope_part.encode(), hashlib.sha256
+            ).digest()
+        signature = hmac.new(
+            signing_key, string_to_sign.encode(), hashlib.sha256
+        ).hexdigest()
+
+        headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope},"
+            f" SignedHeaders={signed_header_names}, Signature={signature}"
+        )
+        return headers
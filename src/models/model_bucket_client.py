@@ -1,5 +1,10 @@
+import asyncio
 import os
+import queue
+import threading
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, BinaryIO, Generator
 
 import tqdm
@@ -10,8 +15,23 @@ from minio.datatypes import Object
 from minio.helpers import ObjectWriteResult
 from minio.versioningconfig import VersioningConfig
 
+from src.config.settings import BUCKET_CLIENT_MAX_WORKERS
+from src.models.model_async_bucket_client import AsyncS3Client
+from src.models.model_http_transport import HttpTransport
+from src.models.model_object_cache import ObjectCache
+from src.models.model_transfer_stats import TransferStats
+from src.utils.concurrency_helper import bounded_map
+
+# Object names are hexadecimal content hashes: listings are split at each hex digit
+LISTING_PARTITION_BOUNDARIES = "123456789abcdef"
+# Listed objects waiting for the consumer, the listings pause when it is slower than them
+LISTING_MAX_QUEUED_OBJECTS = 10_000
+
 
 class BucketClient(ABC):
+    # Local cache of the downloaded objects, None to always download them
+    object_cache: ObjectCache | None = None
+
     @abstractmethod
     def check_connection(self) -> None:
         pass
@@ -35,7 +55,9 @@ class BucketClient(ABC):
         object_name: str,
         file_path: str,
         metadata: dict | None = None,
-    ):
+        part_size: int = 0,
+        num_parallel_uploads: int = 3,
+    ) -> ObjectWriteResult:
         pass
 
     @abstractmethod
@@ -46,15 +68,23 @@ class BucketClient(ABC):
         data: BinaryIO,
         length: int,
         metadata: dict | None = None,
-    ):
+    ) -> ObjectWriteResult:
         pass
 
     @abstractmethod
-    def list_objects(self, bucket_name: str, prefix: str | None = None):
+    def list_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        recursive: bool = False,
+        start_after: str | None = None,
+    ):
         pass
 
     @abstractmethod
-    def get_object(self, bucket_name: str, object_name: str):
+    def get_object(
+        self, bucket_name: str, object_name: str, offset: int = 0, length: int = 0
+    ):
         pass
 
     @abstractmethod
@@ -67,26 +97,251 @@ class BucketClient(ABC):
     ) -> ObjectWriteResult:
         pass
 
+    @abstractmethod
+    def download_file(self, bucket_name: str, object_name: str, file_path: str):
+        pass
+
     @abstractmethod
     def download_folder(
-        self, bucket_name: str, folder_name: str, destination_path: str
-    ) -> None:
+        self,
+        bucket_name: str,
+        folder_name: str,
+        destination_path: str,
+        max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+    ) -> TransferStats:
         pass
 
+    def list_objects_parallel(
+        self,
+        bucket_name: str,
+        prefix: str = "",
+        max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+        boundaries: str = LISTING_PARTITION_BOUNDARIES,
+        max_queued: int = LISTING_MAX_QUEUED_OBJECTS,
+    ) -> Iterator[Object]:
+        """
+        Lists all the objects under a prefix with concurrent paginated listings.
+
+        The keys of each folder are split in ranges at `boundaries` (the hexadecimal digits
+        by default, as objects are named by their content hash), each range being listed
+        from its lower bound with `start_after`. Every sub-folder found is split and listed
+        the same way, so each range is complete whatever the key names. The objects are
+        streamed in no particular order as soon as their page is received.
+
+        Args:
+            bucket_name (str): Name of the bucket to list.
+            prefix (str): The prefix to list, e.g. "<data_source>/".
+            max_workers (int): Number of concurrent listings.
+            boundaries (str): The characters splitting the keys of a folder, right after its prefix.
+            max_queued (int): Maximum number of listed objects not consumed yet.
+
+        Yields:
+            Object: The objects (not the folders) under the prefix.
+        """
+        results: queue.Queue = queue.Queue(maxsize=max_queued)
+        stopped = threading.Event()
+        bounds = [None, *boundaries, None]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending_ranges = 0
+
+            def list_folder(folder_prefix: str) -> None:
+                nonlocal pending_ranges
+                for lower_bound, upper_bound in zip(bounds, bounds[1:]):
+                    executor.submit(
+                        self._list_key_range,
+                        bucket_name,
+                        folder_prefix,
+                        None if lower_bound is None else folder_prefix + lower_bound,
+                        None if upper_bound is None else folder_prefix + upper_bound,
+                        results,
+                        stopped,
+                    )
+                    pending_ranges += 1
+
+            try:
+                list_folder(prefix)
+                while pending_ranges:
+                    result = results.get()
+                    if result is None:
+                        pending_ranges -= 1
+                    elif isinstance(result, Exception):
+                        raise result
+                    elif result.is_dir:
+                        list_folder(result.object_name)
+                    else:
+                        yield result
+            finally:
+                stopped.set()
+                executor.shutdown(cancel_futures=True)
+
+    def _list_key_range(
+        self,
+        bucket_name: str,
+        folder_prefix: str,
+        lower_bound: str | None,
+        upper_bound: str | None,
+        results: queue.Queue,
+        stopped: threading.Event,
+    ) -> None:
+        def put(result: Object | Exception | None) -> None:
+            # The queue is bounded: give up once the consumer stopped reading it
+            while not stopped.is_set():
+                try:
+                    results.put(result, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        # Puts the entries of the folder in ]lower_bound, upper_bound] in the queue, then
+        # None once the range is exhausted (after an exception, if any)
+        try:
+            for obj in self.list_objects(
+                bucket_name=bucket_name, prefix=folder_prefix, start_after=lower_bound
+            ):
+                if stopped.is_set() or (
+                    upper_bound is not None and obj.object_name > upper_bound
+                ):
+                    break
+                put(obj)
+        except Exception as e:
+            put(e)
+        finally:
+            put(None)
+
+    def get_transport_stats(self) -> dict | None:
+        """
+        Gets the statistics of the HTTP connection pool of the client, if it has one.
+
+        Returns:
+            dict | None: The statistics, see HttpTransport.get_stats.
+        """
+        return None
+
+    def download_objects(
+        self,
+        bucket_name: str,
+        objects: Iterable[Object],
+        destination_path: str,
+        max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+        on_downloaded: Callable[[Object], None] | None = None,
+    ) -> TransferStats:
+        """
+        Downloads objects concurrently to `destination_path/<object_name>`.
+
+        The objects are consumed lazily, so a paginated listing keeps running while the
+        first objects are already being fetched. With an object cache, the objects cached
+        with the same ETag are read from the local disk instead, and the downloaded ones are
+        added to the cache.
+
+        Args:
+            bucket_name (str): Name of the bucket to download from.
+            objects (Iterable[Object]): The objects to download, typically a listing.
+            destination_path (str): The local root folder of the downloaded objects.
+            max_workers (int): Number of concurrent downloads.
+            on_downloaded (Callable[[Object], None] | None): Called from the calling thread
+                once an object has been fully written to disk.
+
+        Returns:
+            TransferStats: The number of objects and bytes downloaded, and the throughput.
+        """
+
+        def download(obj: Object) -> int:
+            local_file_path = os.path.join(destination_path, obj.object_name)
+            os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+            if self.object_cache is None or not obj.etag:
+                self.download_file(bucket_name, obj.object_name, local_file_path)
+            elif not self.object_cache.get(
+                bucket_name, obj.object_name, obj.etag, local_file_path
+            ):
+                self.download_file(bucket_name, obj.object_name, local_file_path)
+                self.object_cache.put(
+                    bucket_name, obj.object_name, obj.etag, local_file_path
+                )
+            return os.path.getsize(local_file_path)
+
+        stats = TransferStats()
+        with tqdm.tqdm(desc="Downloading objects", unit="obj") as progress_bar:
+            for obj, size in bounded_map(download, objects, max_workers=max_workers):
+                stats.add(size)
+                if on_downloaded is not None:
+                    on_downloaded(obj)
+
+                progress_bar.update(1)
+                progress_bar.set_postfix_str(stats.format_rate(), refresh=False)
+
+        return stats.stop()
+
 
 class MinioClient(BucketClient):
     def __init__(
-        self, endpoint: str, access_key: str, secret_key: str, secure: bool = False
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        secure: bool = False,
+        object_cache: ObjectCache | None = None,
+        transport: HttpTransport | None = None,
+        async_downloads: bool = False,
     ):
         self.secure = secure
+        self.object_cache = object_cache
+        self.transport = transport if transport is not None else HttpTransport()
+        # Downloads the objects on an event loop instead of a thread per transfer
+        self.async_client = (
+            AsyncS3Client(
+                endpoint=endpoint,
+                access_key=access_key,
+                secret_key=secret_key,
+                secure=secure,
+                object_cache=object_cache,
+            )
+            if async_downloads
+            else None
+        )
 
         self.client = Minio(
             endpoint=endpoint,
             access_key=access_key,
             secret_key=secret_key,
             secure=self.secure,
+            http_client=self.transport.create_pool_manager(self.secure),
         )
 
+    def get_transport_stats(self) -> dict | None:
+        return self.transport.get_stats()
+
+    def download_objects(
+        self,
+        bucket_name: str,
+        objects: Iterable[Object],
+        destination_path: str,
+        max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+        on_downloaded: Callable[[Object], None] | None = None,
+    ) -> TransferStats:
+        # With async downloads, the in-flight requests are bounded by the async client's
+        # connection pool instead of max_workers
+        if self.async_client is None:
+            return super().download_objects(
+                bucket_name=bucket_name,
+                objects=objects,
+                destination_path=destination_path,
+                max_workers=max_workers,
+                on_downloaded=on_downloaded,
+            )
+
+        async def download_objects() -> TransferStats:
+            async with self.async_client:
+                return await self.async_client.download_objects(
+                    bucket_name=bucket_name,
+                    objects=objects,
+                    destination_path=destination_path,
+                    max_concurrency=self.async_client.max_connections,
+                    on_downloaded=on_downloaded,
+                )
+
+        return asyncio.run(download_objects())
+
     def check_connection(self) -> None:
         try:
             self.client.list_buckets()
@@ -126,12 +381,18 @@ class MinioClient(BucketClient):
         object_name: str,
         file_path: str,
         metadata: dict | None = None,
-    ):
-        self.client.fput_object(
+        part_size: int = 0,
+        num_parallel_uploads: int = 3,
+    ) -> ObjectWriteResult:
+        # Files larger than part_size are sent as a multipart upload whose parts
+        # are uploaded by num_parallel_uploads threads
+        return self.client.fput_object(
             bucket_name=bucket_name,
             object_name=object_name,
             file_path=file_path,
             metadata=metadata,
+            part_size=part_size,
+            num_parallel_uploads=num_parallel_uploads,
         )
 
     def upload_data(
@@ -141,8 +402,8 @@ class MinioClient(BucketClient):
         data: BinaryIO,
         length: int,
         metadata: dict | None = None,
-    ):
-        self.client.put_object(
+    ) -> ObjectWriteResult:
+        return self.client.put_object(
             bucket_name=bucket_name,
             object_name=object_name,
             data=data,
@@ -151,19 +412,32 @@ class MinioClient(BucketClient):
         )
 
     def list_objects(
-        self, bucket_name: str, prefix: str | None = None
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        recursive: bool = False,
+        start_after: str | None = None,
     ) -> Generator[Object, Any, None]:
         try:
-            return self.client.list_objects(bucket_name=bucket_name, prefix=prefix)
+            return self.client.list_objects(
+                bucket_name=bucket_name,
+                prefix=prefix,
+                recursive=recursive,
+                start_after=start_after,
+            )
         except S3Error as e:
             raise e
 
     def get_object(
-        self, bucket_name: str, object_name: str
+        self, bucket_name: str, object_name: str, offset: int = 0, length: int = 0
     ) -> urllib3.response.BaseHTTPResponse:
+        # A non-zero offset or length issues a ranged GET
         try:
             return self.client.get_object(
-                bucket_name=bucket_name, object_name=object_name
+                bucket_name=bucket_name,
+                object_name=object_name,
+                offset=offset,
+                length=length,
             )
         except S3Error as e:
             raise e
@@ -184,23 +458,31 @@ class MinioClient(BucketClient):
         except S3Error as e:
             raise e
 
+    def download_file(self, bucket_name: str, object_name: str, file_path: str):
+        try:
+            self.client.fget_object(
+                bucket_name=bucket_name, object_name=object_name, file_path=file_path
+            )
+        except S3Error as e:
+            raise e
+
     def download_folder(
-        self, bucket_name: str, folder_name: str, destination_path: str
-    ) -> None:
+        self,
+        bucket_name: str,
+        folder_name: str,
+        destination_path: str,
+        max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+    ) -> TransferStats:
         os.makedirs(destination_path, exist_ok=True)
 
         try:
-            objects = self.client.list_objects(
-                bucket_name=bucket_name, prefix=folder_name, recursive=True
+            return self.download_objects(
+                bucket_name=bucket_name,
+                objects=self.list_objects_parallel(
+                    bucket_name=bucket_name, prefix=folder_name, max_workers=max_workers
+                ),
+                destination_path=destination_path,
+                max_workers=max_workers,
             )
-            for obj in tqdm.tqdm(objects):
-                if not obj.is_dir:
-                    object_name = obj.object_name
-                    local_file_path = os.path.join(destination_path, object_name)
-
-                    # Create directories if they don't exist
-                    os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
-
-                    self.client.fget_object(bucket_name, object_name, local_file_path)
         except S3Error as e:
             raise e
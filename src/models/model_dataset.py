@@ -1,15 +1,23 @@
 import json
 import os
-import random
-import shutil
-import threading
+from collections.abc import Sequence
 
 import ulid
 import yaml
-from PIL import Image
 
-from src.config.settings import DATASET_YOLO_CONFIG_NAME
+from src.config.settings import (
+    BUCKET_CLIENT_MAX_WORKERS,
+    DATASET_ANNOTATION_CONVERSION_CHUNK_SIZE,
+    DATASET_YOLO_CONFIG_NAME,
+    DATASET_YOLO_CONVERSION_MAX_WORKERS,
+)
 from src.models.model_bucket_client import BucketClient
+from src.models.model_object_manifest import ObjectManifest
+from src.models.model_transfer_stats import TransferStats
+from src.utils.concurrency_helper import bounded_map, chunked
+from src.utils.file_helper import scan_files
+from src.utils.image_helper import read_png_header
+from src.utils.split_helper import assign_splits
 
 
 class Dataset:
@@ -22,6 +30,7 @@ class Dataset:
         images_path: str = "images",
         distribution_weights: list[float] | None = None,
         label_map: dict[int, str] | None = None,
+        manifest_path: str | None = None,
     ):
         if distribution_weights is None:
             distribution_weights = [0.6, 0.2, 0.2]
@@ -32,7 +41,6 @@ class Dataset:
         self.images_path = images_path
         self.distribution_weights = distribution_weights
         self.seed = seed
-        self.random_instance = random.Random(seed)
 
         self.train_split_name = "train"
         self.test_split_name = "test"
@@ -45,6 +53,8 @@ class Dataset:
         ]
 
         self.label_map = label_map or {}
+        # Object name of the dataset's manifest in its bucket, see ObjectManifest
+        self.manifest_path = manifest_path
 
     def format_bucket_image_path(self, image_file_path: str, split_name: str) -> str:
         """
@@ -86,22 +96,61 @@ class Dataset:
         """
         return str(ulid.new())
 
-    def get_next_split(self) -> str:
+    def get_splits(self, sample_ids: Sequence[str]) -> list[str]:
         """
-        Randomly selects a folder ("train", "test", or "validation") based on the specified distribution weights.
+        Selects the folder ("train", "test", or "validation") of each sample from a stable hash
+        of its ID salted with the dataset's seed, based on the distribution weights.
+        A sample is always assigned to the same folder, whatever the other samples are.
+
+        Args:
+            sample_ids (Sequence[str]): The IDs of the samples, e.g. their image file names.
 
         Returns:
-            str: The name of the selected folder.
+            list[str]: The name of the selected folder of each sample.
         """
-        return self.random_instance.choices(
-            self.split_names, self.distribution_weights
-        )[0]
+        split_indices = assign_splits(
+            sample_ids, self.distribution_weights, salt=str(self.seed)
+        )
+        return [self.split_names[split_index] for split_index in split_indices]
+
+    def download(
+        self,
+        bucket_client: BucketClient,
+        destination_root_path: str,
+        max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+        use_manifest: bool = False,
+    ) -> TransferStats:
+        """
+        Downloads the dataset's folder from the bucket.
+
+        Args:
+            bucket_client (BucketClient): The bucket client used to download the dataset.
+            destination_root_path (str): The local folder where the dataset is downloaded.
+            max_workers (int): Number of concurrent downloads.
+            use_manifest (bool): Take the objects from the dataset's manifest instead of
+                listing the folder, when the folder is only written by the dataset creation.
+
+        Returns:
+            TransferStats: The number of objects and bytes downloaded, and the throughput.
+        """
+        manifest = (
+            ObjectManifest.load(bucket_client, self.bucket_name, self.manifest_path)
+            if use_manifest and self.manifest_path
+            else None
+        )
+        if manifest is not None:
+            return bucket_client.download_objects(
+                bucket_name=self.bucket_name,
+                objects=manifest.to_objects(self.bucket_name),
+                destination_path=destination_root_path,
+                max_workers=max_workers,
+            )
 
-    def download(self, bucket_client: BucketClient, destination_root_path: str) -> None:
-        bucket_client.download_folder(
+        return bucket_client.download_folder(
             bucket_name=self.bucket_name,
             folder_name=self.uuid,
             destination_path=destination_root_path,
+            max_workers=max_workers,
         )
 
     def to_yolo_format(self, dataset_path: str):
@@ -120,25 +169,21 @@ class Dataset:
             ) or os.path.isdir(os.path.join(dataset_path, yolo_categories[1])):
                 return
 
+            # Each split folder is moved with a single rename instead of file by file
             for category in yolo_categories:
+                os.makedirs(os.path.join(dataset_path, category), exist_ok=True)
                 for split_name in self.split_names:
                     old_folder = os.path.join(dataset_path, split_name, category)
                     new_folder = os.path.join(dataset_path, category, split_name)
 
-                    os.makedirs(new_folder, exist_ok=True)
-
-                    for filename in os.listdir(old_folder):
-                        old_file = os.path.join(old_folder, filename)
-                        new_file = os.path.join(new_folder, filename)
-
-                        shutil.move(old_file, new_file)
-
-                    if not os.listdir(old_folder):
-                        os.rmdir(old_folder)
+                    if os.path.isdir(old_folder):
+                        os.rename(old_folder, new_folder)
+                    else:
+                        os.makedirs(new_folder, exist_ok=True)
 
             for split_name in self.split_names:
                 split_path = os.path.join(dataset_path, split_name)
-                if not os.listdir(split_path):
+                if os.path.isdir(split_path) and not os.listdir(split_path):
                     os.rmdir(split_path)
 
             self._create_yolo_yaml_file(dataset_path=dataset_path)
@@ -219,8 +264,7 @@ class Dataset:
             with open(json_path) as file:
                 json_data = json.load(file)
 
-            with Image.open(img_path) as img:
-                img_width, img_height = img.size
+            img_width, img_height, _ = read_png_header(img_path)
 
             yolo_annotations = self._get_yolo_data_from_json_data(
                 json_data, img_width, img_height
@@ -234,33 +278,48 @@ class Dataset:
         except Exception as e:
             raise Exception(f"Error processing {json_path}") from e
 
-    def _convert_annotations_to_yolo_format(self, dataset_path) -> None:
+    def _process_json_files(self, json_paths: list[str]) -> int:
+        """
+        Processes a chunk of JSON files, see `_process_json_file`.
+
+        Args:
+            json_paths (list[str]): The file paths of the JSON files.
+
+        Returns:
+            int: The number of processed files.
+        """
+        for json_path in json_paths:
+            img_path = json_path.replace("labels", "images").replace(".json", ".png")
+            self._process_json_file(json_path, img_path)
+        return len(json_paths)
+
+    def _convert_annotations_to_yolo_format(
+        self,
+        dataset_path,
+        max_workers: int = DATASET_YOLO_CONVERSION_MAX_WORKERS,
+        chunk_size: int = DATASET_ANNOTATION_CONVERSION_CHUNK_SIZE,
+    ) -> None:
         """
         Converts JSON labels in a dataset to YOLO format.
 
         This function walks through a dataset directory, finds all JSON files,
         converts their labels to YOLO format, and writes them to `.txt` files.
-        It uses multithreading to process multiple files simultaneously.
+        The files are processed in chunks on a bounded pool of threads.
 
         Args:
             dataset_path (str): The root path of the dataset.
+            max_workers (int): The number of threads.
+            chunk_size (int): The number of files processed per task.
 
         Usage Example:
             to_yolo_format('path/to/your/dataset_name')
         """
-        threads = []
-        for root, _, files in os.walk(dataset_path):
-            for file in files:
-                if file.endswith(".json"):
-                    json_path = os.path.join(root, file)
-                    img_path = json_path.replace("labels", "images").replace(
-                        ".json", ".png"
-                    )
-                    thread = threading.Thread(
-                        target=self._process_json_file, args=(json_path, img_path)
-                    )
-                    threads.append(thread)
-                    thread.start()
-
-        for thread in threads:
-            thread.join()
+        json_paths = (
+            entry.path for entry in scan_files(dataset_path, extension=".json")
+        )
+        for _ in bounded_map(
+            self._process_json_files,
+            chunked(json_paths, chunk_size),
+            max_workers=max_workers,
+        ):
+            pass
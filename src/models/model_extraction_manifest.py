@@ -0,0 +1,163 @@
+import json
+import os
+from typing import TextIO
+
+from minio.datatypes import Object
+
+
+class ExtractionManifest:
+    def __init__(self, manifest_path: str):
+        """
+        Initialize the ExtractionManifest object.
+
+        The manifest is an append-only JSON lines file: every downloaded (or removed) object
+        appends one line, so a crashed extraction can resume from the last recorded object.
+        It is compacted into one line per object once the extraction completes.
+
+        Args:
+            manifest_path (str): The local path of the manifest file.
+        """
+        self.manifest_path = manifest_path
+        self.entries: dict[str, dict] = {}
+        self._file: TextIO | None = None
+
+    @classmethod
+    def load(cls, manifest_path: str) -> "ExtractionManifest":
+        """
+        Loads a manifest by replaying its lines, the last line of an object wins.
+
+        Args:
+            manifest_path (str): The local path of the manifest file.
+
+        Returns:
+            ExtractionManifest: The loaded manifest, empty if the file does not exist.
+        """
+        manifest = cls(manifest_path)
+        if not os.path.exists(manifest_path):
+            return manifest
+
+        with open(manifest_path) as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Line truncated by a crash, the object will be downloaded again
+                    continue
+
+                if entry.get("deleted"):
+                    manifest.entries.pop(entry["key"], None)
+                else:
+                    manifest.entries[entry["key"]] = entry
+
+        return manifest
+
+    def is_recorded(self, obj: Object) -> bool:
+        """
+        Checks if an object was recorded with the same ETag and size.
+
+        Args:
+            obj (Object): The object as listed in the bucket.
+
+        Returns:
+            bool: True if the same version of the object was already downloaded.
+        """
+        entry = self.entries.get(obj.object_name)
+        return (
+            entry is not None
+            and entry["etag"] == obj.etag
+            and entry["size"] == obj.size
+        )
+
+    def is_up_to_date(self, obj: Object, local_path: str) -> bool:
+        """
+        Checks if the local copy of an object matches the recorded ETag and size.
+
+        Args:
+            obj (Object): The object as listed in the bucket.
+            local_path (str): The local path of the object.
+
+        Returns:
+            bool: True if the object does not need to be downloaded again.
+        """
+        if not self.is_recorded(obj):
+            return False
+
+        try:
+            return os.path.getsize(local_path) == obj.size
+        except OSError:
+            return False
+
+    def record(self, obj: Object, members: list[str] | None = None) -> None:
+        """
+        Records a downloaded object.
+
+        Args:
+            obj (Object): The downloaded object.
+            members (list[str] | None): The files extracted from the object if it is a
+                shard, to delete them with it.
+        """
+        entry = {
+            "key": obj.object_name,
+            "etag": obj.etag,
+            "size": obj.size,
+            "mtime": obj.last_modified.timestamp() if obj.last_modified else None,
+        }
+        if members is not None:
+            entry["members"] = members
+        self.entries[obj.object_name] = entry
+        self._append(entry)
+
+    def get_members(self, object_name: str) -> list[str]:
+        """
+        Gets the files extracted from a recorded shard.
+
+        Args:
+            object_name (str): The name of the shard.
+
+        Returns:
+            list[str]: The extracted files, empty if the object is not a recorded shard.
+        """
+        return self.entries.get(object_name, {}).get("members", [])
+
+    def forget(self, object_name: str) -> None:
+        """
+        Removes an object from the manifest.
+
+        Args:
+            object_name (str): The name of the removed object.
+        """
+        self.entries.pop(object_name, None)
+        self._append({"key": object_name, "deleted": True})
+
+    def compact(self) -> None:
+        """
+        Rewrites the manifest atomically with one line per recorded object.
+        """
+        self.close()
+
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_manifest_path = f"{self.manifest_path}.tmp"
+        with open(tmp_manifest_path, "w") as file:
+            for entry in self.entries.values():
+                file.write(json.dumps(entry) + "\n")
+
+        os.replace(tmp_manifest_path, self.manifest_path)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _append(self, entry: dict) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+            self._file = open(self.manifest_path, "a+")
+
+            # Terminate a line truncated by a crash before appending new entries
+            if self._file.tell() > 0:
+                self._file.seek(self._file.tell() - 1)
+                if self._file.read(1) != "\n":
+                    self._file.write("\n")
+
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
@@ -0,0 +1,168 @@
+import os
+import socket
+import threading
+
+import certifi
+import urllib3
+from urllib3.connection import HTTPConnection
+from urllib3.util import Retry, Timeout
+
+from src.config.settings import (
+    BUCKET_CLIENT_BACKOFF_FACTOR,
+    BUCKET_CLIENT_BACKOFF_JITTER,
+    BUCKET_CLIENT_CONNECT_TIMEOUT,
+    BUCKET_CLIENT_MAX_RETRIES,
+    BUCKET_CLIENT_POOL_MAXSIZE,
+    BUCKET_CLIENT_READ_TIMEOUT,
+    BUCKET_CLIENT_TCP_KEEPALIVE,
+)
+
+# Throttling and transient server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class CountingRetry(Retry):
+    # The transport whose statistics count the retries, carried over by `new`
+    transport: "HttpTransport | None" = None
+
+    def new(self, **kwargs) -> "CountingRetry":
+        retry = super().new(**kwargs)
+        retry.transport = self.transport
+        return retry
+
+    def increment(self, *args, **kwargs) -> "CountingRetry":
+        retry = super().increment(*args, **kwargs)
+        if self.transport is not None:
+            self.transport.add_retry()
+        return retry
+
+
+class HttpTransport:
+    def __init__(
+        self,
+        pool_maxsize: int = BUCKET_CLIENT_POOL_MAXSIZE,
+        connect_timeout: float = BUCKET_CLIENT_CONNECT_TIMEOUT,
+        read_timeout: float = BUCKET_CLIENT_READ_TIMEOUT,
+        max_retries: int = BUCKET_CLIENT_MAX_RETRIES,
+        backoff_factor: float = BUCKET_CLIENT_BACKOFF_FACTOR,
+        backoff_jitter: float = BUCKET_CLIENT_BACKOFF_JITTER,
+        tcp_keepalive: bool = BUCKET_CLIENT_TCP_KEEPALIVE,
+    ):
+        """
+        Initialize the HttpTransport object, the urllib3 connection pool of a bucket client.
+
+        The pool keeps up to `pool_maxsize` connections alive per host: it should be at
+        least the number of concurrent requests (transfer threads times parallel multipart
+        parts), otherwise the extra connections are opened and discarded for every request.
+        Requests failing with a connection error, throttling (429) or a 5xx error are
+        retried with an exponential backoff and a random jitter, honoring Retry-After.
+
+        Args:
+            pool_maxsize (int): Number of connections kept alive per host.
+            connect_timeout (float): Connection timeout in seconds.
+            read_timeout (float): Timeout in seconds between two received packets.
+            max_retries (int): Maximum number of retries of a request.
+            backoff_factor (float): Base of the exponential backoff between retries, in
+                seconds.
+            backoff_jitter (float): Maximum random delay in seconds added to the backoff, so
+                that the throttled clients do not retry in lockstep.
+            tcp_keepalive (bool): Enable the TCP keep-alive probes on the connections, so
+                that the idle connections dropped by the network are detected.
+        """
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.tcp_keepalive = tcp_keepalive
+
+        self.pool_manager: urllib3.PoolManager | None = None
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def create_pool_manager(self, secure: bool) -> urllib3.PoolManager:
+        """
+        Creates the pool manager of the transport, to be passed as `http_client` to Minio.
+
+        Args:
+            secure (bool): Whether the connections use TLS.
+
+        Returns:
+            urllib3.PoolManager: The pool manager, kept for the statistics.
+        """
+        retry = CountingRetry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            backoff_jitter=self.backoff_jitter,
+            status_forcelist=RETRY_STATUS_CODES,
+        )
+        retry.transport = self
+
+        socket_options = list(HTTPConnection.default_socket_options)
+        if self.tcp_keepalive:
+            socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+
+        tls_options = (
+            {
+                "cert_reqs": "CERT_REQUIRED",
+                "ca_certs": os.environ.get("SSL_CERT_FILE") or certifi.where(),
+            }
+            if secure
+            else {}
+        )
+
+        self.pool_manager = urllib3.PoolManager(
+            maxsize=self.pool_maxsize,
+            timeout=Timeout(connect=self.connect_timeout, read=self.read_timeout),
+            retries=retry,
+            socket_options=socket_options,
+            **tls_options,
+        )
+        return self.pool_manager
+
+    def add_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def get_stats(self) -> dict:
+        """
+        Gets the statistics of the connection pools, to tune the concurrency: more opened
+        connections than `pool_maxsize` means that the pool is too small for the number of
+        concurrent requests.
+
+        Returns:
+            dict: The pool size, the number of connections opened, requests sent, idle
+                connections and retries.
+        """
+        pools = []
+        if self.pool_manager is not None:
+            pools = [
+                self.pool_manager.pools.get(key)
+                for key in self.pool_manager.pools.keys()
+            ]
+            pools = [pool for pool in pools if pool is not None]
+
+        return {
+            "pool_maxsize": self.pool_maxsize,
+            "connections_opened": sum(pool.num_connections for pool in pools),
+            "requests": sum(pool.num_requests for pool in pools),
+            # The queue of a pool is filled with None placeholders for the unopened slots
+            "idle_connections": sum(
+                sum(connection is not None for connection in list(pool.pool.queue))
+                for pool in pools
+                if pool.pool is not None
+            ),
+            "retries": self.retries,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "pool_maxsize": self.pool_maxsize,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "max_retries": self.max_retries,
+            "backoff_factor": self.backoff_factor,
+            "backoff_jitter": self.backoff_jitter,
+            "tcp_keepalive": self.tcp_keepalive,
+        }
@@ -0,0 +1,394 @@
+import datetime
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from typing import BinaryIO
+
+import urllib3
+from minio.datatypes import Object
+from minio.helpers import ObjectWriteResult
+
+from src.config.settings import BUCKET_CLIENT_MAX_WORKERS
+from src.models.model_bucket_client import BucketClient
+from src.models.model_object_cache import ObjectCache
+from src.models.model_transfer_stats import TransferStats
+
+# Number of keys per listing page, as in S3: the simulated latency is paid once per page
+LISTING_PAGE_SIZE = 1000
+# Size of the chunks written and read, and throttled by the bandwidth simulation
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+TMP_FOLDER = ".tmp"
+
+
+class NetworkSimulator:
+    def __init__(self, latency: float = 0.0, bandwidth: float | None = None):
+        """
+        Initialize the NetworkSimulator object, delaying the requests of a bucket client
+        as a remote object store would.
+
+        Every request waits `latency` seconds. The transferred bytes share one link of
+        `bandwidth` bytes per second: concurrent transfers queue on it, so adding
+        threads hides the latency but not the bandwidth, as with a real network.
+
+        Args:
+            latency (float): Time to first byte of a request, in seconds.
+            bandwidth (float | None): Throughput of the link in bytes per second,
+                None for unlimited.
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+        self._lock = threading.Lock()
+        self._link_free_time = 0.0
+
+    def request(self) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def transfer(self, num_bytes: int) -> None:
+        if not self.bandwidth or num_bytes <= 0:
+            return
+
+        with self._lock:
+            start_time = max(time.perf_counter(), self._link_free_time)
+            self._link_free_time = start_time + num_bytes / self.bandwidth
+            end_time = self._link_free_time
+
+        delay = end_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def to_dict(self) -> dict:
+        return {"latency": self.latency, "bandwidth": self.bandwidth}
+
+
+class LocalObjectResponse:
+    def __init__(
+        self, file: BinaryIO, length: int, simulator: NetworkSimulator | None = None
+    ):
+        """
+        Initialize the LocalObjectResponse object, the body of a local object as the
+        urllib3 response returned by `MinioClient.get_object`.
+
+        Args:
+            file (BinaryIO): The object file, positioned at the first byte to read.
+            length (int): Number of bytes to read.
+            simulator (NetworkSimulator | None): Throttles the reads.
+        """
+        self.file = file
+        self.remaining = length
+        self.simulator = simulator
+
+    def read(self, amt: int | None = None) -> bytes:
+        amt = self.remaining if amt is None else min(amt, self.remaining)
+        data = self.file.read(amt)
+        self.remaining -= len(data)
+        if self.simulator is not None:
+            self.simulator.transfer(len(data))
+        return data
+
+    def stream(self, amt: int = TRANSFER_CHUNK_SIZE) -> Iterator[bytes]:
+        while data := self.read(amt):
+            yield data
+
+    def close(self) -> None:
+        self.file.close()
+
+    def release_conn(self) -> None:
+        pass
+
+
+class LocalFSBucketClient(BucketClient):
+    def __init__(
+        self,
+        root_path: str,
+        latency: float = 0.0,
+        bandwidth: float | None = None,
+        object_cache: ObjectCache | None = None,
+    ):
+        """
+        Initialize the LocalFSBucketClient object, a bucket client storing the objects in a
+        local folder (`root_path/<bucket>/<object_name>`), to run and profile the data plane
+        without an object store.
+
+        Listings follow the S3 semantics (lexicographic order, folders as common prefixes,
+        `start_after`), writes are atomic, and the ETags identify the object versions
+        (from their modification time and size, not an MD5 of their content). The object
+        metadata and the bucket versioning are not stored. Missing objects raise
+        FileNotFoundError.
+
+        Args:
+            root_path (str): The folder containing the buckets.
+            latency (float): Simulated time to first byte of every request, in seconds.
+            bandwidth (float | None): Simulated throughput in bytes per second, None for
+                unlimited.
+            object_cache (ObjectCache | None): Local cache of the downloaded objects.
+        """
+        self.root_path = root_path
+        self.simulator = NetworkSimulator(latency=latency, bandwidth=bandwidth)
+        self.object_cache = object_cache
+
+        os.makedirs(os.path.join(self.root_path, TMP_FOLDER), exist_ok=True)
+
+    def check_connection(self) -> None:
+        if not os.path.isdir(self.root_path):
+            raise ConnectionError(f"The folder {self.root_path} does not exist")
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        self.simulator.request()
+        return os.path.isdir(os.path.join(self.root_path, bucket_name))
+
+    def folder_exists(self, bucket_name: str, folder_name: str) -> bool:
+        if not folder_name.endswith("/"):
+            folder_name += "/"
+
+        for _ in self.list_objects(bucket_name=bucket_name, prefix=folder_name):
+            return True
+        return False
+
+    def make_bucket(self, bucket_name: str, enable_versioning: bool):
+        self.simulator.request()
+        os.makedirs(os.path.join(self.root_path, bucket_name))
+
+    def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        file_path: str,
+        metadata: dict | None = None,
+        part_size: int = 0,
+        num_parallel_uploads: int = 3,
+    ) -> ObjectWriteResult:
+        with open(file_path, "rb") as file:
+            return self.upload_data(
+                bucket_name=bucket_name,
+                object_name=object_name,
+                data=file,
+                length=os.fstat(file.fileno()).st_size,
+                metadata=metadata,
+            )
+
+    def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BinaryIO,
+        length: int,
+        metadata: dict | None = None,
+    ) -> ObjectWriteResult:
+        self.simulator.request()
+        tmp_file_path = self._get_tmp_file_path()
+        try:
+            with open(tmp_file_path, "wb") as tmp_file:
+                # A negative length reads the data until its end
+                remaining = length
+                while remaining:
+                    chunk = data.read(
+                        TRANSFER_CHUNK_SIZE
+                        if remaining < 0
+                        else min(remaining, TRANSFER_CHUNK_SIZE)
+                    )
+                    if not chunk:
+                        break
+
+                    self.simulator.transfer(len(chunk))
+                    tmp_file.write(chunk)
+                    if remaining > 0:
+                        remaining -= len(chunk)
+
+            object_path = self._commit_tmp_file(tmp_file_path, bucket_name, object_name)
+        except BaseException:
+            self._remove_tmp_file(tmp_file_path)
+            raise
+
+        return self._get_write_result(bucket_name, object_name, object_path)
+
+    def list_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        recursive: bool = False,
+        start_after: str | None = None,
+    ) -> Iterator[Object]:
+        # The prefix is split into the folder to scan and the prefix of the entry names
+        folder_name, separator, name_prefix = (prefix or "").rpartition("/")
+        entries = self._list_folder(
+            bucket_name=bucket_name,
+            folder_path=os.path.join(self.root_path, bucket_name, folder_name),
+            folder_key=folder_name + separator,
+            name_prefix=name_prefix,
+            recursive=recursive,
+            start_after=start_after,
+        )
+        for position, obj in enumerate(entries):
+            if position % LISTING_PAGE_SIZE == 0:
+                self.simulator.request()
+            yield obj
+
+    def get_object(
+        self, bucket_name: str, object_name: str, offset: int = 0, length: int = 0
+    ) -> LocalObjectResponse:
+        self.simulator.request()
+        file = open(self._get_object_path(bucket_name, object_name), "rb")
+        size = os.fstat(file.fileno()).st_size
+        file.seek(offset)
+
+        return LocalObjectResponse(
+            file,
+            length=min(length, size - offset) if length else size - offset,
+            simulator=self.simulator,
+        )
+
+    def copy_object(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ) -> ObjectWriteResult:
+        # Server-side copy: no simulated transfer, and the modification time is kept so
+        # that the copy has the ETag of its source, as in S3
+        self.simulator.request()
+        tmp_file_path = self._get_tmp_file_path()
+        try:
+            shutil.copy2(
+                self._get_object_path(source_bucket_name, source_object_name),
+                tmp_file_path,
+            )
+            object_path = self._commit_tmp_file(
+                tmp_file_path, destination_bucket_name, destination_object_name
+            )
+        except BaseException:
+            self._remove_tmp_file(tmp_file_path)
+            raise
+
+        return self._get_write_result(
+            destination_bucket_name, destination_object_name, object_path
+        )
+
+    def download_file(self, bucket_name: str, object_name: str, file_path: str):
+        response = self.get_object(bucket_name, object_name)
+        tmp_file_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp_file_path, "wb") as file:
+                for chunk in response.stream():
+                    file.write(chunk)
+            os.replace(tmp_file_path, file_path)
+        except BaseException:
+            self._remove_tmp_file(tmp_file_path)
+            raise
+        finally:
+            response.close()
+
+    def download_folder(
+        self,
+        bucket_name: str,
+        folder_name: str,
+        destination_path: str,
+        max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+    ) -> TransferStats:
+        os.makedirs(destination_path, exist_ok=True)
+
+        return self.download_objects(
+            bucket_name=bucket_name,
+            objects=self.list_objects_parallel(
+                bucket_name=bucket_name, prefix=folder_name, max_workers=max_workers
+            ),
+            destination_path=destination_path,
+            max_workers=max_workers,
+        )
+
+    def _list_folder(
+        self,
+        bucket_name: str,
+        folder_path: str,
+        folder_key: str,
+        name_prefix: str,
+        recursive: bool,
+        start_after: str | None,
+    ) -> Iterator[Object]:
+        # Yields the objects (and the sub-folders if not recursive) of a folder in the key
+        # order, a sub-folder sorting as its name followed by "/"
+        try:
+            with os.scandir(folder_path) as scanned_entries:
+                entries = [
+                    (entry.name + "/" if entry.is_dir() else entry.name, entry)
+                    for entry in scanned_entries
+                    if entry.name.startswith(name_prefix)
+                ]
+        except (FileNotFoundError, NotADirectoryError):
+            return
+
+        for name, entry in sorted(entries, key=lambda item: item[0]):
+            key = folder_key + name
+            if start_after is not None and key <= start_after:
+                # A folder can still contain keys after start_after
+                if not (
+                    recursive and name.endswith("/") and start_after.startswith(key)
+                ):
+                    continue
+
+            if not name.endswith("/"):
+                stat = entry.stat()
+                yield Object(
+                    bucket_name,
+                    key,
+                    last_modified=datetime.datetime.fromtimestamp(
+                        stat.st_mtime, tz=datetime.timezone.utc
+                    ),
+                    etag=self._get_etag(stat),
+                    size=stat.st_size,
+                )
+            elif recursive:
+                yield from self._list_folder(
+                    bucket_name=bucket_name,
+                    folder_path=entry.path,
+                    folder_key=key,
+                    name_prefix="",
+                    recursive=True,
+                    start_after=start_after,
+                )
+            else:
+                yield Object(bucket_name, key)
+
+    def _get_object_path(self, bucket_name: str, object_name: str) -> str:
+        return os.path.join(self.root_path, bucket_name, *object_name.split("/"))
+
+    def _get_tmp_file_path(self) -> str:
+        # Objects are written in the temporary folder, out of the buckets' listings
+        return os.path.join(self.root_path, TMP_FOLDER, uuid.uuid4().hex)
+
+    def _commit_tmp_file(
+        self, tmp_file_path: str, bucket_name: str, object_name: str
+    ) -> str:
+        # Moves a written temporary file to its object path atomically
+        object_path = self._get_object_path(bucket_name, object_name)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        os.replace(tmp_file_path, object_path)
+        return object_path
+
+    @staticmethod
+    def _remove_tmp_file(tmp_file_path: str) -> None:
+        try:
+            os.remove(tmp_file_path)
+        except FileNotFoundError:
+            pass
+
+    def _get_write_result(
+        self, bucket_name: str, object_name: str, object_path: str
+    ) -> ObjectWriteResult:
+        return ObjectWriteResult(
+            bucket_name,
+            object_name,
+            None,
+            self._get_etag(os.stat(object_path)),
+            urllib3.HTTPHeaderDict(),
+        )
+
+    @staticmethod
+    def _get_etag(stat: os.stat_result) -> str:
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+
+from src.config.settings import OBJECT_CACHE_MAX_BYTES, OBJECT_CACHE_PATH
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, evictions are then not serialized
+    fcntl = None
+
+# Once over budget, entries are evicted until the cache is back under this fraction of it
+EVICTION_TARGET_RATIO = 0.9
+
+
+class ObjectCache:
+    def __init__(self, cache_path: str, max_bytes: int):
+        """
+        Initialize the ObjectCache object, a local disk cache of bucket objects shared by the
+        processes of the machine.
+
+        Entries are content-addressed by bucket, object name and ETag, so a changed object is
+        never served from the cache. The objects are copied in and out of the cache through
+        a temporary file renamed into place, so that readers never see a partial file and the
+        entries never share an inode with the user's files. Once the cache exceeds
+        `max_bytes`, the least recently used entries are evicted under an inter-process lock.
+
+        Args:
+            cache_path (str): The folder of the cache.
+            max_bytes (int): The byte budget of the cache.
+        """
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._size: int | None = None
+
+    def get_entry_path(self, bucket_name: str, object_name: str, etag: str) -> str:
+        """
+        Gets the path of the cache entry of an object version.
+
+        Args:
+            bucket_name (str): The bucket of the object.
+            object_name (str): The name of the object.
+            etag (str): The ETag of the object.
+
+        Returns:
+            str: The path of the entry, which may not exist.
+        """
+        key = hashlib.sha256(
+            f"{bucket_name}\0{object_name}\0{etag}".encode()
+        ).hexdigest()
+        return os.path.join(self.cache_path, key[:2], key)
+
+    def get(
+        self, bucket_name: str, object_name: str, etag: str, file_path: str
+    ) -> bool:
+        """
+        Places the cached version of an object at `file_path`, if it is cached.
+
+        Args:
+            bucket_name (str): The bucket of the object.
+            object_name (str): The name of the object.
+            etag (str): The ETag of the object.
+            file_path (str): The destination path, replaced if it exists.
+
+        Returns:
+            bool: True on a cache hit, False if the object must be downloaded.
+        """
+        entry_path = self.get_entry_path(bucket_name, object_name, etag)
+        try:
+            self._copy_file(entry_path, file_path)
+            # The mtime of the entries orders the evictions
+            os.utime(entry_path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(
+        self, bucket_name: str, object_name: str, etag: str, file_path: str
+    ) -> None:
+        """
+        Adds a downloaded object to the cache, then evicts entries if over budget.
+
+        Args:
+            bucket_name (str): The bucket of the object.
+            object_name (str): The name of the object.
+            etag (str): The ETag of the object.
+            file_path (str): The path of the downloaded object.
+        """
+        entry_path = self.get_entry_path(bucket_name, object_name, etag)
+        try:
+            # An entry replaced by another process was already counted
+            previous_size = os.path.getsize(entry_path)
+        except FileNotFoundError:
+            previous_size = 0
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        self._copy_file(file_path, entry_path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += os.path.getsize(entry_path) - previous_size
+
+        if self._get_size() > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Evicts the least recently used entries until the cache is under its budget.
+        """
+        os.makedirs(self.cache_path, exist_ok=True)
+        with open(os.path.join(self.cache_path, ".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            entries = self._scan_entries()
+            size = sum(entry_size for _, _, entry_size in entries)
+            target_size = self.max_bytes * EVICTION_TARGET_RATIO
+            for _, entry_path, entry_size in sorted(entries):
+                if size <= target_size:
+                    break
+
+                try:
+                    os.remove(entry_path)
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+
+        with self._lock:
+            self._size = size
+
+    def to_dict(self) -> dict:
+        return {"cache_path": self.cache_path, "max_bytes": self.max_bytes}
+
+    def _get_size(self) -> int:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(
+                    entry_size for _, _, entry_size in self._scan_entries()
+                )
+            return self._size
+
+    def _scan_entries(self) -> list[tuple[float, str, int]]:
+        # The (mtime, path, size) of the entries, temporary files excluded
+        entries = []
+        if not os.path.isdir(self.cache_path):
+            return entries
+
+        with os.scandir(self.cache_path) as folders:
+            for folder in folders:
+                if not folder.is_dir():
+                    continue
+
+                with os.scandir(folder.path) as files:
+                    for file in files:
+                        if file.name.endswith(".tmp"):
+                            continue
+                        try:
+                            stat = file.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, file.path, stat.st_size))
+
+        return entries
+
+    @staticmethod
+    def _copy_file(source_path: str, destination_path: str) -> None:
+        # Copies the file to a temporary file renamed into place, so that readers never see
+        # a partial file
+        tmp_path = f"{destination_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, destination_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def get_default_object_cache() -> ObjectCache | None:
+    """
+    Returns the object cache configured in the settings, None if it is disabled.
+    """
+    if not OBJECT_CACHE_PATH:
+        return None
+
+    return ObjectCache(os.path.abspath(OBJECT_CACHE_PATH), OBJECT_CACHE_MAX_BYTES)
@@ -0,0 +1,221 @@
+import io
+from collections.abc import Iterable
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from minio.datatypes import Object
+
+from src.models.model_bucket_client import BucketClient
+
+MANIFEST_NAME = "manifest.parquet"
+
+# Per-object attributes, null when unknown
+ATTRIBUTE_COLUMNS = ("split", "width", "height", "classes")
+
+MANIFEST_SCHEMA = pa.schema(
+    [
+        ("key", pa.string()),
+        ("size", pa.int64()),
+        ("etag", pa.string()),
+        ("split", pa.string()),
+        ("width", pa.int32()),
+        ("height", pa.int32()),
+        ("classes", pa.list_(pa.int16())),
+    ]
+)
+
+
+class ObjectManifest:
+    def __init__(self, table: pa.Table | None = None):
+        """
+        Initialize the ObjectManifest object, a columnar (Parquet) listing of the objects of a
+        data source or a dataset with their attributes, stored next to them in the bucket.
+        Consumers can plan their work from this single small file instead of a full listing.
+
+        Args:
+            table (pa.Table | None): The manifest rows, following MANIFEST_SCHEMA.
+        """
+        self.table = table if table is not None else MANIFEST_SCHEMA.empty_table()
+
+    @classmethod
+    def from_objects(
+        cls,
+        objects: Iterable[Object],
+        attributes: dict[str, dict] | None = None,
+    ) -> "ObjectManifest":
+        """
+        Creates a manifest from listed objects.
+
+        Args:
+            objects (Iterable[Object]): The objects, e.g. a bucket listing.
+            attributes (dict[str, dict] | None): The known attributes (split, width, height,
+                classes) of the objects by object name.
+
+        Returns:
+            ObjectManifest: The manifest of the objects.
+        """
+        attributes = attributes or {}
+        columns = {name: [] for name in MANIFEST_SCHEMA.names}
+        for obj in objects:
+            if obj.is_dir:
+                continue
+
+            object_attributes = attributes.get(obj.object_name, {})
+            columns["key"].append(obj.object_name)
+            columns["size"].append(obj.size)
+            columns["etag"].append(obj.etag)
+            for column in ATTRIBUTE_COLUMNS:
+                columns[column].append(object_attributes.get(column))
+
+        return cls(pa.Table.from_pydict(columns, schema=MANIFEST_SCHEMA))
+
+    @classmethod
+    def read(cls, manifest_path: str) -> "ObjectManifest":
+        """
+        Reads a manifest from a local Parquet file.
+
+        Args:
+            manifest_path (str): The local path of the manifest.
+
+        Returns:
+            ObjectManifest: The manifest.
+        """
+        return cls(pq.read_table(manifest_path, schema=MANIFEST_SCHEMA))
+
+    @classmethod
+    def load(
+        cls, bucket_client: BucketClient, bucket_name: str, object_name: str
+    ) -> "ObjectManifest | None":
+        """
+        Loads a manifest from the bucket.
+
+        Args:
+            bucket_client (BucketClient): The bucket client used to read the manifest.
+            bucket_name (str): The name of the bucket.
+            object_name (str): The object name of the manifest.
+
+        Returns:
+            ObjectManifest | None: The manifest, None if it does not exist.
+        """
+        if not any(
+            obj.object_name == object_name
+            for obj in bucket_client.list_objects(
+                bucket_name=bucket_name, prefix=object_name
+            )
+        ):
+            return None
+
+        response = bucket_client.get_object(bucket_name, object_name)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+        return cls(pq.read_table(pa.BufferReader(data), schema=MANIFEST_SCHEMA))
+
+    def write(self, manifest_path: str) -> None:
+        """
+        Writes the manifest to a local Parquet file.
+
+        Args:
+            manifest_path (str): The local path of the manifest.
+        """
+        pq.write_table(self.table, manifest_path)
+
+    def upload(
+        self,
+        bucket_client: BucketClient,
+        bucket_name: str,
+        object_name: str,
+        metadata: dict | None = None,
+    ) -> None:
+        """
+        Uploads the manifest to the bucket.
+
+        Args:
+            bucket_client (BucketClient): The bucket client used to upload the manifest.
+            bucket_name (str): The name of the bucket.
+            object_name (str): The object name of the manifest.
+            metadata (dict | None): The metadata of the manifest object.
+        """
+        buffer = io.BytesIO()
+        pq.write_table(self.table, buffer)
+        bucket_client.upload_data(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            data=io.BytesIO(buffer.getvalue()),
+            length=buffer.tell(),
+            metadata=metadata,
+        )
+
+    def to_objects(self, bucket_name: str) -> list[Object]:
+        """
+        Gets the objects of the manifest, as a bucket listing would return them.
+
+        Args:
+            bucket_name (str): The name of the bucket of the objects.
+
+        Returns:
+            list[Object]: The objects, with their name, size and ETag.
+        """
+        return [
+            Object(bucket_name, key, etag=etag, size=size)
+            for key, size, etag in zip(
+                self.table.column("key").to_pylist(),
+                self.table.column("size").to_pylist(),
+                self.table.column("etag").to_pylist(),
+            )
+        ]
+
+    def reconcile(self, objects: Iterable[Object]) -> "ObjectManifest":
+        """
+        Updates the manifest to a listing of the objects: the objects added, changed or
+        removed since the manifest was written are updated, and only the attributes of the
+        objects whose ETag did not change are kept.
+
+        Args:
+            objects (Iterable[Object]): The objects, e.g. a bucket listing.
+
+        Returns:
+            ObjectManifest: The manifest of the listed objects.
+        """
+        etags = dict(
+            zip(
+                self.table.column("key").to_pylist(),
+                self.table.column("etag").to_pylist(),
+            )
+        )
+        objects = [obj for obj in objects if not obj.is_dir]
+        attributes = self.get_attributes()
+        return ObjectManifest.from_objects(
+            objects,
+            {
+                obj.object_name: attributes[obj.object_name]
+                for obj in objects
+                if obj.object_name in attributes and etags[obj.object_name] == obj.etag
+            },
+        )
+
+    def get_attributes(self) -> dict[str, dict]:
+        """
+        Gets the known attributes of the objects, to carry them over to a new manifest.
+
+        Returns:
+            dict[str, dict]: The non-null attributes of the objects by object name.
+        """
+        columns = {
+            column: self.table.column(column).to_pylist()
+            for column in ("key",) + ATTRIBUTE_COLUMNS
+        }
+        return {
+            key: {
+                column: columns[column][row]
+                for column in ATTRIBUTE_COLUMNS
+                if columns[column][row] is not None
+            }
+            for row, key in enumerate(columns["key"])
+        }
+
+    def __len__(self) -> int:
+        return self.table.num_rows
@@ -0,0 +1,285 @@
+import io
+import json
+import os
+import tarfile
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from minio.datatypes import Object
+
+from src.config.settings import SHARD_TARGET_SIZE
+from src.models.model_bucket_client import BucketClient
+
+SHARDS_FOLDER_NAME = "shards"
+SHARD_INDEX_NAME = "index.json"
+
+
+def get_shards_prefix(data_source_name: str) -> str:
+    return f"{data_source_name}/{SHARDS_FOLDER_NAME}/"
+
+
+def is_shard_object(object_name: str) -> bool:
+    return f"/{SHARDS_FOLDER_NAME}/" in object_name and object_name.endswith(".tar")
+
+
+class ShardIndex:
+    def __init__(
+        self,
+        shard_names: list[str] | None = None,
+        members: dict[str, list[int]] | None = None,
+    ):
+        """
+        Index of the samples packed in the tar shards of a data source.
+
+        Args:
+            shard_names (list[str] | None): The names of the shards, relative to the data source.
+            members (dict[str, list[int]] | None): Maps each member (e.g. "images/<hash>.png") to
+                [shard position in `shard_names`, data offset in the shard, data size].
+        """
+        self.shard_names = shard_names or []
+        self.members = members or {}
+
+    @classmethod
+    def load(
+        cls, bucket_client: BucketClient, bucket_name: str, data_source_name: str
+    ) -> "ShardIndex | None":
+        """
+        Loads the shard index of a data source from the bucket.
+
+        Returns:
+            ShardIndex | None: The shard index, None if the data source is not sharded.
+        """
+        index_object_name = get_shards_prefix(data_source_name) + SHARD_INDEX_NAME
+        if not any(
+            obj.object_name == index_object_name
+            for obj in bucket_client.list_objects(
+                bucket_name=bucket_name, prefix=index_object_name
+            )
+        ):
+            return None
+
+        response = bucket_client.get_object(bucket_name, index_object_name)
+        try:
+            data = json.loads(response.read())
+        finally:
+            response.close()
+            response.release_conn()
+
+        return cls(shard_names=data["shards"], members=data["members"])
+
+    def to_json(self) -> bytes:
+        return json.dumps(
+            {"shards": self.shard_names, "members": self.members}
+        ).encode()
+
+
+class ShardWriter:
+    def __init__(
+        self,
+        bucket_client: BucketClient,
+        bucket_name: str,
+        data_source_name: str,
+        target_size: int = SHARD_TARGET_SIZE,
+        index: ShardIndex | None = None,
+        metadata: dict | None = None,
+    ):
+        """
+        Packs the objects of a data source into ~`target_size` tar shards with an index.
+        Members can be added from several threads; full shards are uploaded in the background.
+        The uploaded shards and index are listed in `uploaded_objects`.
+
+        Args:
+            bucket_client (BucketClient): The bucket client used to upload the shards.
+            bucket_name (str): The name of the bucket.
+            data_source_name (str): The data source, the shards are stored under `<name>/shards/`.
+            target_size (int): Size in bytes after which a shard is closed and uploaded.
+            index (ShardIndex | None): The existing index to extend, new shards are appended.
+            metadata (dict | None): The metadata attached to the shards.
+        """
+        self.bucket_client = bucket_client
+        self.bucket_name = bucket_name
+        self.data_source_name = data_source_name
+        self.target_size = target_size
+        self.index = index or ShardIndex()
+        self.metadata = metadata
+        self.uploaded_objects: list[Object] = []
+
+        self._lock = threading.Lock()
+        self._upload_executor = ThreadPoolExecutor(max_workers=2)
+        self._uploads: list[Future] = []
+        self._tar: tarfile.TarFile | None = None
+        self._tar_path: str | None = None
+        self._shard_position: int | None = None
+
+    def add(self, object_name: str, data: bytes) -> None:
+        """
+        Adds an object of the data source to the current shard.
+
+        Args:
+            object_name (str): The object name, e.g. "<data_source>/images/<hash>.png".
+            data (bytes): The content of the object.
+        """
+        member_name = os.path.relpath(object_name, self.data_source_name)
+        tar_info = tarfile.TarInfo(name=member_name)
+        tar_info.size = len(data)
+
+        with self._lock:
+            if self._tar is None:
+                self._open_shard()
+
+            # The member's data starts right after its header blocks
+            header = tar_info.tobuf(
+                self._tar.format, self._tar.encoding, self._tar.errors
+            )
+            self.index.members[member_name] = [
+                self._shard_position,
+                self._tar.offset + len(header),
+                tar_info.size,
+            ]
+            self._tar.addfile(tar_info, io.BytesIO(data))
+
+            if self._tar.fileobj.tell() >= self.target_size:
+                self._close_shard()
+
+    def close(self) -> None:
+        """
+        Uploads the last shard and the index, and waits for all the uploads to complete.
+        """
+        with self._lock:
+            if self._tar is not None:
+                self._close_shard()
+
+        try:
+            for upload in self._uploads:
+                upload.result()
+        finally:
+            self._upload_executor.shutdown()
+
+        index_data = self.index.to_json()
+        result = self.bucket_client.upload_data(
+            bucket_name=self.bucket_name,
+            object_name=get_shards_prefix(self.data_source_name) + SHARD_INDEX_NAME,
+            data=io.BytesIO(index_data),
+            length=len(index_data),
+            metadata=self.metadata,
+        )
+        self.uploaded_objects.append(
+            Object(
+                self.bucket_name,
+                result.object_name,
+                etag=result.etag,
+                size=len(index_data),
+            )
+        )
+
+    def _open_shard(self) -> None:
+        self._shard_position = len(self.index.shard_names)
+        self.index.shard_names.append(
+            f"{SHARDS_FOLDER_NAME}/shard-{self._shard_position:06d}.tar"
+        )
+
+        file_descriptor, self._tar_path = tempfile.mkstemp(suffix=".tar")
+        self._tar = tarfile.open(fileobj=os.fdopen(file_descriptor, "wb"), mode="w")
+
+    def _close_shard(self) -> None:
+        self._tar.close()
+        self._tar.fileobj.close()
+
+        object_name = (
+            f"{self.data_source_name}/{self.index.shard_names[self._shard_position]}"
+        )
+        self._uploads.append(
+            self._upload_executor.submit(
+                self._upload_shard, object_name, self._tar_path
+            )
+        )
+        self._tar = None
+        self._tar_path = None
+
+    def _upload_shard(self, object_name: str, tar_path: str) -> None:
+        try:
+            size = os.path.getsize(tar_path)
+            result = self.bucket_client.upload_file(
+                bucket_name=self.bucket_name,
+                object_name=object_name,
+                file_path=tar_path,
+                metadata=self.metadata,
+            )
+        finally:
+            os.remove(tar_path)
+
+        with self._lock:
+            self.uploaded_objects.append(
+                Object(self.bucket_name, object_name, etag=result.etag, size=size)
+            )
+
+
+class ShardReader:
+    def __init__(
+        self,
+        bucket_client: BucketClient,
+        bucket_name: str,
+        data_source_name: str,
+        index: ShardIndex,
+    ):
+        """
+        Random access to the objects packed in the tar shards of a data source.
+
+        Args:
+            bucket_client (BucketClient): The bucket client used to read the shards.
+            bucket_name (str): The name of the bucket.
+            data_source_name (str): The name of the sharded data source.
+            index (ShardIndex): The index of the shards.
+        """
+        self.bucket_client = bucket_client
+        self.bucket_name = bucket_name
+        self.data_source_name = data_source_name
+        self.index = index
+
+    def read(self, member_name: str) -> bytes:
+        """
+        Reads one member with a ranged GET on its shard.
+
+        Args:
+            member_name (str): The member name, e.g. "images/<hash>.png".
+
+        Returns:
+            bytes: The content of the member.
+        """
+        shard_position, offset, size = self.index.members[member_name]
+        response = self.bucket_client.get_object(
+            bucket_name=self.bucket_name,
+            object_name=(
+                f"{self.data_source_name}/{self.index.shard_names[shard_position]}"
+            ),
+            offset=offset,
+            length=size,
+        )
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+
+def extract_shard(tar_path: str, destination_path: str) -> list[str]:
+    """
+    Extracts a downloaded shard and deletes it.
+
+    Args:
+        tar_path (str): The local path of the shard.
+        destination_path (str): The folder where the members are extracted.
+
+    Returns:
+        list[str]: The names of the extracted files, relative to `destination_path`.
+    """
+    with tarfile.open(tar_path) as tar:
+        members = tar.getmembers()
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(destination_path, members=members, filter="data")
+        else:
+            tar.extractall(destination_path, members=members)
+
+    os.remove(tar_path)
+    return [member.name for member in members if member.isfile()]
@@ -0,0 +1,116 @@
+import resource
+import time
+
+from src.utils.benchmark_helper import get_peak_rss_mb
+
+
+class StepProfile:
+    def __init__(self, step_name: str):
+        """
+        Initialize the StepProfile object, measuring the resources used by a run of a step.
+
+        The CPU time includes the worker processes of the step once they have exited. The
+        peak RSS is the high-water mark of the process and of its exited children, which
+        never decreases: the steps run in the same process share it, and the growth of the
+        peak over the step shows how much memory the step itself needed.
+
+        Args:
+            step_name (str): The name of the profiled step.
+        """
+        self.step_name = step_name
+        self.items = 0
+        self.bytes = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self.peak_rss_growth_mb = 0.0
+
+        self._start_time = 0.0
+        self._start_cpu_time = 0.0
+        self._start_peak_rss_mb = 0.0
+
+    def add(self, items: int = 0, num_bytes: int = 0) -> None:
+        """
+        Records items processed and bytes read or written by the step.
+
+        Args:
+            items (int): The number of items, e.g. images or objects.
+            num_bytes (int): The number of bytes.
+        """
+        self.items += items
+        self.bytes += num_bytes
+
+    def start(self) -> "StepProfile":
+        self._start_time = time.perf_counter()
+        self._start_cpu_time = self._get_cpu_time()
+        self._start_peak_rss_mb = get_peak_rss_mb()
+        return self
+
+    def stop(self) -> "StepProfile":
+        self.wall_seconds = time.perf_counter() - self._start_time
+        self.cpu_seconds = self._get_cpu_time() - self._start_cpu_time
+        self.peak_rss_mb = get_peak_rss_mb()
+        self.peak_rss_growth_mb = self.peak_rss_mb - self._start_peak_rss_mb
+        return self
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / 1e6 / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def to_metrics(self) -> dict[str, float]:
+        """
+        Convert the profile to experiment tracker metrics.
+
+        Returns:
+            dict[str, float]: The metrics, named "<step name>/<metric>".
+        """
+        return {
+            f"{self.step_name}/{metric}": float(value)
+            for metric, value in self.to_dict().items()
+            if metric != "step_name"
+        }
+
+    def to_dict(self) -> dict:
+        """
+        Convert the step profile to a dictionary.
+
+        Returns:
+            dict: Dictionary representation of the step profile.
+        """
+        return {
+            "step_name": self.step_name,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_mb": self.peak_rss_mb,
+            "peak_rss_growth_mb": self.peak_rss_growth_mb,
+            "items": self.items,
+            "bytes": self.bytes,
+            "items_per_second": self.items_per_second,
+            "mb_per_second": self.mb_per_second,
+        }
+
+    def __str__(self):
+        """
+        String representation of the StepProfile object.
+        """
+        return (
+            f"{self.wall_seconds:.2f} s wall, {self.cpu_seconds:.2f} s CPU,"
+            f" {self.peak_rss_mb:.0f} MB peak RSS (+{self.peak_rss_growth_mb:.0f} MB),"
+            f" {self.items} items, {self.bytes / 1e6:.2f} MB"
+            f" ({self.items_per_second:.1f} items/s, {self.mb_per_second:.2f} MB/s)"
+        )
+
+    @staticmethod
+    def _get_cpu_time() -> float:
+        # Children are only accounted for once they have exited and been waited for
+        return sum(
+            usage.ru_utime + usage.ru_stime
+            for usage in (
+                resource.getrusage(resource.RUSAGE_SELF),
+                resource.getrusage(resource.RUSAGE_CHILDREN),
+            )
+        )
@@ -0,0 +1,83 @@
+import time
+
+
+class TransferStats:
+    def __init__(self):
+        """
+        Initialize the TransferStats object, starting the transfer clock.
+        """
+        self.objects = 0
+        self.bytes = 0
+        self.start_time = time.perf_counter()
+        self.end_time: float | None = None
+
+    def add(self, size: int) -> None:
+        """
+        Records a transferred object.
+
+        Args:
+            size (int): The size of the transferred object in bytes.
+        """
+        self.objects += 1
+        self.bytes += size
+
+    def stop(self) -> "TransferStats":
+        """
+        Stops the transfer clock.
+
+        Returns:
+            TransferStats: The stopped TransferStats object.
+        """
+        self.end_time = time.perf_counter()
+        return self
+
+    @property
+    def elapsed_seconds(self) -> float:
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+        return end_time - self.start_time
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed_seconds = self.elapsed_seconds
+        return self.bytes / elapsed_seconds if elapsed_seconds > 0 else 0.0
+
+    @property
+    def objects_per_second(self) -> float:
+        elapsed_seconds = self.elapsed_seconds
+        return self.objects / elapsed_seconds if elapsed_seconds > 0 else 0.0
+
+    def format_rate(self) -> str:
+        """
+        Formats the current throughput for progress bars and logs.
+
+        Returns:
+            str: The throughput in MB/s and objects/s.
+        """
+        return (
+            f"{self.bytes_per_second / 1e6:.2f} MB/s,"
+            f" {self.objects_per_second:.1f} obj/s"
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Convert the transfer statistics to a dictionary.
+
+        Returns:
+            dict: Dictionary representation of the transfer statistics.
+        """
+        return {
+            "objects": self.objects,
+            "bytes": self.bytes,
+            "elapsed_seconds": self.elapsed_seconds,
+            "bytes_per_second": self.bytes_per_second,
+            "objects_per_second": self.objects_per_second,
+        }
+
+    def __str__(self):
+        """
+        String representation of the TransferStats object.
+        """
+        return (
+            f"{self.objects} objects, {self.bytes / 1e6:.2f} MB in"
+            f" {self.elapsed_seconds:.2f}s ({self.format_rate()})"
+        )
@@ -0,0 +1,77 @@
+class ValidationReport:
+    def __init__(self):
+        """
+        Initialize the ValidationReport object, listing the problems found in a dataset.
+        Samples are identified by their file name without extension.
+        """
+        self.num_samples = 0
+        self.missing_images: list[str] = []
+        self.missing_annotations: list[str] = []
+        self.missing_labels: list[str] = []
+        self.empty_labels: list[str] = []
+        self.size_mismatches: list[str] = []
+        self.truncated_files: list[str] = []
+        self.unreadable_files: list[str] = []
+
+    @property
+    def is_valid(self) -> bool:
+        """
+        Whether the dataset can be used for training. Empty labels are not errors: they
+        are the labels of images without any object.
+        """
+        return not (
+            self.missing_images
+            or self.missing_annotations
+            or self.missing_labels
+            or self.size_mismatches
+            or self.truncated_files
+            or self.unreadable_files
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Convert the validation report to a dictionary.
+
+        Returns:
+            dict: Dictionary representation of the validation report.
+        """
+        return {
+            "num_samples": self.num_samples,
+            "is_valid": self.is_valid,
+            "missing_images": sorted(self.missing_images),
+            "missing_annotations": sorted(self.missing_annotations),
+            "missing_labels": sorted(self.missing_labels),
+            "empty_labels": sorted(self.empty_labels),
+            "size_mismatches": sorted(self.size_mismatches),
+            "truncated_files": sorted(self.truncated_files),
+            "unreadable_files": sorted(self.unreadable_files),
+        }
+
+    def to_metrics(self) -> dict[str, float]:
+        """
+        Convert the validation report to experiment tracker metrics.
+
+        Returns:
+            dict[str, float]: The number of samples, the validity and the number of files
+                of each problem, named "validation/<field>".
+        """
+        return {
+            f"validation/{field}": float(
+                len(value) if isinstance(value, list) else value
+            )
+            for field, value in self.to_dict().items()
+        }
+
+    def __str__(self):
+        """
+        String representation of the ValidationReport object.
+        """
+        return (
+            f"{self.num_samples} samples: {len(self.missing_images)} missing images,"
+            f" {len(self.missing_annotations)} missing annotations,"
+            f" {len(self.missing_labels)} missing labels,"
+            f" {len(self.empty_labels)} empty labels,"
+            f" {len(self.size_mismatches)} size mismatches,"
+            f" {len(self.truncated_files)} truncated files,"
+            f" {len(self.unreadable_files)} unreadable files"
+        )
@@ -49,6 +49,7 @@ from src.steps.training.model_evaluator import (
 from src.steps.training.model_validator import (
     model_validation,
 )
+from src.utils.tracker_helper import with_experiment_tracker
 
 
 @pipeline(name=MLFLOW_EXPERIMENT_PIPELINE_NAME)
@@ -61,29 +62,36 @@ def gitflow_experiment_pipeline(cfg: str) -> None:
     """
     pipeline_config = OmegaConf.to_container(OmegaConf.create(cfg))
 
-    data_source_extractor(
+    # The profiled steps log their metrics to a run of the experiment tracker
+    with_experiment_tracker(data_source_extractor)(
         data_source="human_parsing_dataset",
         bucket_name=MINIO_DATA_SOURCES_BUCKET_NAME,
         extraction_path=EXTRACTED_DATASETS_PATH,
+        use_object_manifest=pipeline_config["data"]["use_object_manifest"],
     )
 
-    converted_path = dataset_to_yolo_converter(
-        path_dir=EXTRACTED_DATASETS_PATH + "/human_parsing_dataset"
+    converted_path = with_experiment_tracker(dataset_to_yolo_converter)(
+        path_dir=EXTRACTED_DATASETS_PATH + "/human_parsing_dataset",
+        imgsz=pipeline_config["model"]["imgsz"],
     )
 
-    validated_path = dataset_validator(path_dir=converted_path)
+    validated_path = with_experiment_tracker(dataset_validator)(
+        path_dir=converted_path, deep=True
+    )
 
-    custom_dataset_path = dataset_splitter(dataset_path=validated_path, percentage=0.1)
+    custom_dataset_path = with_experiment_tracker(dataset_splitter)(
+        dataset_path=validated_path, percentage=0.1
+    )
 
     # Due to ram problems, the trainer might get stuck
 
-    trained_model_path = model_trainer(
+    trained_model_path = with_experiment_tracker(model_trainer)(
         model_path="models",
         dataset_path=custom_dataset_path,
         pipeline_config=pipeline_config,
     )
 
-    metrics = model_evaluator(
+    metrics = with_experiment_tracker(model_evaluator)(
         model_path=trained_model_path,
         dataset_path=custom_dataset_path,
     )
@@ -1,25 +1,118 @@
-import hashlib
 import io
 import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from collections.abc import Set as AbstractSet
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
 
+import numpy as np
 import PIL.Image
 import tqdm
+from minio.datatypes import Object
+from minio.helpers import ObjectWriteResult
 
-from datasets import load_dataset
+from datasets import Image, load_dataset
+from zenml.logger import get_logger
 
+from src.config.settings import (
+    BUCKET_CLIENT_MAX_WORKERS,
+    UPLOAD_MULTIPART_PARALLEL_PARTS,
+    UPLOAD_MULTIPART_PART_SIZE,
+)
 from src.models.model_bucket_client import BucketClient
 from src.models.model_data_source import (
     DataSource,
     HuggingFaceDataSource,
     LocalDataSource,
 )
+from src.models.model_object_manifest import MANIFEST_NAME, ObjectManifest
+from src.models.model_shard import ShardIndex, ShardWriter
+from src.models.model_transfer_stats import TransferStats
+from src.utils.concurrency_helper import bounded_map
+from src.utils.file_helper import scan_files
+from src.utils.hash_helper import get_hash_function
+from src.utils.image_helper import get_png_size, read_png_header
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class IngestionMode(Enum):
+    DECODED = "decoded"
+    RAW = "raw"
+
+
+def encode_png(data: bytes) -> bytes:
+    """
+    Re-encodes an encoded image (JPEG, BMP...) to PNG.
+    Defined at module level so that it can run in a process pool.
+
+    Args:
+        data (bytes): The encoded image.
+
+    Returns:
+        bytes: The PNG encoded image.
+    """
+    with PIL.Image.open(io.BytesIO(data)) as image:
+        image_buffer = io.BytesIO()
+        image.save(image_buffer, format="PNG")
+        return image_buffer.getvalue()
 
 
 class DataUploaderService:
-    def __init__(self, bucket_client: BucketClient):
+    def __init__(
+        self,
+        bucket_client: BucketClient,
+        ingestion_mode: IngestionMode = IngestionMode.DECODED,
+        hash_algorithm: str = "sha256",
+        reencode_workers: int | None = None,
+        streaming: bool = False,
+        max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+        max_in_flight: int | None = None,
+        skip_existing: bool = False,
+        shard_format: bool = False,
+    ):
+        """
+        Initialize the DataUploaderService object.
+
+        Args:
+            bucket_client (BucketClient): The bucket client used to upload the data.
+            ingestion_mode (IngestionMode): DECODED decodes the HuggingFace images with PIL and
+                encodes them to PNG. RAW uploads the encoded bytes stored in the dataset as-is,
+                hashing and uploading the same bytes without decoding them.
+            hash_algorithm (str): The algorithm used to name the uploaded objects (see
+                `get_hash_function`), e.g. "xxh3_128" for a faster non-cryptographic hash.
+            reencode_workers (int | None): Number of processes re-encoding the non-PNG images
+                in RAW mode. Defaults to the number of CPUs.
+            streaming (bool): Stream the HuggingFace dataset instead of downloading and
+                caching it entirely before the upload.
+            max_workers (int): Number of concurrent upload threads.
+            max_in_flight (int | None): Maximum number of items read from the dataset but not
+                uploaded yet. Defaults to twice `max_workers`.
+            skip_existing (bool): Do not upload again the HuggingFace content-addressed
+                objects already in the bucket, found with one listing of the data source.
+            shard_format (bool): Pack the HuggingFace images and masks into ~256 MB tar shards
+                indexed in `<data_source>/shards/index.json`, instead of one object per file.
+        """
         self.bucket_client = bucket_client
+        self.ingestion_mode = ingestion_mode
+        self.hash_function = get_hash_function(hash_algorithm)
+        self.reencode_workers = reencode_workers
+        self.streaming = streaming
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight
+        self.skip_existing = skip_existing
+        self.shard_format = shard_format
+
+        self._shard_writer: ShardWriter | None = None
+        # Attributes (size, classes) of the objects uploaded by this run, for the manifest
+        self._manifest_attributes: dict[str, dict] = {}
+        # Objects uploaded by this run, and objects found in the bucket before it
+        self._uploaded_objects: dict[str, Object] = {}
+        self._existing_objects: dict[str, Object] | None = None
+
+        self._reencode_executor: ProcessPoolExecutor | None = None
+        self._reencode_executor_lock = threading.Lock()
 
     def upload_data(self, bucket_name: str, data_source: DataSource) -> None:
         """
@@ -49,19 +142,50 @@ class DataUploaderService:
             bucket_name (str): Name of the bucket where the dataset will be uploaded.
             data_source (LocalDataSource): A LocalDataset object to upload.
         """
-        for current_directory, _, file_list in os.walk(data_source.root_folder_path):
-            for file_name in file_list:
-                file_path_on_disk = os.path.join(current_directory, file_name)
-                relative_path = os.path.relpath(
-                    file_path_on_disk, start=data_source.root_folder_path
-                )
-                bucket_object_path = os.path.join(data_source.name, relative_path)
-                self.bucket_client.upload_file(
-                    bucket_name,
-                    bucket_object_path,
-                    file_path_on_disk,
-                    data_source.get_metadata().to_dict(),
-                )
+        metadata = data_source.get_metadata().to_dict()
+
+        def upload_file(entry: os.DirEntry) -> int:
+            relative_path = os.path.relpath(
+                entry.path, start=data_source.root_folder_path
+            )
+            bucket_object_path = os.path.join(data_source.name, relative_path)
+            if entry.name.endswith(".png"):
+                try:
+                    width, height, _ = read_png_header(entry.path)
+                    self._manifest_attributes[bucket_object_path] = {
+                        "width": width,
+                        "height": height,
+                    }
+                except ValueError:
+                    pass
+
+            result = self.bucket_client.upload_file(
+                bucket_name,
+                bucket_object_path,
+                entry.path,
+                metadata,
+                part_size=UPLOAD_MULTIPART_PART_SIZE,
+                num_parallel_uploads=UPLOAD_MULTIPART_PARALLEL_PARTS,
+            )
+            size = entry.stat().st_size
+            self._record_upload(result, size)
+            return size
+
+        stats = TransferStats()
+        with tqdm.tqdm(desc="Uploading files", unit="obj") as progress_bar:
+            for _, size in bounded_map(
+                upload_file,
+                scan_files(data_source.root_folder_path),
+                max_workers=self.max_workers,
+                max_in_flight=self.max_in_flight,
+            ):
+                stats.add(size)
+                progress_bar.update(1)
+                progress_bar.set_postfix_str(stats.format_rate(), refresh=False)
+
+        print(f"Uploaded {stats.stop()}")
+
+        self._upload_manifest(bucket_name, data_source.name, metadata)
 
     def _upload_huggingface_data_source(
         self, bucket_name: str, data_source: HuggingFaceDataSource
@@ -77,39 +201,70 @@ class DataUploaderService:
         # check encoding of the dataset
         print(data_source.dataset_name)
 
-        hf_data_source = load_dataset(data_source.dataset_name, split="train")
+        # A streamed dataset is downloaded and decoded lazily, shard by shard
+        hf_data_source = load_dataset(
+            data_source.dataset_name, split="train", streaming=self.streaming
+        )
+        if self.ingestion_mode == IngestionMode.RAW:
+            # Keep the images encoded, items then hold {"bytes": ..., "path": ...}
+            hf_data_source = hf_data_source.cast_column(
+                "image", Image(decode=False)
+            ).cast_column("mask", Image(decode=False))
+
+        if self.streaming:
+            split_info = (hf_data_source.info.splits or {}).get("train")
+            total_items = split_info.num_examples if split_info else None
+        else:
+            total_items = len(hf_data_source)
 
-        max_workers = 10
+        metadata = data_source.get_metadata().to_dict()
+        if self.shard_format:
+            self._shard_writer = ShardWriter(
+                bucket_client=self.bucket_client,
+                bucket_name=bucket_name,
+                data_source_name=data_source.name,
+                index=ShardIndex.load(
+                    self.bucket_client, bucket_name, data_source.name
+                ),
+                metadata=metadata,
+            )
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
+        existing_object_names = self._list_existing_object_names(
+            bucket_name, data_source.name
+        )
 
-            # total_items = sum(
-            #     len(hf_data_source[split]) for split in hf_data_source.keys()
-            # )
+        def upload_item(item: dict) -> int:
+            return self._upload_task(
+                bucket_name, data_source.name, item, metadata, existing_object_names
+            )
 
-            total_items = len(hf_data_source)
-            with tqdm.tqdm(
-                total=total_items, desc="Scheduling uploads"
-            ) as schedule_bar:
-                # for split in hf_data_source.keys():
-                # for item in hf_data_source[split]:
-                for item in hf_data_source:
-                    future = executor.submit(
-                        self._upload_task,
-                        bucket_name,
-                        data_source.name,
-                        item,
-                        data_source.get_metadata().to_dict(),
-                    )
-                    futures.append(future)
-
-                    schedule_bar.update(1)
-
-            for _ in tqdm.tqdm(
-                as_completed(futures), total=len(futures), desc="Uploading files"
+        # At most `max_in_flight` items are pulled from the dataset ahead of the uploads,
+        # so memory stays flat and the dataset is read at the pace of the bucket.
+        skipped_objects = 0
+        upload_error = None
+        try:
+            for _, skipped_item_objects in tqdm.tqdm(
+                bounded_map(
+                    upload_item,
+                    hf_data_source,
+                    max_workers=self.max_workers,
+                    max_in_flight=self.max_in_flight,
+                ),
+                total=total_items,
+                desc="Uploading files",
             ):
-                pass
+                skipped_objects += skipped_item_objects
+        except BaseException as e:
+            upload_error = e
+            raise
+        finally:
+            self._shutdown_reencode_executor()
+
+            # Index the members written so far, even when the upload failed
+            if self._shard_writer is not None:
+                self._close_shard_writer(upload_error)
+
+        print(f"Skipped {skipped_objects} objects already present in the bucket.")
 
         label_map_path = os.path.join(data_source.name, "label_map.json")
         self._upload_json(
@@ -118,46 +273,216 @@ class DataUploaderService:
             data=data_source.label_map,
         )
 
+        self._upload_manifest(bucket_name, data_source.name, metadata)
+
+    def _close_shard_writer(self, upload_error: BaseException | None = None) -> None:
+        """
+        Closes the shard writer, uploading its last shard and the index.
+
+        Args:
+            upload_error (BaseException | None): The error that interrupted the upload, if
+                any. It is then the one raised, and a failure to close is only logged.
+        """
+        shard_writer, self._shard_writer = self._shard_writer, None
+        try:
+            shard_writer.close()
+        except Exception:
+            if upload_error is None:
+                raise
+            get_logger(__name__).exception(
+                "Failed to close the shards after the upload failed."
+            )
+        finally:
+            self._uploaded_objects.update(
+                (obj.object_name, obj) for obj in shard_writer.uploaded_objects
+            )
+
+    def _upload_manifest(
+        self, bucket_name: str, data_source_name: str, metadata: dict | None = None
+    ) -> None:
+        """
+        Uploads the manifest of a data source, listing all its objects with their ETag and
+        size, and the image size and classes recorded by this upload or by the previous ones.
+
+        The objects are the ones uploaded by this run, added to the listing of the bucket made
+        before the upload if any (see `skip_existing`), or else to the previous manifest, so
+        that the data source is not listed again.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            data_source_name (str): Name of the data source.
+            metadata (metadata: dict | None): The manifest's metadata.
+        """
+        manifest_name = f"{data_source_name}/{MANIFEST_NAME}"
+
+        previous_manifest = ObjectManifest.load(
+            self.bucket_client, bucket_name, manifest_name
+        )
+        attributes = previous_manifest.get_attributes() if previous_manifest else {}
+        attributes.update(self._manifest_attributes)
+        self._manifest_attributes = {}
+
+        if self._existing_objects is not None:
+            objects = self._existing_objects
+        elif previous_manifest is not None:
+            objects = {
+                obj.object_name: obj
+                for obj in previous_manifest.to_objects(bucket_name)
+            }
+        else:
+            objects = {}
+        objects.update(self._uploaded_objects)
+        objects.pop(manifest_name, None)
+        self._uploaded_objects = {}
+        self._existing_objects = None
+
+        manifest = ObjectManifest.from_objects(objects.values(), attributes)
+        manifest.upload(self.bucket_client, bucket_name, manifest_name, metadata)
+
+        print(f"Uploaded the manifest of {len(manifest)} objects.")
+
     def _upload_task(
         self,
         bucket_name: str,
         dataset_name: str,
         item: dict,
         metadata: dict | None = None,
-    ) -> None:
+        existing_object_names: AbstractSet[str] = frozenset(),
+    ) -> int:
         """
-        Task to upload an image and its corresponding JSON to the bucket.
+        Task to upload an image and its corresponding mask to the bucket.
 
         Args:
             bucket_name (str): Name of the bucket.
             dataset_name (str): Name of the dataset.
             item (dict): An item from the dataset containing image and metadata.
             metadata (metadata: dict | None): The file's metadata.
+            existing_object_names (AbstractSet[str]): Names of the objects already in the
+                bucket. Since objects are named by their content hash, they are not uploaded again.
+
+        Returns:
+            int: The number of objects skipped because they already exist.
         """
-        unique_id = self._hash_image(item["image"])
+        if self.ingestion_mode == IngestionMode.RAW:
+            image_data = self._get_png_bytes(item["image"])
+            unique_id = self.hash_function(image_data)
+        else:
+            image_data = None
+            unique_id = self._hash_image(item["image"])
 
         image_path = f"{dataset_name}/images/{unique_id}.png"
-        self._upload_image(
-            bucket_name=bucket_name,
-            image_path=image_path,
-            image=item["image"],
-            metadata=metadata,
-        )
-
         mask_path = f"{dataset_name}/annotations/{unique_id}.png"
-        # item["mask"]["image_path"] = image_path
+        skipped_objects = 0
 
-        self._upload_image(
-            bucket_name=bucket_name,
-            image_path=mask_path,
-            image=item["mask"],
-            metadata=metadata,
-        )
+        if image_data is not None:
+            width, height = get_png_size(image_data)
+        else:
+            width, height = item["image"].size
+        self._manifest_attributes[image_path] = {"width": width, "height": height}
+
+        if image_path in existing_object_names:
+            skipped_objects += 1
+        elif image_data is not None:
+            self._upload_bytes(
+                bucket_name=bucket_name,
+                object_name=image_path,
+                data=image_data,
+                metadata=metadata,
+            )
+        else:
+            self._upload_image(
+                bucket_name=bucket_name,
+                image_path=image_path,
+                image=item["image"],
+                metadata=metadata,
+            )
+
+        if mask_path in existing_object_names:
+            skipped_objects += 1
+        elif self.ingestion_mode == IngestionMode.RAW:
+            mask_data = self._get_png_bytes(item["mask"])
+            width, height = get_png_size(mask_data)
+            self._manifest_attributes[mask_path] = {"width": width, "height": height}
+            self._upload_bytes(
+                bucket_name=bucket_name,
+                object_name=mask_path,
+                data=mask_data,
+                metadata=metadata,
+            )
+        else:
+            self._manifest_attributes[mask_path] = self._get_mask_attributes(
+                item["mask"]
+            )
+            self._upload_image(
+                bucket_name=bucket_name,
+                image_path=mask_path,
+                image=item["mask"],
+                metadata=metadata,
+            )
+
+        return skipped_objects
+
+    def _list_existing_object_names(
+        self, bucket_name: str, dataset_name: str
+    ) -> set[str]:
+        """
+        Lists the names of the objects already uploaded for a dataset, in one parallel listing.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            dataset_name (str): Name of the dataset.
+
+        Returns:
+            set[str]: The names of the dataset's objects in the bucket.
+        """
+        if not self.skip_existing:
+            return set()
+
+        # The listing is kept to build the data source's manifest
+        self._existing_objects = {
+            obj.object_name: obj
+            for obj in self.bucket_client.list_objects_parallel(
+                bucket_name=bucket_name,
+                prefix=f"{dataset_name}/",
+                max_workers=self.max_workers,
+            )
+            if not obj.is_dir
+        }
+        existing_object_names = set(self._existing_objects)
+        if self._shard_writer is not None:
+            existing_object_names.update(
+                f"{dataset_name}/{member_name}"
+                for member_name in self._shard_writer.index.members
+            )
+
+        return existing_object_names
 
     @staticmethod
-    def _hash_image(image: PIL.Image) -> str:
+    def _get_mask_attributes(mask: PIL.Image) -> dict:
+        """
+        Gets the manifest attributes of a decoded mask: its size and, for single-channel
+        masks, the classes (pixel values) present in it, found with one histogram pass.
+
+        Args:
+            mask (PIL.Image): The decoded mask.
+
+        Returns:
+            dict: The width, height and classes of the mask.
+        """
+        width, height = mask.size
+        attributes = {"width": width, "height": height}
+
+        pixels = np.asarray(mask)
+        if pixels.ndim == 2 and pixels.dtype == np.uint8:
+            attributes["classes"] = np.flatnonzero(
+                np.bincount(pixels.ravel(), minlength=256)
+            ).tolist()
+
+        return attributes
+
+    def _hash_image(self, image: PIL.Image) -> str:
         """
-        Generates a SHA-256 hash for a given image.
+        Generates a hash for a given image with the service's hash function.
 
         Args:
             image (PIL.Image): Image object to be hashed.
@@ -167,11 +492,42 @@ class DataUploaderService:
         """
         img_byte_arr = io.BytesIO()
         image.save(img_byte_arr, format=image.format)
-        img_byte_arr = img_byte_arr.getvalue()
+        return self.hash_function(img_byte_arr.getvalue())
 
-        hasher = hashlib.sha256()
-        hasher.update(img_byte_arr)
-        return hasher.hexdigest()
+    def _get_png_bytes(self, encoded_image: dict) -> bytes:
+        """
+        Gets the PNG bytes of an undecoded HuggingFace image, without decoding PNG images.
+        Images stored in another format are re-encoded in a process pool.
+
+        Args:
+            encoded_image (dict): The undecoded image, as {"bytes": ..., "path": ...}.
+
+        Returns:
+            bytes: The PNG encoded image.
+        """
+        data = encoded_image["bytes"]
+        if data is None:
+            with open(encoded_image["path"], "rb") as file:
+                data = file.read()
+
+        if data.startswith(PNG_SIGNATURE):
+            return data
+
+        return self._get_reencode_executor().submit(encode_png, data).result()
+
+    def _get_reencode_executor(self) -> ProcessPoolExecutor:
+        with self._reencode_executor_lock:
+            if self._reencode_executor is None:
+                self._reencode_executor = ProcessPoolExecutor(
+                    max_workers=self.reencode_workers
+                )
+            return self._reencode_executor
+
+    def _shutdown_reencode_executor(self) -> None:
+        with self._reencode_executor_lock:
+            if self._reencode_executor is not None:
+                self._reencode_executor.shutdown()
+                self._reencode_executor = None
 
     def _upload_file(
         self,
@@ -189,12 +545,13 @@ class DataUploaderService:
             file_path (str): Path within the bucket where the image will be stored.
             metadata (PIL.Image): Image object to be uploaded.
         """
-        self.bucket_client.upload_file(
+        result = self.bucket_client.upload_file(
             bucket_name=bucket_name,
             object_name=object_name,
             file_path=file_path,
             metadata=metadata,
         )
+        self._record_upload(result, os.path.getsize(file_path))
 
     def _upload_image(
         self,
@@ -214,15 +571,42 @@ class DataUploaderService:
         """
         image_buffer = io.BytesIO()
         image.save(image_buffer, format="PNG")
-        image_buffer.seek(0)
-        self.bucket_client.upload_data(
+        self._upload_bytes(
             bucket_name=bucket_name,
             object_name=image_path,
-            data=image_buffer,
-            length=image_buffer.getbuffer().nbytes,
+            data=image_buffer.getvalue(),
             metadata=metadata,
         )
 
+    def _upload_bytes(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: bytes,
+        metadata: dict | None = None,
+    ) -> None:
+        """
+        Uploads bytes to a specified bucket.
+
+        Args:
+            bucket_name (str): Name of the bucket where the data will be uploaded.
+            object_name (str): Path within the bucket where the data will be stored.
+            data (bytes): The data to upload.
+            metadata (metadata: dict | None): The object's metadata.
+        """
+        if self._shard_writer is not None:
+            self._shard_writer.add(object_name, data)
+            return
+
+        result = self.bucket_client.upload_data(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            data=io.BytesIO(data),
+            length=len(data),
+            metadata=metadata,
+        )
+        self._record_upload(result, len(data))
+
     def _upload_json(
         self, bucket_name: str, json_path: str, data: dict, metadata: dict | None = None
     ) -> None:
@@ -235,15 +619,27 @@ class DataUploaderService:
             data (dict): Data to be serialized to JSON and uploaded.
             metadata (metadata: dict | None): The json's metadata.
         """
-        json_data = json.dumps(data)
-        json_buffer = io.BytesIO(json_data.encode())
-        self.bucket_client.upload_data(
+        json_data = json.dumps(data).encode()
+        result = self.bucket_client.upload_data(
             bucket_name=bucket_name,
             object_name=json_path,
-            data=json_buffer,
+            data=io.BytesIO(json_data),
             length=len(json_data),
             metadata=metadata,
         )
+        self._record_upload(result, len(json_data))
+
+    def _record_upload(self, result: ObjectWriteResult, size: int) -> None:
+        """
+        Records an object uploaded by this run, for the data source's manifest.
+
+        Args:
+            result (ObjectWriteResult): The result of the upload.
+            size (int): The size of the object in bytes.
+        """
+        self._uploaded_objects[result.object_name] = Object(
+            result.bucket_name, result.object_name, etag=result.etag, size=size
+        )
 
     def _upload_label_map(self, bucket_name: str, label_map: dict[int, str]):
         return
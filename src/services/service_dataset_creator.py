@@ -0,0 +1,222 @@
+import os
+
+import tqdm
+from minio.datatypes import Object
+
+from src.config.settings import BUCKET_CLIENT_MAX_WORKERS
+from src.models.model_bucket_client import BucketClient
+from src.models.model_data_source import DataSource
+from src.models.model_dataset import Dataset
+from src.models.model_object_manifest import MANIFEST_NAME, ObjectManifest
+from src.models.model_shard import is_shard_object
+from src.models.model_transfer_stats import TransferStats
+from src.utils.concurrency_helper import bounded_map
+
+# Folders of the samples in a data source, see DataUploaderService
+DATA_SOURCE_IMAGES_FOLDER = "images"
+DATA_SOURCE_ANNOTATIONS_FOLDER = "annotations"
+
+
+class DatasetCreatorService:
+    def __init__(
+        self,
+        bucket_client: BucketClient,
+        max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+        max_in_flight: int | None = None,
+    ):
+        """
+        Initialize the DatasetCreatorService object.
+
+        Args:
+            bucket_client (BucketClient): The bucket client used to list and copy objects.
+            max_workers (int): Number of concurrent server-side copies.
+            max_in_flight (int | None): Maximum number of pending copies.
+                Defaults to twice `max_workers`.
+        """
+        self.bucket_client = bucket_client
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight
+
+    def create_dataset(
+        self,
+        dataset: Dataset,
+        source_bucket_name: str,
+        data_sources: list[DataSource],
+    ) -> TransferStats:
+        """
+        Builds the `{uuid}/{split}/{images|labels}` layout of a dataset in its bucket from
+        data sources, with server-side copies: no object data goes through this host.
+
+        The splits of all the samples are assigned in bulk with `Dataset.get_splits`, and
+        the objects already present in the dataset are not copied again. The manifest of the
+        dataset, carrying over the attributes of the data sources' manifests, is uploaded to
+        `{uuid}/manifest.parquet` and referenced by `dataset.manifest_path`.
+        The samples of the sharded data sources, packed in tar shards, cannot be copied one
+        by one on the server.
+
+        Args:
+            dataset (Dataset): The dataset to create, its bucket being the destination.
+            source_bucket_name (str): The bucket containing the data sources.
+            data_sources (list[DataSource]): The data sources of the dataset.
+
+        Returns:
+            TransferStats: The number of objects and bytes copied, and the throughput.
+
+        Raises:
+            ValueError: If one of the data sources is sharded.
+        """
+        for data_source in data_sources:
+            dataset.update_label_map(data_source.label_map)
+        (
+            image_objects,
+            annotation_objects,
+            source_attributes,
+        ) = self._list_data_source_samples(source_bucket_name, data_sources)
+
+        splits = dataset.get_splits([obj.object_name for obj in image_objects])
+
+        existing_objects = {
+            obj.object_name: obj
+            for obj in self.bucket_client.list_objects_parallel(
+                bucket_name=dataset.bucket_name,
+                prefix=f"{dataset.uuid}/",
+                max_workers=self.max_workers,
+            )
+        }
+
+        copies = []
+        copy_splits = []
+        for image_object, split_name in zip(image_objects, splits):
+            copy_splits.append(split_name)
+            copies.append(
+                (
+                    image_object,
+                    dataset.format_bucket_image_path(
+                        image_object.object_name, split_name
+                    ),
+                )
+            )
+
+            data_source_path = os.path.dirname(
+                os.path.dirname(image_object.object_name)
+            )
+            annotation_object = annotation_objects.get(
+                f"{data_source_path}/{DATA_SOURCE_ANNOTATIONS_FOLDER}/"
+                f"{os.path.basename(image_object.object_name)}"
+            )
+            if annotation_object is not None:
+                copy_splits.append(split_name)
+                copies.append(
+                    (
+                        annotation_object,
+                        dataset.format_bucket_annotation_path(
+                            annotation_object.object_name, split_name
+                        ),
+                    )
+                )
+
+        # The attributes of the dataset's objects, for its manifest
+        attributes = {
+            destination_object_name: {
+                **source_attributes.get(source_object.object_name, {}),
+                "split": split_name,
+            }
+            for (source_object, destination_object_name), split_name in zip(
+                copies, copy_splits
+            )
+        }
+
+        num_objects = len(copies)
+        copies = [copy for copy in copies if copy[1] not in existing_objects]
+
+        def copy_object(copy) -> Object:
+            source_object, destination_object_name = copy
+            result = self.bucket_client.copy_object(
+                source_bucket_name=source_bucket_name,
+                source_object_name=source_object.object_name,
+                destination_bucket_name=dataset.bucket_name,
+                destination_object_name=destination_object_name,
+            )
+            return Object(
+                dataset.bucket_name,
+                destination_object_name,
+                etag=getattr(result, "etag", None),
+                size=source_object.size,
+            )
+
+        stats = TransferStats()
+        with tqdm.tqdm(
+            total=len(copies), desc="Copying objects", unit="obj"
+        ) as progress_bar:
+            for (source_object, _), copied_object in bounded_map(
+                copy_object,
+                copies,
+                max_workers=self.max_workers,
+                max_in_flight=self.max_in_flight,
+            ):
+                existing_objects[copied_object.object_name] = copied_object
+                stats.add(source_object.size or 0)
+                progress_bar.update(1)
+                progress_bar.set_postfix_str(stats.format_rate(), refresh=False)
+
+        print(
+            f"Copied {stats.stop()}, skipped"
+            f" {num_objects - len(copies)} objects"
+            " already in the dataset."
+        )
+        manifest_name = f"{dataset.uuid}/{MANIFEST_NAME}"
+        ObjectManifest.from_objects(
+            (existing_objects[name] for name in attributes if name in existing_objects),
+            attributes,
+        ).upload(self.bucket_client, dataset.bucket_name, manifest_name)
+        dataset.manifest_path = manifest_name
+
+        return stats
+
+    def _list_data_source_samples(
+        self, source_bucket_name: str, data_sources: list[DataSource]
+    ) -> tuple[list[Object], dict[str, Object], dict[str, dict]]:
+        """
+        Lists the image and annotation objects of the data sources.
+
+        Args:
+            source_bucket_name (str): The bucket containing the data sources.
+            data_sources (list[DataSource]): The data sources of the dataset.
+
+        Returns:
+            tuple[list[Object], dict[str, Object], dict[str, dict]]: The image objects, the
+                annotation objects by name, and the attributes of the data sources' objects
+                from their manifests.
+
+        Raises:
+            ValueError: If one of the data sources is sharded.
+        """
+        image_objects = []
+        annotation_objects = {}
+        source_attributes = {}
+        for data_source in data_sources:
+            source_manifest = ObjectManifest.load(
+                self.bucket_client,
+                source_bucket_name,
+                f"{data_source.name}/{MANIFEST_NAME}",
+            )
+            if source_manifest is not None:
+                source_attributes.update(source_manifest.get_attributes())
+
+            for obj in self.bucket_client.list_objects_parallel(
+                bucket_name=source_bucket_name,
+                prefix=f"{data_source.name}/",
+                max_workers=self.max_workers,
+            ):
+                if is_shard_object(obj.object_name):
+                    raise ValueError(
+                        f"The data source {data_source.name} is sharded, its samples"
+                        " cannot be copied to a dataset."
+                    )
+                folder_name = os.path.basename(os.path.dirname(obj.object_name))
+                if folder_name == DATA_SOURCE_IMAGES_FOLDER:
+                    image_objects.append(obj)
+                elif folder_name == DATA_SOURCE_ANNOTATIONS_FOLDER:
+                    annotation_objects[obj.object_name] = obj
+
+        return image_objects, annotation_objects, source_attributes
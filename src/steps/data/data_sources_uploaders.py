@@ -3,10 +3,15 @@ from zenml.logger import get_logger
 
 from src.config.settings import (
     MINIO_DATA_SOURCES_BUCKET_NAME,
+    UPLOAD_HASH_ALGORITHM,
+    UPLOAD_INGESTION_MODE,
+    UPLOAD_SHARD_FORMAT,
+    UPLOAD_SKIP_EXISTING,
+    UPLOAD_STREAMING,
 )
 from src.models.model_bucket_client import BucketClient
 from src.models.model_data_source import DataSource, DataSourceList
-from src.services.service_data_uploader import DataUploaderService
+from src.services.service_data_uploader import DataUploaderService, IngestionMode
 from src.steps.data.datalake_initializers import validate_bucket_connection
 
 
@@ -60,7 +65,14 @@ def data_sources_uploader(
     Flow for preparing data sources, which includes validating the data path, checking the bucket connection,
     configuring the bucket, and uploading the data.
     """
-    data_uploader_service = DataUploaderService(bucket_client)
+    data_uploader_service = DataUploaderService(
+        bucket_client,
+        ingestion_mode=IngestionMode(UPLOAD_INGESTION_MODE),
+        hash_algorithm=UPLOAD_HASH_ALGORITHM,
+        streaming=UPLOAD_STREAMING,
+        skip_existing=UPLOAD_SKIP_EXISTING,
+        shard_format=UPLOAD_SHARD_FORMAT,
+    )
     validate_bucket_connection(bucket_client=bucket_client)
 
     for data_source in data_source_list.data_sources:
@@ -71,3 +83,7 @@ def data_sources_uploader(
             bucket_name=get_data_sources_bucket_name(),
             data_source=data_source,
         )
+
+    transport_stats = bucket_client.get_transport_stats()
+    if transport_stats is not None:
+        get_logger(__name__).info(f"HTTP transport statistics: {transport_stats}")
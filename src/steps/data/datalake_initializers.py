@@ -4,6 +4,7 @@ from zenml import step
 from zenml.logger import get_logger
 
 from src.config.settings import (
+    BUCKET_CLIENT_ASYNC_DOWNLOADS,
     MINIO_DATA_SOURCES_BUCKET_NAME,
     MINIO_DATASETS_BUCKET_NAME,
     MINIO_ENDPOINT,
@@ -16,6 +17,7 @@ from src.materializers.materializer_bucket_client import BucketClientMaterialize
 from src.materializers.materializer_data_source import DataSourceMaterializer
 from src.models.model_bucket_client import BucketClient, MinioClient
 from src.models.model_data_source import DataSourceList, HuggingFaceDataSource
+from src.models.model_object_cache import get_default_object_cache
 
 
 @step
@@ -72,6 +74,8 @@ def minio_client_initializer() -> MinioClient:
         access_key=MINIO_ROOT_USER,
         secret_key=MINIO_ROOT_PASSWORD,
         secure=False,
+        object_cache=get_default_object_cache(),
+        async_downloads=BUCKET_CLIENT_ASYNC_DOWNLOADS,
     )
 
 
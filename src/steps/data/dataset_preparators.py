@@ -4,10 +4,11 @@ and saving them to a local extraction path.
 """
 
 import os
-import tqdm
+from collections.abc import Iterable, Iterator
+from functools import partial
 import cv2
+from minio.datatypes import Object
 from minio.error import S3Error
-from minio import Minio
 
 from hydra.utils import to_absolute_path
 from zenml.logger import get_logger
@@ -15,41 +16,321 @@ from zenml import step
 
 
 from src.config.settings import (
+    BUCKET_CLIENT_ASYNC_DOWNLOADS,
+    BUCKET_CLIENT_MAX_WORKERS,
     MINIO_DATA_SOURCES_BUCKET_NAME,
+    MINIO_DATASETS_BUCKET_NAME,
     MINIO_ENDPOINT,
     MINIO_ROOT_PASSWORD,
     MINIO_ROOT_USER,
     EXTRACTED_DATASETS_PATH,
 )
+from src.materializers.materializer_dataset import DatasetMaterializer
+from src.models.model_bucket_client import BucketClient, MinioClient
+from src.models.model_data_source import DataSourceList
+from src.models.model_dataset import Dataset
+from src.models.model_extraction_manifest import ExtractionManifest
+from src.models.model_object_cache import get_default_object_cache
+from src.models.model_object_manifest import MANIFEST_NAME, ObjectManifest
+from src.models.model_shard import extract_shard, is_shard_object
+from src.models.model_transfer_stats import TransferStats
+from src.services.service_dataset_creator import (
+    DATA_SOURCE_ANNOTATIONS_FOLDER,
+    DATA_SOURCE_IMAGES_FOLDER,
+    DatasetCreatorService,
+)
+from src.utils.profiling_helper import profile_step, record_step_io
+
+EXTRACTION_MANIFEST_NAME = ".extraction_manifest.jsonl"
 
 
-def get_minio_client() -> Minio:
+def get_minio_client() -> MinioClient:
     """
     Returns a Minio client to the endpoint.
     """
-    return Minio(
-        MINIO_ENDPOINT,
+    return MinioClient(
+        endpoint=MINIO_ENDPOINT,
         access_key=MINIO_ROOT_USER,
         secret_key=MINIO_ROOT_PASSWORD,
         secure=False,
+        object_cache=get_default_object_cache(),
+        async_downloads=BUCKET_CLIENT_ASYNC_DOWNLOADS,
+    )
+
+
+def list_data_source_objects(
+    bucket_client: BucketClient,
+    data_source: str,
+    bucket_name: str,
+    extraction_path: str,
+    use_object_manifest: bool = False,
+) -> Iterable[Object]:
+    """
+    Lists the objects of a data source. When the data source has an object manifest, it is
+    reconciled with the listing (objects added, changed or removed since the upload) and
+    saved in the data source's folder for the next steps.
+
+    Args:
+        bucket_client (BucketClient): The bucket client used to list the objects.
+        data_source (str): The name of the data source.
+        bucket_name (str): The name of the bucket containing the data source.
+        extraction_path (str): The local path of the extracted data sources.
+        use_object_manifest (bool): Read the object manifest instead of listing the bucket,
+            when the data source is only written by the uploader.
+
+    Returns:
+        Iterable[Object]: The objects of the data source.
+    """
+    object_manifest_name = f"{data_source}/{MANIFEST_NAME}"
+    object_manifest = ObjectManifest.load(
+        bucket_client, bucket_name, object_manifest_name
+    )
+    if object_manifest is not None and use_object_manifest:
+        objects = object_manifest.to_objects(bucket_name)
+    else:
+        objects = bucket_client.list_objects_parallel(
+            bucket_name=bucket_name, prefix=f"{data_source}/"
+        )
+        if object_manifest is None:
+            return objects
+
+        # The reconciled manifest is saved instead of downloading the bucket's one
+        objects = [obj for obj in objects if obj.object_name != object_manifest_name]
+        object_manifest = object_manifest.reconcile(objects)
+
+    os.makedirs(os.path.join(extraction_path, data_source), exist_ok=True)
+    object_manifest.write(os.path.join(extraction_path, object_manifest_name))
+    return objects
+
+
+def iter_objects_to_download(
+    objects: Iterable[Object],
+    manifest: ExtractionManifest,
+    extraction_path: str,
+    remote_object_names: set[str],
+    up_to_date_object_names: set[str],
+) -> Iterator[Object]:
+    """
+    Filters the objects of a data source down to the new or changed ones.
+
+    Args:
+        objects (Iterable[Object]): The objects of the data source, e.g. a listing.
+        manifest (ExtractionManifest): The extraction manifest of the data source.
+        extraction_path (str): The local path of the extracted data sources.
+        remote_object_names (set[str]): Filled with the names of all the objects.
+        up_to_date_object_names (set[str]): Filled with the names of the skipped objects.
+
+    Yields:
+        Object: The objects to download.
+    """
+    for obj in objects:
+        if obj.is_dir:
+            continue
+
+        remote_object_names.add(obj.object_name)
+        if is_shard_object(obj.object_name):
+            is_up_to_date = manifest.is_recorded(obj)
+        else:
+            is_up_to_date = manifest.is_up_to_date(
+                obj, os.path.join(extraction_path, obj.object_name)
+            )
+
+        if is_up_to_date:
+            up_to_date_object_names.add(obj.object_name)
+        else:
+            yield obj
+
+
+def remove_shard_members(
+    manifest: ExtractionManifest, data_source_path: str, member_names: Iterable[str]
+) -> None:
+    """
+    Deletes the local files unpacked from shards, except the members of another shard
+    still recorded in the manifest.
+
+    Args:
+        manifest (ExtractionManifest): The extraction manifest of the data source.
+        data_source_path (str): The local folder of the data source.
+        member_names (Iterable[str]): The names of the members, relative to the folder.
+    """
+    kept_member_names = {
+        member_name
+        for object_name in manifest.entries
+        for member_name in manifest.get_members(object_name)
+    }
+    for member_name in set(member_names) - kept_member_names:
+        member_path = os.path.join(data_source_path, member_name)
+        if os.path.exists(member_path):
+            os.remove(member_path)
+
+
+def record_downloaded_object(
+    obj: Object, manifest: ExtractionManifest, extraction_path: str, data_source: str
+) -> None:
+    """
+    Records a downloaded object in the extraction manifest. A shard is unpacked into the
+    data source's folder first, and the members of its previous version are deleted.
+
+    Args:
+        obj (Object): The downloaded object.
+        manifest (ExtractionManifest): The extraction manifest of the data source.
+        extraction_path (str): The local path of the extracted data sources.
+        data_source (str): The name of the data source.
+    """
+    if not is_shard_object(obj.object_name):
+        manifest.record(obj)
+        return
+
+    data_source_path = os.path.join(extraction_path, data_source)
+    previous_member_names = manifest.get_members(obj.object_name)
+    member_names = extract_shard(
+        tar_path=os.path.join(extraction_path, obj.object_name),
+        destination_path=data_source_path,
+    )
+    manifest.record(obj, members=member_names)
+    remove_shard_members(manifest, data_source_path, previous_member_names)
+
+
+def remove_deleted_objects(
+    manifest: ExtractionManifest,
+    extraction_path: str,
+    data_source: str,
+    remote_object_names: set[str],
+) -> int:
+    """
+    Deletes the local files of the objects removed from the bucket, and the members of
+    the removed shards.
+
+    Args:
+        manifest (ExtractionManifest): The extraction manifest of the data source.
+        extraction_path (str): The local path of the extracted data sources.
+        data_source (str): The name of the data source.
+        remote_object_names (set[str]): The names of the objects still in the bucket.
+
+    Returns:
+        int: The number of removed objects.
+    """
+    removed_object_names = set(manifest.entries) - remote_object_names
+    removed_member_names = []
+    for object_name in removed_object_names:
+        local_path = os.path.join(extraction_path, object_name)
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        removed_member_names.extend(manifest.get_members(object_name))
+        manifest.forget(object_name)
+
+    remove_shard_members(
+        manifest, os.path.join(extraction_path, data_source), removed_member_names
+    )
+    return len(removed_object_names)
+
+
+def extract_data_source(
+    bucket_client: BucketClient,
+    data_source: str,
+    bucket_name: str,
+    extraction_path: str,
+    max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+    use_object_manifest: bool = False,
+) -> TransferStats:
+    """
+    Incrementally synchronizes a data source from the bucket to the extraction path.
+
+    Every downloaded object is recorded with its ETag, size and mtime in a local manifest.
+    Only new or changed objects are downloaded, local files of objects removed from the
+    bucket are deleted, and an interrupted extraction resumes where it stopped.
+    Tar shards of a sharded data source are unpacked into the data source's folder as soon
+    as they are downloaded, and tracked in the manifest by their ETag with their members,
+    which are deleted with the shard.
+    When the data source has an object manifest (written by the uploader), it is reconciled
+    with the listing and saved in the data source's folder, see `list_data_source_objects`.
+
+    Args:
+        bucket_client (BucketClient): The bucket client used to list and download objects.
+        data_source (str): The name of the data source to extract.
+        bucket_name (str): The name of the bucket containing the data source.
+        extraction_path (str): The local path to save the extracted data source.
+        max_workers (int): The number of concurrent downloads.
+        use_object_manifest (bool): Plan the downloads from the data source's object manifest
+            instead of listing the bucket.
+
+    Returns:
+        TransferStats: The statistics of the objects downloaded during this run.
+    """
+    logger = get_logger(__name__)
+
+    manifest = ExtractionManifest.load(
+        os.path.join(extraction_path, data_source, EXTRACTION_MANIFEST_NAME)
+    )
+    # The local object manifest is kept even when it is not listed in itself
+    remote_object_names: set[str] = {f"{data_source}/{MANIFEST_NAME}"}
+    up_to_date_object_names: set[str] = set()
+
+    try:
+        stats = bucket_client.download_objects(
+            bucket_name=bucket_name,
+            objects=iter_objects_to_download(
+                list_data_source_objects(
+                    bucket_client,
+                    data_source,
+                    bucket_name,
+                    extraction_path,
+                    use_object_manifest,
+                ),
+                manifest,
+                extraction_path,
+                remote_object_names,
+                up_to_date_object_names,
+            ),
+            destination_path=extraction_path,
+            max_workers=max_workers,
+            on_downloaded=partial(
+                record_downloaded_object,
+                manifest=manifest,
+                extraction_path=extraction_path,
+                data_source=data_source,
+            ),
+        )
+        removed_objects = remove_deleted_objects(
+            manifest, extraction_path, data_source, remote_object_names
+        )
+        manifest.compact()
+    finally:
+        manifest.close()
+
+    logger.info(
+        f"Downloaded {stats}, skipped {len(up_to_date_object_names)} up-to-date objects"
+        f" and removed {removed_objects} deleted objects."
     )
+    return stats
 
 
 @step
+@profile_step
 def data_source_extractor(
     data_source: str,
     bucket_name: str = MINIO_DATA_SOURCES_BUCKET_NAME,
     extraction_path: str = to_absolute_path(EXTRACTED_DATASETS_PATH),
+    max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+    use_object_manifest: bool = False,
 ) -> None:
     """
     Extracts the data source from the bucket to the extraction path.
 
+    Re-runs only download the objects that are new or changed since the last extraction
+    and delete the local files of the objects removed from the bucket.
+
     Args:
         data_source (str): The name of the data source to extract.
         bucket_name (str, optional): The name of the Minio bucket.
         Defaults to MINIO_DATA_SOURCES_BUCKET_NAME.
         extraction_path (str, optional): The local path to save the extracted data source.
         Defaults to EXTRACTED_DATASETS_PATH.
+        max_workers (int, optional): The number of concurrent downloads.
+        Defaults to BUCKET_CLIENT_MAX_WORKERS.
+        use_object_manifest (bool, optional): Plan the downloads from the data source's
+        object manifest instead of listing the bucket, when the data source is only written
+        by the uploader. Defaults to False.
     """
     logger = get_logger(__name__)
     minio_client = get_minio_client()
@@ -60,30 +341,74 @@ def data_source_extractor(
             logger.error(f"The bucket {bucket_name} does not exist.")
             raise ValueError(f"The bucket {bucket_name} does not exist.")
 
-        # Check if the dataset has already been downloaded, check if its not empty
-        if os.path.exists(extraction_path):
-            if os.listdir(extraction_path):
-                logger.info(
-                    f"The data source {data_source} has already been extracted."
-                )
-                return
-
-        # List the objects in the data source
-        objects = minio_client.list_objects(bucket_name, data_source, recursive=True)
-
-        # Extract the objects to the extraction path
-        for obj in tqdm.tqdm(objects, desc="Extracting data source"):
-            if not obj.is_dir:
-                object_name = obj.object_name
-                local_path = os.path.join(extraction_path, object_name)
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
-
-                # Download the object
-                minio_client.fget_object(bucket_name, object_name, local_path)
+        stats = extract_data_source(
+            bucket_client=minio_client,
+            data_source=data_source,
+            bucket_name=bucket_name,
+            extraction_path=extraction_path,
+            max_workers=max_workers,
+            use_object_manifest=use_object_manifest,
+        )
+        record_step_io(items=stats.objects, num_bytes=stats.bytes)
 
     except S3Error as e:
         logger.error(f"An error occurred while extracting the data source: {e}")
         raise e
 
-    logger.info(f"The data source {data_source} has been extracted.")
+    logger.info(
+        f"The data source {data_source} has been extracted (HTTP transport statistics:"
+        f" {minio_client.get_transport_stats()})."
+    )
     return
+
+
+@step(output_materializers=DatasetMaterializer)
+def dataset_creator(
+    bucket_client: BucketClient,
+    data_source_list: DataSourceList,
+    seed: int,
+    distribution_weights: list[float] | None = None,
+    source_bucket_name: str = MINIO_DATA_SOURCES_BUCKET_NAME,
+    dataset_bucket_name: str = MINIO_DATASETS_BUCKET_NAME,
+    max_workers: int = BUCKET_CLIENT_MAX_WORKERS,
+) -> Dataset:
+    """
+    Creates a dataset from the data sources with server-side copies of their objects into
+    the `{uuid}/{split}/{images|annotations}` layout of the datasets bucket.
+
+    Args:
+        bucket_client (BucketClient): The bucket client used to list and copy objects.
+        data_source_list (DataSourceList): The data sources of the dataset.
+        seed (int): The seed of the dataset, salting the assignment of the samples to the splits.
+        distribution_weights (list[float] | None, optional): The weights of the train, test and
+        validation splits. Defaults to the Dataset's weights.
+        source_bucket_name (str, optional): The bucket containing the data sources.
+        Defaults to MINIO_DATA_SOURCES_BUCKET_NAME.
+        dataset_bucket_name (str, optional): The bucket where the dataset is created.
+        Defaults to MINIO_DATASETS_BUCKET_NAME.
+        max_workers (int, optional): The number of concurrent copies.
+        Defaults to BUCKET_CLIENT_MAX_WORKERS.
+
+    Returns:
+        Dataset: The created dataset.
+    """
+    logger = get_logger(__name__)
+
+    dataset = Dataset(
+        bucket_name=dataset_bucket_name,
+        seed=seed,
+        annotations_path=DATA_SOURCE_ANNOTATIONS_FOLDER,
+        images_path=DATA_SOURCE_IMAGES_FOLDER,
+        distribution_weights=distribution_weights,
+    )
+
+    stats = DatasetCreatorService(
+        bucket_client=bucket_client, max_workers=max_workers
+    ).create_dataset(
+        dataset=dataset,
+        source_bucket_name=source_bucket_name,
+        data_sources=data_source_list.data_sources,
+    )
+
+    logger.info(f"The dataset {dataset.uuid} has been created: {stats}.")
+    return dataset
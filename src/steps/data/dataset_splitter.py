@@ -1,12 +1,26 @@
+import errno
 import os
-import random
 import shutil
+from collections import Counter
+from enum import Enum
+
+import numpy as np
 from zenml import step
 from tqdm import tqdm
 
+from src.config.settings import (
+    DATASET_SPLIT_MODE,
+    DATASET_SPLIT_RATIOS,
+    DATASET_SPLIT_SALT,
+)
+from src.models.model_object_manifest import MANIFEST_NAME, ObjectManifest
+from src.utils.file_helper import scan_files
+from src.utils.profiling_helper import profile_step, record_step_io
+from src.utils.split_helper import assign_splits, stratified_subsample
+
 # make a function that takes a path to a dataset, it has two folders (images, labels) that have files with the same name but different extensions.
 # The function should split the dataset into train, val and test datasets, and make sure that the images and labels are in the same order, and put everything in a new folder called custom_dataset.
-# use 80% of the data for training, 10% for validation, and 10% for testing.
+# use 80% of the data for training, 10% for validation, and 10% for testing (DATASET_SPLIT_RATIOS).
 # The function should return the path to the new folder.
 
 # The function should be used in the gitflow_experiment_pipeline function in the dataset_splitter step.
@@ -15,12 +29,97 @@ import json
 import os
 
 
-def generate_config_yaml(dataset_path: str) -> None:
+class SplitMode(Enum):
+    COPY = "copy"
+    HARDLINK = "hardlink"
+    SYMLINK = "symlink"
+    LIST = "list"
+
+
+SPLIT_NAMES = ["train", "val", "test"]
+
+
+def place_file(source_path: str, destination_path: str, split_mode: SplitMode) -> None:
+    """
+    Places a file of the dataset in a split, without copying its data unless required.
+
+    Args:
+        source_path: The path of the file in the dataset.
+        destination_path: The path of the file in the split, which must not exist.
+        split_mode: COPY copies the file, HARDLINK links it (falling back to a copy when the
+            split is on another filesystem) and SYMLINK creates an absolute symbolic link.
+            Copies keep the modification time of their source, see `is_file_placed`.
+    """
+    if split_mode == SplitMode.HARDLINK:
+        try:
+            os.link(source_path, destination_path)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+    elif split_mode == SplitMode.SYMLINK:
+        os.symlink(os.path.abspath(source_path), destination_path)
+        return
+
+    shutil.copy2(source_path, destination_path)
+
+
+def is_file_placed(
+    source_path: str, destination_path: str, split_mode: SplitMode
+) -> bool:
+    """
+    Checks if a split file is the current version of its dataset file, placed with the
+    split mode: a symbolic link to it, a hard link to it, or a copy with the same size and
+    modification time (also accepted for a hard link across filesystems).
+
+    Args:
+        source_path: The path of the file in the dataset.
+        destination_path: The path of the file in the split.
+        split_mode: How the file must have been placed, see `place_file`.
+
+    Returns:
+        False if the file must be placed again.
+    """
+    try:
+        destination_stat = os.lstat(destination_path)
+    except FileNotFoundError:
+        return False
+
+    if split_mode == SplitMode.SYMLINK:
+        return os.path.islink(destination_path) and os.readlink(
+            destination_path
+        ) == os.path.abspath(source_path)
+    if os.path.islink(destination_path):
+        return False
+
+    source_stat = os.stat(source_path)
+    if (destination_stat.st_dev, destination_stat.st_ino) == (
+        source_stat.st_dev,
+        source_stat.st_ino,
+    ):
+        return split_mode == SplitMode.HARDLINK
+    if (
+        split_mode == SplitMode.HARDLINK
+        and destination_stat.st_dev == source_stat.st_dev
+    ):
+        # A copy on the dataset's filesystem, where the file can be linked instead
+        return False
+
+    return (
+        destination_stat.st_size == source_stat.st_size
+        and destination_stat.st_mtime_ns == source_stat.st_mtime_ns
+    )
+
+
+def generate_config_yaml(
+    dataset_path: str, split_mode: SplitMode = SplitMode.COPY
+) -> None:
     """
     Generates a config.yaml file with paths to train, val, test datasets and class names.
 
     Args:
         dataset_path: The path to the dataset folder.
+        split_mode: With LIST, the splits are the `{split}.txt` image lists instead of folders.
     """
     label_map_path = os.path.join(dataset_path, "label_map.json")
 
@@ -28,11 +127,16 @@ def generate_config_yaml(dataset_path: str) -> None:
     with open(label_map_path, "r") as file:
         class_names = json.load(file)  # Directly use this as the class names mapping
 
+    if split_mode == SplitMode.LIST:
+        split_paths = {split: f"{split}.txt" for split in SPLIT_NAMES}
+    else:
+        split_paths = {split: f"{split}/images" for split in SPLIT_NAMES}
+
     config_content = {
         "path": dataset_path + "/custom_dataset",  # Relative path to dataset
-        "train": "train/images",  # Relative path to train images
-        "val": "val/images",  # Relative path to val images
-        "test": "test/images",  # Relative path to test images
+        "train": split_paths["train"],  # Relative path to train images
+        "val": split_paths["val"],  # Relative path to val images
+        "test": split_paths["test"],  # Relative path to test images
         "names": class_names,
     }
 
@@ -59,17 +163,204 @@ def generate_config_yaml(dataset_path: str) -> None:
     print(f"Generated config.yaml at {config_path}")
 
 
+def read_label_classes(label_path: str) -> set[int]:
+    """
+    Reads the classes present in a YOLO label file, the first value of each line.
+    """
+    with open(label_path) as f:
+        return {int(line.split(" ", 1)[0]) for line in f if line.strip()}
+
+
+def get_manifest_classes(dataset_path: str) -> dict[str, set[int]]:
+    """
+    Gets the object classes of the annotations recorded in the dataset's object manifest,
+    without the background (0) which has no label.
+
+    Args:
+        dataset_path: The path to the dataset folder.
+
+    Returns:
+        The classes of each annotation by file name without extension, empty if there is
+        no manifest.
+    """
+    manifest_path = os.path.join(dataset_path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+
+    return {
+        os.path.splitext(os.path.basename(key))[0]: set(attributes["classes"]) - {0}
+        for key, attributes in ObjectManifest.read(manifest_path)
+        .get_attributes()
+        .items()
+        if os.path.basename(os.path.dirname(key)) == "annotations"
+        and "classes" in attributes
+    }
+
+
+def get_label_strata(
+    labels_dir: str,
+    samples: list[str],
+    known_classes: dict[str, set[int]] | None = None,
+) -> np.ndarray:
+    """
+    Gets the stratum of each sample: the rarest class (over the whole dataset) present in its
+    label file, or -1 for a label without any object.
+
+    Args:
+        labels_dir: The folder of the label files.
+        samples: The file names of the samples, without extension.
+        known_classes: The classes of the samples already known, e.g. from the object
+            manifest; only the label files of the other samples are read.
+
+    Returns:
+        The stratum of each sample, in the order of `samples`.
+    """
+    known_classes = known_classes or {}
+    sample_classes = [
+        known_classes[sample]
+        if sample in known_classes
+        else read_label_classes(os.path.join(labels_dir, f"{sample}.txt"))
+        for sample in tqdm(samples, desc="Reading labels")
+    ]
+    class_frequencies = Counter(
+        class_id for classes in sample_classes for class_id in classes
+    )
+    return np.array(
+        [
+            min(classes, key=class_frequencies.__getitem__) if classes else -1
+            for classes in sample_classes
+        ],
+        dtype=np.int64,
+    )
+
+
+def get_split_samples(
+    dataset_path: str,
+    split_ratios: list[float],
+    salt: str = "",
+    percentage: float | None = None,
+    sample_count: int | None = None,
+) -> dict[str, list[str]]:
+    """
+    Assigns the samples having both an image and a label to the splits, from a stable hash
+    of their file name.
+
+    Args:
+        dataset_path: The path to the dataset folder.
+        split_ratios: The relative size of the train, val and test splits.
+        salt: A salt, to draw a different assignment.
+        percentage: Only keep this fraction of the samples, stratified by the classes of
+            their labels.
+        sample_count: Only keep this number of samples, stratified by the classes of their
+            labels.
+
+    Returns:
+        The sorted file names, without extension, of the samples of each split.
+    """
+    image_samples = {
+        os.path.splitext(entry.name)[0]
+        for entry in scan_files(os.path.join(dataset_path, "images"), ".png", False)
+    }
+    label_samples = {
+        os.path.splitext(entry.name)[0]
+        for entry in scan_files(os.path.join(dataset_path, "labels"), ".txt", False)
+    }
+
+    samples = np.array(sorted(image_samples & label_samples), dtype=object)
+
+    if percentage is not None:
+        # A small percentage keeps at least one sample rather than emptying the splits
+        sample_count = max(round(len(samples) * percentage), min(len(samples), 1))
+    if sample_count is not None:
+        strata = get_label_strata(
+            os.path.join(dataset_path, "labels"),
+            samples,
+            known_classes=get_manifest_classes(dataset_path),
+        )
+        # A different salt, otherwise the subsample would mostly fall in the train split
+        samples = samples[
+            stratified_subsample(samples, strata, sample_count, salt=f"{salt}subsample")
+        ]
+
+    split_indices = assign_splits(samples, split_ratios, salt=salt)
+    return {
+        split_name: samples[split_indices == split_index].tolist()
+        for split_index, split_name in enumerate(SPLIT_NAMES)
+    }
+
+
+def sync_split_folder(
+    source_dir: str, split_dir: str, file_names: set[str], split_mode: SplitMode
+) -> None:
+    """
+    Makes a split folder contain exactly the given files of the dataset: missing files are
+    placed, files no longer in the split are removed, and files changed in the dataset or
+    placed with another split mode are placed again. The others are left untouched.
+
+    Args:
+        source_dir: The dataset folder of the files, e.g. `<dataset>/images`.
+        split_dir: The split folder, e.g. `<dataset>/custom_dataset/train/images`.
+        file_names: The names of the files of the split.
+        split_mode: How the files are placed, see `place_file`.
+    """
+    os.makedirs(split_dir, exist_ok=True)
+    existing_file_names = set(os.listdir(split_dir))
+
+    for file_name in existing_file_names - file_names:
+        os.remove(os.path.join(split_dir, file_name))
+
+    for file_name in tqdm(sorted(file_names), desc=f"Placing {split_dir}"):
+        source_path = os.path.join(source_dir, file_name)
+        destination_path = os.path.join(split_dir, file_name)
+        if file_name in existing_file_names:
+            if is_file_placed(source_path, destination_path, split_mode):
+                continue
+            # Never write through a link to the dataset's file
+            os.remove(destination_path)
+
+        place_file(source_path, destination_path, split_mode)
+
+
 @step
-def dataset_splitter(dataset_path: str) -> str:
+@profile_step
+def dataset_splitter(
+    dataset_path: str,
+    split_mode: str = DATASET_SPLIT_MODE,
+    split_ratios: list[float] | None = None,
+    split_salt: str = DATASET_SPLIT_SALT,
+    percentage: float | None = None,
+    sample_count: int | None = None,
+) -> str:
     """
     Split the dataset into train, val and test datasets, and make sure that the images and labels are in the same order, and put everything in a new folder called custom_dataset.
 
+    Each sample is assigned to a split from a stable hash of its file name, so re-running the
+    step after adding samples only places the new ones, and the existing ones never move.
+
     Args:
         dataset_path: The path to the dataset folder.
+        split_mode: How the files are placed in the splits: "copy", "hardlink", "symlink",
+            or "list" to write Ultralytics `train.txt`, `val.txt` and `test.txt` image lists
+            referencing the dataset's files, which are then neither copied nor linked.
+        split_ratios: The relative size of the train, val and test splits.
+            Defaults to DATASET_SPLIT_RATIOS.
+        split_salt: A salt, to draw a different assignment of the samples.
+        percentage: Only keep this fraction (in ]0, 1]) of the samples, for quick experiments.
+            The subsample is stratified by the rarest class of each label file.
+        sample_count: Only keep this number of samples, stratified like `percentage`.
 
     Returns:
         The path to the new folder.
     """
+    split_mode = SplitMode(split_mode)
+    split_ratios = split_ratios or DATASET_SPLIT_RATIOS
+
+    if percentage is not None and sample_count is not None:
+        raise ValueError("Only one of percentage and sample_count can be given.")
+    if percentage is not None and not 0 < percentage <= 1:
+        raise ValueError(f"The percentage {percentage} is not in ]0, 1].")
+    if sample_count is not None and sample_count <= 0:
+        raise ValueError(f"The sample count {sample_count} is not positive.")
 
     # check if the dataset_path exists
     if not os.path.exists(dataset_path):
@@ -86,94 +377,57 @@ def dataset_splitter(dataset_path: str) -> str:
             f"The dataset path {dataset_path} does not have a labels folder."
         )
 
-    # check if the custom_dataset folder already exists
-    if os.path.exists(os.path.join(dataset_path, "custom_dataset")):
-        return os.path.join(dataset_path, "custom_dataset")
-
     # Create the new folder for the custom dataset
     custom_dataset_path = os.path.join(dataset_path, "custom_dataset")
     os.makedirs(custom_dataset_path, exist_ok=True)
 
-    # Get the list of image and label files
-    image_files = sorted(
-        [
-            f
-            for f in os.listdir(os.path.join(dataset_path, "images"))
-            if f.endswith(".png")
-        ]
-    )
-    label_files = sorted(
-        [
-            f
-            for f in os.listdir(os.path.join(dataset_path, "labels"))
-            if f.endswith(".txt")
-        ]
+    split_samples = get_split_samples(
+        dataset_path,
+        split_ratios,
+        salt=split_salt,
+        percentage=percentage,
+        sample_count=sample_count,
     )
-
-    # Calculate the number of samples for each split
-    total_samples = len(image_files)
-    train_samples = int(total_samples * 0.8)
-    val_samples = int(total_samples * 0.1)
-    test_samples = total_samples - train_samples - val_samples
-
-    # Shuffle the image and label files
-    combined_files = list(zip(image_files, label_files))
-    random.shuffle(combined_files)
-    image_files, label_files = zip(*combined_files)
-
-    # Directories to be created for the splits
-    split_dirs = ["train", "val", "test"]
-
-    for split_dir in split_dirs:
-        # Adjusted to create 'images' and 'labels' subdirectories inside each split directory
-        os.makedirs(
-            os.path.join(custom_dataset_path, split_dir, "images"), exist_ok=True
-        )
-        os.makedirs(
-            os.path.join(custom_dataset_path, split_dir, "labels"), exist_ok=True
-        )
-
-    # Adjusted file copying process with tqdm progress bar
-    print("Copying files to train split...")
-    for i in tqdm(range(train_samples), desc="Train Split"):
-        shutil.copy(
-            os.path.join(dataset_path, "images", image_files[i]),
-            os.path.join(custom_dataset_path, "train", "images", image_files[i]),
-        )
-        shutil.copy(
-            os.path.join(dataset_path, "labels", label_files[i]),
-            os.path.join(custom_dataset_path, "train", "labels", label_files[i]),
-        )
-
-    print("\nCopying files to validation split...")
-    for i in tqdm(
-        range(train_samples, train_samples + val_samples), desc="Validation Split"
-    ):
-        shutil.copy(
-            os.path.join(dataset_path, "images", image_files[i]),
-            os.path.join(custom_dataset_path, "val", "images", image_files[i]),
-        )
-        shutil.copy(
-            os.path.join(dataset_path, "labels", label_files[i]),
-            os.path.join(custom_dataset_path, "val", "labels", label_files[i]),
-        )
-
-    print("\nCopying files to test split...")
-    for i in tqdm(range(train_samples + val_samples, total_samples), desc="Test Split"):
-        shutil.copy(
-            os.path.join(dataset_path, "images", image_files[i]),
-            os.path.join(custom_dataset_path, "test", "images", image_files[i]),
+    record_step_io(items=sum(len(samples) for samples in split_samples.values()))
+
+    for split_dir, samples in split_samples.items():
+        # The splits of a previous run in the other layout are removed, so that only the
+        # splits referenced by config.yaml remain
+        split_list_path = os.path.join(custom_dataset_path, f"{split_dir}.txt")
+        if split_mode == SplitMode.LIST:
+            shutil.rmtree(
+                os.path.join(custom_dataset_path, split_dir), ignore_errors=True
+            )
+
+            # Ultralytics finds the labels by replacing /images/ with /labels/ in the paths
+            images_path = os.path.abspath(os.path.join(dataset_path, "images"))
+            with open(split_list_path, "w") as f:
+                f.writelines(
+                    os.path.join(images_path, f"{sample}.png\n") for sample in samples
+                )
+            continue
+
+        if os.path.exists(split_list_path):
+            os.remove(split_list_path)
+        sync_split_folder(
+            os.path.join(dataset_path, "images"),
+            os.path.join(custom_dataset_path, split_dir, "images"),
+            {f"{sample}.png" for sample in samples},
+            split_mode,
         )
-        shutil.copy(
-            os.path.join(dataset_path, "labels", label_files[i]),
-            os.path.join(custom_dataset_path, "test", "labels", label_files[i]),
+        sync_split_folder(
+            os.path.join(dataset_path, "labels"),
+            os.path.join(custom_dataset_path, split_dir, "labels"),
+            {f"{sample}.txt" for sample in samples},
+            split_mode,
         )
 
     print(
         f"\nDataset split into train, val, and test datasets in {custom_dataset_path}"
+        f" ({', '.join(f'{len(v)} {k}' for k, v in split_samples.items())})"
     )
 
     # Generate config.yaml
-    generate_config_yaml(dataset_path)
+    generate_config_yaml(dataset_path, split_mode)
 
     return custom_dataset_path
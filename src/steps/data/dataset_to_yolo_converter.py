@@ -1,74 +1,277 @@
 import os
 import cv2
-from typing import List
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Iterator, List
 from zenml.logger import get_logger
 from zenml.steps import BaseStep
 from zenml import step
 import json
 import tqdm
 
+from src.config.settings import YOLO_CONVERSION_CHUNK_SIZE, YOLO_CONVERSION_MAX_WORKERS
+from src.utils.concurrency_helper import bounded_map, chunked
+from src.utils.file_helper import scan_files
+from src.utils.profiling_helper import profile_step, record_step_io
 
-def mask_to_yolo(mask_path, label_map, output_path):
+# Parameters of the conversion that produced the labels of a folder
+CONVERSION_STAMP_NAME = ".conversion.json"
+
+
+def get_mask_reduction_factor(mask_shape: tuple[int, int], imgsz: int | None) -> int:
+    """
+    Get the largest power of two by which a mask can be downsampled while its longest
+    side stays at least `imgsz` pixels, the training image size.
+
+    Args:
+        mask_shape (tuple[int, int]): The (height, width) of the mask.
+        imgsz (int | None): The training image size, None to keep the full resolution.
+
+    Returns:
+        int: The reduction factor, 1 to keep the full resolution.
+    """
+    if not imgsz:
+        return 1
+
+    factor = 1
+    while max(mask_shape) // (factor * 2) >= imgsz:
+        factor *= 2
+    return factor
+
+
+def iter_class_crops(
+    mask: np.ndarray, num_classes: int
+) -> Iterator[tuple[int, int, int, np.ndarray]]:
+    """
+    Yield the bounding box crop of every class present in a mask. The bounding boxes of all
+    the classes are found in a single pass over the mask, recording the rows and columns
+    where each pixel value appears, and each class is then only compared inside its box.
+
+    Args:
+        mask (np.ndarray): The uint8 grayscale mask, pixel values being class ids.
+        num_classes (int): The number of classes; the background (0) and pixel values
+            greater or equal to `num_classes` are ignored.
+
+    Yields:
+        tuple[int, int, int, np.ndarray]: The class id, the (x, y) position of the crop in
+        the mask, and the binary (0/1 uint8) crop of the class.
+    """
+    height, width = mask.shape
+    class_rows = np.zeros((256, height), dtype=bool)
+    class_columns = np.zeros((256, width), dtype=bool)
+    class_rows[mask, np.arange(height)[:, None]] = True
+    class_columns[mask, np.arange(width)] = True
+
+    for class_id in np.flatnonzero(class_rows[1:num_classes].any(axis=1)) + 1:
+        rows = np.flatnonzero(class_rows[class_id])
+        columns = np.flatnonzero(class_columns[class_id])
+        x, y = int(columns[0]), int(rows[0])
+        class_crop = mask[y : rows[-1] + 1, x : columns[-1] + 1] == class_id
+        yield int(class_id), x, y, class_crop.view(np.uint8)
+
+
+def mask_to_yolo(mask_path, label_map, output_path, imgsz: int | None = None):
+    """
+    Convert a mask to a YOLO segmentation label file, with one polygon (the largest
+    contour) per class present in the mask.
+
+    Args:
+        mask_path: The path of the grayscale mask.
+        label_map: The label map, its length being the number of classes.
+        output_path: The path of the label file, written once.
+        imgsz: The training image size. When the mask is much larger, the contours are
+            extracted on a mask downsampled (nearest neighbour, so class ids are kept)
+            to a resolution still greater or equal to `imgsz`.
+    """
     mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
 
-    for pixel_value in range(1, len(label_map)):
-        pixels_equal_to = mask == pixel_value
-        contours, hierarchy = cv2.findContours(
-            pixels_equal_to.astype("uint8"), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    reduction_factor = get_mask_reduction_factor(mask.shape, imgsz)
+    if reduction_factor > 1:
+        mask = np.ascontiguousarray(mask[::reduction_factor, ::reduction_factor])
+
+    height, width = mask.shape
+    lines = []
+    for class_id, x, y, class_crop in iter_class_crops(mask, len(label_map)):
+        # Contours are only extracted on the bounding box crop of the class
+        contours, _ = cv2.findContours(
+            class_crop, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x, y)
         )
 
         if contours:
-            max_contour = max(contours, key=cv2.contourArea)
-            polygon_contour = max_contour.squeeze()
-            polygon_contour = polygon_contour.tolist()
-            polygon_contour = [[x, y] for x, y in polygon_contour]
-            normalized_polygon_contour = [
-                [x / mask.shape[1], y / mask.shape[0]] for x, y in polygon_contour
-            ]
+            polygon_contour = max(contours, key=cv2.contourArea).reshape(-1, 2)
 
             # check if contour is significant enough to be considered
             if len(polygon_contour) > 2:
-                with open(output_path, "a") as f:  # Open the file in append mode
-                    f.write(f"{pixel_value} ")
-                    for x, y in normalized_polygon_contour:
-                        f.write(f"{x} {y} ")
-                    f.write("\n")
+                normalized_polygon_contour = polygon_contour / (width, height)
+                coordinates = " ".join(
+                    map(str, normalized_polygon_contour.ravel().tolist())
+                )
+                lines.append(f"{class_id} {coordinates}\n")
 
+    with open(output_path, "w") as f:
+        f.write("".join(lines))
 
-def process_image(image_file, images_dir, output_dir, label_map):
+
+def process_image(
+    image_file, images_dir, output_dir, label_map, imgsz: int | None = None
+):
     """
     Process an image and its mask to YOLO format.
     """
     mask_path = os.path.join(images_dir, image_file)
     output_path = os.path.join(output_dir, f"{os.path.splitext(image_file)[0]}.txt")
-    mask_to_yolo(mask_path, label_map, output_path)
+    mask_to_yolo(mask_path, label_map, output_path, imgsz=imgsz)
 
 
-@step
-def dataset_to_yolo_converter(path_dir: str) -> str:
+def process_images(
+    image_files, images_dir, output_dir, label_map, imgsz: int | None = None
+) -> int:
     """
-    Process all images in a directory to YOLO format.
+    Process a chunk of images and their masks to YOLO format, in a worker process.
+
+    Returns:
+        The number of processed images.
     """
+    for image_file in image_files:
+        process_image(image_file, images_dir, output_dir, label_map, imgsz=imgsz)
+    return len(image_files)
+
+
+def iter_images_to_convert(
+    annotations_dir: str, label_mtimes: dict[str, float], min_mtime: float = 0
+) -> Iterator[str]:
+    """
+    Yield the masks whose label file is missing or older than the mask.
+
+    Args:
+        annotations_dir: The folder of the masks.
+        label_mtimes: The mtime of the existing label files by file stem. The stems of the
+            listed masks are popped, so only the stale labels remain once exhausted.
+        min_mtime: Labels older than this mtime (e.g. the label map's) are converted again.
+
+    Yields:
+        The file names of the masks to convert.
+    """
+    for entry in scan_files(annotations_dir, recursive=False):
+        label_mtime = label_mtimes.pop(os.path.splitext(entry.name)[0], None)
+        if label_mtime is None or label_mtime < max(entry.stat().st_mtime, min_mtime):
+            yield entry.name
+
 
+def convert_dataset_to_yolo(
+    path_dir: str,
+    imgsz: int | None = None,
+    max_workers: int | None = YOLO_CONVERSION_MAX_WORKERS,
+    chunk_size: int = YOLO_CONVERSION_CHUNK_SIZE,
+) -> int:
+    """
+    Incrementally convert the masks of a data source to YOLO labels on a process pool.
+
+    A mask is only converted when its label file is missing, or older than the mask or
+    the label map, so re-runs only convert the new or changed masks. Label files whose
+    mask was removed are deleted. The conversion parameters are stamped in the labels
+    folder, and all the masks are converted again when they change.
+
+    Args:
+        path_dir: The extracted data source folder, with `annotations` and `label_map.json`.
+        imgsz: The training image size, see `mask_to_yolo`.
+        max_workers: The number of processes, None for one per CPU.
+        chunk_size: The number of masks converted per task.
+
+    Returns:
+        The number of converted masks.
+    """
     logger = get_logger(__name__)
 
-    # check if labels folder exists and is not empty, if it is, return
-    if os.path.exists(os.path.join(path_dir, "labels")) and os.listdir(
-        os.path.join(path_dir, "labels")
+    annotations_dir = os.path.join(path_dir, "annotations")
+    output_dir = os.path.join(path_dir, "labels")
+    label_map_path = os.path.join(path_dir, "label_map.json")
+    os.makedirs(output_dir, exist_ok=True)
+
+    with open(label_map_path) as f:
+        label_map = json.load(f)
+
+    stamp_path = os.path.join(output_dir, CONVERSION_STAMP_NAME)
+    parameters = {"imgsz": imgsz}
+    min_mtime = os.path.getmtime(label_map_path)
+    try:
+        with open(stamp_path) as f:
+            is_stamp_current = json.load(f) == parameters
+    except (FileNotFoundError, json.JSONDecodeError):
+        is_stamp_current = False
+    if not is_stamp_current:
+        # Labels made with other parameters are all stale
+        min_mtime = float("inf")
+
+    label_mtimes = {
+        os.path.splitext(entry.name)[0]: entry.stat().st_mtime
+        for entry in scan_files(output_dir, extension=".txt", recursive=False)
+    }
+
+    convert_chunk = partial(
+        process_images,
+        images_dir=annotations_dir,
+        output_dir=output_dir,
+        label_map=label_map,
+        imgsz=imgsz,
+    )
+    chunks = chunked(
+        iter_images_to_convert(annotations_dir, label_mtimes, min_mtime),
+        chunk_size,
+    )
+
+    max_workers = max_workers or os.cpu_count() or 1
+    converted_images = 0
+    with (
+        ProcessPoolExecutor(max_workers=max_workers) as executor,
+        tqdm.tqdm(desc="Processing images", unit="image") as progress_bar,
     ):
-        logger.info("Dataset already converted to YOLO format")
-        return path_dir
+        for _, chunk_images in bounded_map(
+            convert_chunk,
+            chunks,
+            max_workers=max_workers,
+            executor=executor,
+        ):
+            converted_images += chunk_images
+            progress_bar.update(chunk_images)
 
-    # if a folder named labels doesn't exist, create it
-    output_dir = os.path.join(path_dir, "labels")
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    # The remaining labels have no mask anymore
+    for stem in label_mtimes:
+        os.remove(os.path.join(output_dir, f"{stem}.txt"))
 
-    # check for label_map.json and load it, if it doesn't exist, give a warning
-    label_map_path = os.path.join(path_dir, "label_map.json")
-    if os.path.exists(label_map_path):
-        label_map = json.load(open(label_map_path))
-    else:
+    with open(stamp_path, "w") as f:
+        json.dump(parameters, f)
+
+    logger.info(
+        f"Converted {converted_images} masks and removed {len(label_mtimes)} stale labels."
+    )
+    return converted_images
+
+
+@step
+@profile_step
+def dataset_to_yolo_converter(
+    path_dir: str,
+    imgsz: int | None = None,
+    max_workers: int | None = YOLO_CONVERSION_MAX_WORKERS,
+) -> str:
+    """
+    Process all images in a directory to YOLO format.
+
+    Only the masks that are new or changed since the last run are converted.
+
+    Args:
+        path_dir: The extracted data source folder.
+        imgsz: The training image size, masks much larger than it are downsampled
+            before extracting the contours. None keeps the full resolution.
+        max_workers: The number of conversion processes, None for one per CPU.
+    """
+
+    logger = get_logger(__name__)
+
+    # check for label_map.json, if it doesn't exist, give a warning
+    if not os.path.exists(os.path.join(path_dir, "label_map.json")):
         logger.warning("label_map.json not found")
         return
 
@@ -77,13 +280,9 @@ def dataset_to_yolo_converter(path_dir: str) -> str:
         logger.error("annotations folder not found")
         return
 
-    annotations_dir = os.path.join(path_dir, "annotations")
-
-    # use tqdm to show progress bar
-    total_images = len(os.listdir(annotations_dir))
-    for image_file in tqdm.tqdm(
-        os.listdir(annotations_dir), total=total_images, desc="Processing images"
-    ):
-        process_image(image_file, annotations_dir, output_dir, label_map)
+    converted_images = convert_dataset_to_yolo(
+        path_dir, imgsz=imgsz, max_workers=max_workers
+    )
+    record_step_io(items=converted_images)
 
     return path_dir
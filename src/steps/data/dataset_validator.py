@@ -5,25 +5,100 @@ from minio.error import S3Error
 from zenml.logger import get_logger
 from zenml import step
 
+from src.config.settings import DATASET_VALIDATION_MAX_WORKERS
+from src.models.model_validation_report import ValidationReport
+from src.utils.concurrency_helper import bounded_map
+from src.utils.file_helper import scan_files
+from src.utils.image_helper import read_png_header
+from src.utils.profiling_helper import profile_step, record_step_io
+from src.utils.tracker_helper import log_dict, log_metrics
+
 # Expected file extensions
 image_extensions = ".png"
 annotation_extensions = ".png"
 label_extensions = ".txt"
 
+# Number of file names logged per problem
+MAX_LOGGED_FILES = 10
+# Artifact of the full validation report in the experiment tracker run
+VALIDATION_REPORT_ARTIFACT = "validation_report.json"
+
 
 def get_filenames_without_extension(dir_path, extension):
     return {
-        os.path.splitext(f)[0] for f in os.listdir(dir_path) if f.endswith(extension)
+        os.path.splitext(entry.name)[0]
+        for entry in scan_files(dir_path, extension=extension, recursive=False)
     }
 
 
-@step
-def dataset_validator(path_dir: str) -> str:
+def get_empty_files_without_extension(dir_path, extension):
+    return {
+        os.path.splitext(entry.name)[0]
+        for entry in scan_files(dir_path, extension=extension, recursive=False)
+        if entry.stat().st_size == 0
+    }
+
+
+def check_sample(
+    sample: str, images_dir: str, annotations_dir: str, decode: bool = False
+) -> list[tuple[str, str]]:
+    """
+    Checks that the image and the annotation of a sample are complete PNG files of the
+    same size. Only the PNG headers are read, unless `decode` is set.
+
+    Args:
+        sample (str): The file name of the sample, without extension.
+        images_dir (str): The folder of the images.
+        annotations_dir (str): The folder of the annotations.
+        decode (bool): Also decode the files, to find corrupted pixel data.
+
+    Returns:
+        list[tuple[str, str]]: The problems found, as (report field, file path or sample) pairs.
+    """
+    problems = []
+    sizes = []
+    for dir_path, extension in (
+        (images_dir, image_extensions),
+        (annotations_dir, annotation_extensions),
+    ):
+        file_path = os.path.join(dir_path, sample + extension)
+        try:
+            width, height, is_complete = read_png_header(file_path)
+        except (OSError, ValueError):
+            problems.append(("unreadable_files", file_path))
+            continue
+
+        if not is_complete:
+            problems.append(("truncated_files", file_path))
+        elif decode and cv2.imread(file_path, cv2.IMREAD_UNCHANGED) is None:
+            problems.append(("unreadable_files", file_path))
+        else:
+            sizes.append((width, height))
+
+    if len(sizes) == 2 and sizes[0] != sizes[1]:
+        problems.append(("size_mismatches", sample))
+
+    return problems
+
+
+def validate_dataset(
+    path_dir: str,
+    deep: bool = False,
+    decode: bool = False,
+    max_workers: int = DATASET_VALIDATION_MAX_WORKERS,
+) -> ValidationReport:
     """
     Validates the dataset by checking if the annotations and labels are consistent with the images.
 
     Args:
         path_dir (str): The path to the dataset directory.
+        deep (bool): Also check, in parallel, that the images and annotations are complete
+            PNG files of the same size and that the labels are not empty.
+        decode (bool): In deep mode, also decode the images and annotations.
+        max_workers (int): The number of threads of the deep validation.
+
+    Returns:
+        ValidationReport: The problems found in the dataset.
     """
     # add the path to the dataset
     images_dir = os.path.join(path_dir, "images")
@@ -37,34 +112,81 @@ def dataset_validator(path_dir: str) -> str:
     )
     label_files = get_filenames_without_extension(labels_dir, label_extensions)
 
-    # Initialize validation flags
-    all_files_valid = True
-
     # Check for corresponding annotation and label for each image
-    missing_annotations = image_files - annotation_files
-    missing_labels = image_files - label_files
-
-    if missing_annotations:
-        all_files_valid = False
-        for missing_annotation in missing_annotations:
-            print(f"Missing annotation for image: {missing_annotation}")
-
-    if missing_labels:
-        all_files_valid = False
-        for missing_label in missing_labels:
-            print(f"Missing label for image: {missing_label}")
-
-    # Check if the numbers of files are equal
-    if not (len(image_files) == len(annotation_files) == len(label_files)):
-        all_files_valid = False
-        print(
-            "The number of files in images, annotations, and labels folders are not equal."
-        )
+    report = ValidationReport()
+    report.num_samples = len(image_files)
+    report.missing_images = list((annotation_files | label_files) - image_files)
+    report.missing_annotations = list(image_files - annotation_files)
+    report.missing_labels = list(image_files - label_files)
+
+    if not deep:
+        return report
+
+    report.empty_labels = list(
+        get_empty_files_without_extension(labels_dir, label_extensions) & image_files
+    )
+
+    def check(sample):
+        return check_sample(sample, images_dir, annotations_dir, decode=decode)
+
+    samples = image_files & annotation_files
+    for _, problems in tqdm.tqdm(
+        bounded_map(check, samples, max_workers=max_workers),
+        total=len(samples),
+        desc="Validating samples",
+    ):
+        for field, value in problems:
+            getattr(report, field).append(value)
+
+    return report
+
+
+@step
+@profile_step
+def dataset_validator(
+    path_dir: str,
+    deep: bool = False,
+    decode: bool = False,
+    max_workers: int = DATASET_VALIDATION_MAX_WORKERS,
+    raise_on_error: bool = False,
+) -> str:
+    """
+    Validates the dataset by checking if the annotations and labels are consistent with the images.
+
+    Args:
+        path_dir (str): The path to the dataset directory.
+        deep (bool): Also look for truncated PNG files, annotations whose size differs from
+            their image and empty labels, reading only the PNG headers.
+        decode (bool): In deep mode, also decode the images and annotations.
+        max_workers (int): The number of threads of the deep validation.
+        raise_on_error (bool): Raise a ValueError if the dataset is not valid.
+
+    The report is logged as metrics and as a JSON artifact to the step's experiment tracker
+    run, see `with_experiment_tracker`.
+    """
+    logger = get_logger(__name__)
+
+    report = validate_dataset(
+        path_dir, deep=deep, decode=decode, max_workers=max_workers
+    )
+    record_step_io(items=report.num_samples)
+
+    # The full report is kept in the experiment tracker run of the step
+    log_metrics(report.to_metrics())
+    log_dict(report.to_dict(), VALIDATION_REPORT_ARTIFACT)
+
+    for field, files in report.to_dict().items():
+        if isinstance(files, list) and files:
+            logger.warning(
+                f"{len(files)} {field.replace('_', ' ')}: {files[:MAX_LOGGED_FILES]}"
+            )
 
     # Output validation result
-    if all_files_valid:
-        print("All files are valid and consistent.")
+    if report.is_valid:
+        logger.info(f"All files are valid and consistent ({report}).")
     else:
-        print("Some files are missing or inconsistent.")
+        logger.error(f"Some files are missing or inconsistent ({report}).")
+        if raise_on_error:
+            raise ValueError(f"The dataset {path_dir} is not valid: {report}")
 
     return path_dir
@@ -3,8 +3,11 @@ import os
 import torch
 from ultralytics import YOLO
 
+from src.utils.profiling_helper import profile_step
+
 
 @step
+@profile_step
 def model_evaluator(
     model_path: str,
     dataset_path: str,
@@ -2,6 +2,7 @@ from src.config.settings import (
     YOLO_PRE_TRAINED_WEIGHTS_NAME,
     YOLO_PRE_TRAINED_WEIGHTS_URL,
 )
+from src.utils.profiling_helper import profile_step
 
 import os
 
@@ -28,6 +29,7 @@ def get_pretrained_weights_path(model_path: str) -> str:
 
 
 @step
+@profile_step
 def model_trainer(
     model_path: str,
     dataset_path: str,
@@ -0,0 +1,220 @@
+"""Helper functions for the benchmarks.
+
+This module contains the measurement helpers shared by the benchmarks of
+`src/benchmarks`: every scenario runs in a fresh process, so that its peak
+memory and its caches are its own, and the results are saved as JSON files
+that can be compared between runs.
+"""
+
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# The metrics of a scenario compared to the baseline, higher being better
+THROUGHPUT_METRICS = ("objects_per_second", "mb_per_second", "samples_per_second")
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Gets the peak resident memory of the current process and of its terminated children.
+
+    Returns:
+        float: The peak resident set size in MB.
+    """
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return (peak_rss if sys.platform == "darwin" else peak_rss * 1024) / 1e6
+
+
+def run_isolated(function: Callable[..., dict], *args, **kwargs) -> dict:
+    """
+    Runs a benchmark scenario in a fresh spawned process and adds its peak RSS to its
+    results.
+
+    Args:
+        function (Callable[..., dict]): The scenario, a module-level function returning its
+            results.
+        *args: The positional arguments of the scenario.
+        **kwargs: The keyword arguments of the scenario.
+
+    Returns:
+        dict: The results of the scenario, with "peak_rss_mb".
+    """
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(_measure, function, args, kwargs).result()
+
+
+def _measure(function: Callable[..., dict], args: tuple, kwargs: dict) -> dict:
+    results = function(*args, **kwargs)
+    results["peak_rss_mb"] = get_peak_rss_mb()
+    return results
+
+
+def summarize_transfers(
+    latencies: Sequence[float], sizes: Sequence[int], elapsed_seconds: float
+) -> dict:
+    """
+    Summarizes the object transfers of a scenario.
+
+    Args:
+        latencies (Sequence[float]): The latency of every transfer in seconds.
+        sizes (Sequence[int]): The size of every transferred object in bytes.
+        elapsed_seconds (float): The wall time of the scenario in seconds.
+
+    Returns:
+        dict: The number of objects and bytes, the throughput and the p50/p99 latency.
+    """
+    total_bytes = int(sum(sizes))
+    p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (0.0, 0.0)
+    # Guard the rates of an empty scenario
+    seconds = elapsed_seconds or float("inf")
+
+    return {
+        "objects": len(sizes),
+        "bytes": total_bytes,
+        "seconds": elapsed_seconds,
+        "objects_per_second": len(sizes) / seconds,
+        "mb_per_second": total_bytes / 1e6 / seconds,
+        "latency_p50_ms": float(p50) * 1e3,
+        "latency_p99_ms": float(p99) * 1e3,
+    }
+
+
+def get_git_sha() -> str | None:
+    """
+    Gets the commit of the working tree, to attribute a benchmark run to a code version.
+
+    Returns:
+        str | None: The SHA of HEAD, suffixed with "-dirty" if the tree has uncommitted
+            changes, None outside of a git repository.
+    """
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return f"{sha}-dirty" if status.strip() else sha
+
+
+def get_run_info() -> dict:
+    """
+    Gets the description of the code version, the host and the time of a benchmark run.
+
+    Returns:
+        dict: The time, git SHA, host name, platform, Python version and number of CPUs.
+    """
+    return {
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_sha": get_git_sha(),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python_version": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_results(results: dict, output_path: str) -> None:
+    """
+    Saves the results of a benchmark as JSON.
+
+    Args:
+        results (dict): The results.
+        output_path (str): The path of the JSON file.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+def load_results(results_path: str) -> dict:
+    """
+    Loads the results of a benchmark saved with save_results.
+
+    Args:
+        results_path (str): The path of the JSON file.
+
+    Returns:
+        dict: The results.
+    """
+    with open(results_path) as file:
+        return json.load(file)
+
+
+def get_scenario_metrics(results: dict) -> dict[str, float]:
+    """
+    Gets the numeric metrics of all the scenarios of a benchmark run.
+
+    Args:
+        results (dict): The results of a benchmark.
+
+    Returns:
+        dict[str, float]: The metrics, named "<scenario>/<metric>".
+    """
+    return {
+        f"{scenario}/{metric}": float(value)
+        for scenario, scenario_results in results["scenarios"].items()
+        for metric, value in scenario_results.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+
+
+def compare_results(results: dict, baseline: dict, threshold: float) -> list[dict]:
+    """
+    Compares the throughput of the scenarios of a benchmark run to a baseline run.
+
+    Args:
+        results (dict): The results of the benchmark run.
+        baseline (dict): The results of the baseline run of the same benchmark.
+        threshold (float): The relative throughput drop flagged as a regression, e.g. 0.1
+            for 10%.
+
+    Returns:
+        list[dict]: The comparison of every throughput metric of the scenarios found in
+            both runs, with its baseline and current values, its relative change and
+            whether it regressed.
+    """
+    comparisons = []
+    for scenario, scenario_results in results["scenarios"].items():
+        baseline_results = baseline["scenarios"].get(scenario)
+        if baseline_results is None:
+            continue
+
+        for metric in THROUGHPUT_METRICS:
+            if metric not in scenario_results or not baseline_results.get(metric):
+                continue
+
+            change = scenario_results[metric] / baseline_results[metric] - 1
+            comparisons.append(
+                {
+                    "scenario": scenario,
+                    "metric": metric,
+                    "baseline": baseline_results[metric],
+                    "current": scenario_results[metric],
+                    "change": change,
+                    "regression": change < -threshold,
+                }
+            )
+
+    return comparisons
@@ -0,0 +1,157 @@
+"""Helper functions for bounded concurrent execution.
+
+This module contains helper functions that run tasks on an executor while
+keeping the number of pending tasks bounded, so that very large (or lazily
+listed) inputs can be processed without holding every future in memory.
+"""
+
+import asyncio
+import itertools
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+)
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import ExitStack
+from typing import TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def bounded_map(
+    function: Callable[[T], R],
+    items: Iterable[T],
+    max_workers: int,
+    max_in_flight: int | None = None,
+    executor: Executor | None = None,
+) -> Iterator[tuple[T, R]]:
+    """
+    Applies a function to every item concurrently and yields the results as they complete.
+
+    The items are consumed lazily: a new item is only pulled from the iterable once fewer
+    than `max_in_flight` tasks are pending. Producing items (e.g. paginated listings) and
+    processing them therefore overlap, and memory stays bounded whatever the input size.
+
+    Args:
+        function (Callable[[T], R]): The function to apply to each item.
+        items (Iterable[T]): The items to process, possibly a lazy generator.
+        max_workers (int): Number of worker threads when no executor is given.
+        max_in_flight (int | None): Maximum number of pending tasks. Defaults to twice `max_workers`.
+        executor (Executor | None): An existing executor to submit the tasks to.
+
+    Yields:
+        tuple[T, R]: The item and the result of `function(item)`, in completion order.
+
+    Raises:
+        Exception: The first exception raised by `function`; pending tasks are cancelled.
+    """
+    if max_in_flight is None:
+        max_in_flight = max_workers * 2
+
+    with ExitStack() as stack:
+        if executor is None:
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=max_workers))
+
+        pending: dict[Future, T] = {}
+        try:
+            for item in items:
+                if len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+
+                pending[executor.submit(function, item)] = item
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def chunked(items: Iterable[T], chunk_size: int) -> Iterator[list[T]]:
+    """
+    Groups items into lists of `chunk_size` items, the last one possibly shorter.
+
+    Submitting chunks instead of single items amortizes the per-task overhead of process
+    pools, where every task and its result are pickled.
+
+    Args:
+        items (Iterable[T]): The items to group, possibly a lazy generator.
+        chunk_size (int): The number of items per chunk.
+
+    Yields:
+        list[T]: The chunks, in the order of the items.
+    """
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield chunk
+
+
+async def _iterate_async(items: Iterable[T] | AsyncIterable[T]) -> AsyncIterator[T]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+        return
+
+    # A lazy iterable (e.g. a paginated listing) may block, so it is advanced in a thread
+    iterator = iter(items)
+    sentinel = object()
+    while (item := await asyncio.to_thread(next, iterator, sentinel)) is not sentinel:
+        yield item
+
+
+async def async_bounded_map(
+    function: Callable[[T], Awaitable[R]],
+    items: Iterable[T] | AsyncIterable[T],
+    max_concurrency: int,
+) -> AsyncIterator[tuple[T, R]]:
+    """
+    Awaits a coroutine function on every item concurrently and yields the results as they complete.
+
+    This is the asyncio counterpart of `bounded_map`: at most `max_concurrency` tasks are
+    scheduled at once on the running event loop, and the items are consumed lazily.
+
+    Args:
+        function (Callable[[T], Awaitable[R]]): The coroutine function to apply to each item.
+        items (Iterable[T] | AsyncIterable[T]): The items to process, possibly an async generator.
+        max_concurrency (int): Maximum number of pending tasks.
+
+    Yields:
+        tuple[T, R]: The item and the result of `await function(item)`, in completion order.
+
+    Raises:
+        Exception: The first exception raised by `function`; pending tasks are cancelled.
+    """
+    pending: dict[asyncio.Task, T] = {}
+    try:
+        async for item in _iterate_async(items):
+            if len(pending) >= max_concurrency:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield pending.pop(task), task.result()
+
+            pending[asyncio.ensure_future(function(item))] = item
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield pending.pop(task), task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,36 @@
+"""Helper functions for walking local datasets.
+
+This module contains helper functions that stream directory entries with
+`os.scandir`, so that folders holding millions of files can be processed
+without building full file lists or issuing one `stat` call per file.
+"""
+
+import os
+from collections.abc import Iterator
+
+
+def scan_files(
+    root_path: str, extension: str | None = None, recursive: bool = True
+) -> Iterator[os.DirEntry]:
+    """
+    Yields the files of a folder as `os.DirEntry` objects.
+
+    Args:
+        root_path (str): The folder to scan.
+        extension (str | None): Only yield the files with this extension (e.g. ".png").
+        recursive (bool): Also scan the sub-folders.
+
+    Yields:
+        os.DirEntry: The entries of the files, whose type and stat results are cached.
+    """
+    directories = [root_path]
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        directories.append(entry.path)
+                elif entry.is_file() and (
+                    extension is None or entry.name.endswith(extension)
+                ):
+                    yield entry
@@ -0,0 +1,46 @@
+"""Helper functions for content hashing.
+
+This module contains helper functions that resolve a hash algorithm name to a
+function turning bytes into a hexadecimal digest. Any `hashlib` algorithm is
+supported, as well as the much faster non-cryptographic xxHash family when the
+optional `xxhash` package is installed.
+"""
+
+import hashlib
+from collections.abc import Callable
+
+XXHASH_ALGORITHMS = ("xxh32", "xxh64", "xxh3_64", "xxh3_128", "xxh128")
+
+
+def get_hash_function(algorithm: str = "sha256") -> Callable[[bytes], str]:
+    """
+    Get a function computing the hexadecimal digest of bytes with the given algorithm.
+
+    Args:
+        algorithm (str): A `hashlib` algorithm name (e.g. "sha256", "blake2b") or an
+            xxHash algorithm name (e.g. "xxh3_128").
+
+    Returns:
+        Callable[[bytes], str]: The hash function.
+
+    Raises:
+        ImportError: If an xxHash algorithm is requested but `xxhash` is not installed.
+        ValueError: If the algorithm is not supported.
+    """
+    if algorithm in XXHASH_ALGORITHMS:
+        try:
+            import xxhash
+        except ImportError as e:
+            raise ImportError(
+                f"The hash algorithm '{algorithm}' requires the 'xxhash' package."
+            ) from e
+
+        return getattr(xxhash, f"{algorithm}_hexdigest")
+
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Hash algorithm '{algorithm}' is not supported.")
+
+    def hash_function(data: bytes) -> str:
+        return hashlib.new(algorithm, data).hexdigest()
+
+    return hash_function
@@ -0,0 +1,59 @@
+"""Helper functions for inspecting image files.
+
+This module contains helper functions that read image metadata straight from
+the file headers, so that the size and integrity of millions of images can be
+checked without decoding their pixels.
+"""
+
+import os
+import struct
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Every complete PNG file ends with an empty IEND chunk
+PNG_IEND_CHUNK = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+
+def get_png_size(data: bytes) -> tuple[int, int]:
+    """
+    Gets the size of a PNG image from the IHDR chunk of its encoded bytes.
+
+    Args:
+        data (bytes): The encoded image, or at least its first 24 bytes.
+
+    Returns:
+        tuple[int, int]: The width and height of the image.
+
+    Raises:
+        ValueError: If the data is not a PNG image.
+    """
+    if len(data) < 24 or not data.startswith(PNG_SIGNATURE):
+        raise ValueError("The data is not a PNG image.")
+
+    return struct.unpack(">II", data[16:24])
+
+
+def read_png_header(file_path: str) -> tuple[int, int, bool]:
+    """
+    Reads the size of a PNG file from its IHDR chunk and checks its trailing IEND chunk.
+    Only the first 24 and the last 12 bytes of the file are read.
+
+    Args:
+        file_path (str): The path of the PNG file.
+
+    Returns:
+        tuple[int, int, bool]: The width and height of the image, and False if the file is
+        truncated (its IEND chunk is missing).
+
+    Raises:
+        ValueError: If the file is not a PNG file.
+    """
+    with open(file_path, "rb") as file:
+        try:
+            width, height = get_png_size(file.read(24))
+        except ValueError as e:
+            raise ValueError(f"{file_path} is not a PNG file.") from e
+
+        file.seek(-len(PNG_IEND_CHUNK), os.SEEK_END)
+        is_complete = file.read() == PNG_IEND_CHUNK
+
+    return width, height, is_complete
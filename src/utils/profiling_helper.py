@@ -0,0 +1,75 @@
+"""Helper functions for profiling the pipeline steps.
+
+This module contains a decorator measuring the wall time, CPU time, peak memory
+and throughput of every run of a step, logged with the step's output and to
+the active experiment tracker, to find where the pipeline time goes.
+"""
+
+import functools
+from collections.abc import Callable
+from contextvars import ContextVar
+from typing import TypeVar
+
+from zenml.logger import get_logger
+
+from src.models.model_step_profile import StepProfile
+from src.utils.tracker_helper import log_metrics
+
+F = TypeVar("F", bound=Callable)
+
+_current_profile: ContextVar[StepProfile | None] = ContextVar(
+    "current_profile", default=None
+)
+
+
+def profile_step(function: F) -> F:
+    """
+    Profiles every run of a step function. The decorator goes under `@step`, so that
+    ZenML sees the signature, docstring and source of the step function.
+
+    The step reports the items it processed and the bytes it read or wrote with
+    `record_step_io`. The profile is logged, even if the step fails. When the step succeeds,
+    its metrics are logged as "<step name>/<metric>" to the experiment tracker run of the
+    step, see `with_experiment_tracker`.
+
+    Args:
+        function (F): The step function.
+
+    Returns:
+        F: The profiled step function.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profile = StepProfile(function.__name__)
+        token = _current_profile.set(profile)
+        profile.start()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            profile.stop()
+            _current_profile.reset(token)
+            get_logger(function.__module__).info(
+                f"Step {profile.step_name} profile: {profile}."
+            )
+
+        log_metrics(profile.to_metrics())
+        return result
+
+    return wrapper
+
+
+def record_step_io(items: int = 0, num_bytes: int = 0) -> None:
+    """
+    Records items processed and bytes read or written by the running profiled step. Does
+    nothing outside of a profiled step, so that the step functions can be called directly.
+
+    Must be called from the thread running the step, not from its worker threads.
+
+    Args:
+        items (int): The number of items, e.g. images or objects.
+        num_bytes (int): The number of bytes.
+    """
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add(items=items, num_bytes=num_bytes)
@@ -0,0 +1,107 @@
+"""Helper functions for deterministic dataset splits.
+
+This module contains helper functions that assign samples to splits from a
+stable hash of their ID. A sample always lands in the same split whatever the
+other samples are, so adding samples never moves existing ones and caches
+built per split stay valid.
+"""
+
+import hashlib
+from collections.abc import Sequence
+
+import numpy as np
+
+
+def hash_sample_ids(sample_ids: Sequence[str], salt: str = "") -> np.ndarray:
+    """
+    Hashes sample IDs to uniformly distributed 64-bit integers.
+
+    Args:
+        sample_ids (Sequence[str]): The IDs of the samples, e.g. their file names.
+        salt (str): A salt, to draw a different assignment for the same IDs.
+
+    Returns:
+        np.ndarray: The uint64 hashes, in the order of `sample_ids`.
+    """
+    digests = b"".join(
+        hashlib.blake2b(f"{salt}{sample_id}".encode(), digest_size=8).digest()
+        for sample_id in sample_ids
+    )
+    return np.frombuffer(digests, dtype=">u8").astype(np.uint64)
+
+
+def assign_splits(
+    sample_ids: Sequence[str], split_ratios: Sequence[float], salt: str = ""
+) -> np.ndarray:
+    """
+    Assigns samples to splits from the hash of their ID.
+
+    Each hash is mapped to a position in [0, 1), and the splits are consecutive intervals
+    of [0, 1) whose lengths are the normalized ratios.
+
+    Args:
+        sample_ids (Sequence[str]): The IDs of the samples, e.g. their file names.
+        split_ratios (Sequence[float]): The relative size of each split, e.g. [0.8, 0.1, 0.1].
+        salt (str): A salt, to draw a different assignment for the same IDs.
+
+    Returns:
+        np.ndarray: The index of the split of each sample, in the order of `sample_ids`.
+    """
+    # The top 53 bits of the hashes are exactly representable as float64
+    positions = (hash_sample_ids(sample_ids, salt) >> np.uint64(11)) * 2.0**-53
+
+    boundaries = np.cumsum(split_ratios, dtype=np.float64)
+    boundaries /= boundaries[-1]
+    return np.minimum(
+        np.searchsorted(boundaries, positions, side="right"), len(split_ratios) - 1
+    )
+
+
+def stratified_subsample(
+    sample_ids: Sequence[str],
+    strata: np.ndarray,
+    sample_count: int,
+    salt: str = "",
+) -> np.ndarray:
+    """
+    Selects `sample_count` samples, keeping the proportion of each stratum.
+
+    Every stratum keeps at least one sample, so that small strata are not dropped, and gets
+    its proportional share of the rest of the selection (largest remainder rounding), filled
+    with its samples of lowest hash. The selection is deterministic, and has more than
+    `sample_count` samples only when there are more strata than `sample_count`.
+
+    Args:
+        sample_ids (Sequence[str]): The IDs of the samples, e.g. their file names.
+        strata (np.ndarray): The stratum (e.g. a class id) of each sample.
+        sample_count (int): The number of samples to select.
+        salt (str): A salt, to draw a different selection for the same IDs.
+
+    Returns:
+        np.ndarray: A boolean mask of the selected samples, in the order of `sample_ids`.
+    """
+    strata = np.asarray(strata)
+    num_samples = len(strata)
+    sample_count = min(sample_count, num_samples)
+    if sample_count <= 0:
+        return np.zeros(num_samples, dtype=bool)
+
+    # Sort by stratum, then by hash inside each stratum
+    order = np.lexsort((hash_sample_ids(sample_ids, salt), strata))
+    _, stratum_starts, stratum_sizes = np.unique(
+        strata[order], return_index=True, return_counts=True
+    )
+
+    # One sample per stratum, the rest shared in proportion to the other samples of the strata
+    num_strata = len(stratum_sizes)
+    rest_count = max(sample_count - num_strata, 0)
+    shares = (stratum_sizes - 1) * (rest_count / max(num_samples - num_strata, 1))
+    quotas = np.floor(shares).astype(np.int64)
+    remainder = rest_count - quotas.sum()
+    quotas[np.argsort(quotas - shares, kind="stable")[:remainder]] += 1
+    quotas += 1
+
+    ranks = np.arange(num_samples) - np.repeat(stratum_starts, stratum_sizes)
+    selected = np.empty(num_samples, dtype=bool)
+    selected[order] = ranks < np.repeat(quotas, stratum_sizes)
+    return selected
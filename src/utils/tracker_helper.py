@@ -8,8 +8,12 @@ from zenml.client import Client
 from zenml.integrations.mlflow.experiment_trackers import (
     MLFlowExperimentTracker,
 )
+from zenml.steps import BaseStep
+
+from src.utils.benchmark_helper import get_scenario_metrics
 
 LOCAL_MLFLOW_UI_PORT = 8185
+BENCHMARK_RESULTS_ARTIFACT = "results.json"
 
 
 def get_tracker_name() -> str | None:
@@ -19,6 +23,13 @@ def get_tracker_name() -> str | None:
     return experiment_tracker.name if experiment_tracker else None
 
 
+def with_experiment_tracker(step: BaseStep) -> BaseStep:
+    """Configure a step to run with the active experiment tracker, if any, so that the
+    metrics it logs go to a tracker run."""
+
+    return step.with_options(experiment_tracker=get_tracker_name())
+
+
 def enable_autolog() -> None:
     """Automatically log to the active experiment tracker."""
 
@@ -39,6 +50,30 @@ def log_metric(key: str, value: float) -> None:
         mlflow.log_metric(key, value)
 
 
+def log_metrics(metrics: dict[str, float]) -> None:
+    """Log metrics to the run of the active experiment tracker, if the step has one."""
+
+    experiment_tracker = Client().active_stack.experiment_tracker
+    if isinstance(experiment_tracker, MLFlowExperimentTracker):
+        import mlflow
+
+        # Without a run, MLflow would start one outside of the tracker's experiment
+        if mlflow.active_run() is not None:
+            mlflow.log_metrics(metrics)
+
+
+def log_dict(data: dict, artifact_file: str) -> None:
+    """Log a dictionary as a JSON artifact to the run of the active experiment tracker, if
+    the step has one."""
+
+    experiment_tracker = Client().active_stack.experiment_tracker
+    if isinstance(experiment_tracker, MLFlowExperimentTracker):
+        import mlflow
+
+        if mlflow.active_run() is not None:
+            mlflow.log_dict(data, artifact_file)
+
+
 def log_artifact(local_path: str, artifact_path: str) -> None:
     """Log an artifact to the active experiment tracker."""
 
@@ -79,3 +114,44 @@ def get_current_tracker_run_id() -> str | None:
         return mlflow.last_active_run().info.run_id
 
     return None
+
+
+def log_benchmark_results(results: dict, experiment_name: str) -> str | None:
+    """Log benchmark results as a run of a dedicated experiment of the active MLflow
+    tracker, with the code version and host as tags. Returns the run id."""
+
+    experiment_tracker = Client().active_stack.experiment_tracker
+    if isinstance(experiment_tracker, MLFlowExperimentTracker):
+        import mlflow
+
+        experiment_tracker.configure_mlflow()
+        mlflow.set_experiment(experiment_name)
+        with mlflow.start_run(run_name=results["benchmark"]) as run:
+            mlflow.set_tags(
+                {
+                    "benchmark": results["benchmark"],
+                    **{key: str(value) for key, value in results["run"].items()},
+                }
+            )
+            mlflow.log_params(results["parameters"])
+            mlflow.log_metrics(get_scenario_metrics(results))
+            mlflow.log_dict(results, BENCHMARK_RESULTS_ARTIFACT)
+
+        return run.info.run_id
+
+    return None
+
+
+def load_benchmark_results(run_id: str) -> dict | None:
+    """Load the benchmark results logged by a run of the active MLflow tracker."""
+
+    experiment_tracker = Client().active_stack.experiment_tracker
+    if isinstance(experiment_tracker, MLFlowExperimentTracker):
+        import mlflow
+
+        experiment_tracker.configure_mlflow()
+        return mlflow.artifacts.load_dict(
+            f"runs:/{run_id}/{BENCHMARK_RESULTS_ARTIFACT}"
+        )
+
+    return None